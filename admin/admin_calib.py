@@ -21,17 +21,19 @@ from sqlalchemy import text
 # 频谱缓存与曲线缓存目录（共享模块 + 目录函数）
 try:
     from app.curves import spectrum_cache
-    from app.curves.pchip_cache import curve_cache_dir
+    from app.curves.pchip_cache import curve_cache_dir, cache_pack
     # 复用统一实现：默认参数与模型 hash
     from app.curves.spectrum_builder import load_default_params as sb_load_default_params, _calc_model_hash as sb_calc_model_hash
+    from app.curves.spectrum_builder import default_params_with_hash as sb_default_params_with_hash, invalidate_default_params as sb_invalidate_default_params
 except Exception:
     CURVES_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '../app/curves'))
     if CURVES_DIR not in sys.path:
         sys.path.append(CURVES_DIR)
     import spectrum_cache  # type: ignore
-    from pchip_cache import curve_cache_dir  # type: ignore
+    from pchip_cache import curve_cache_dir, cache_pack  # type: ignore
     # 回退导入（同目录）
     from spectrum_builder import load_default_params as sb_load_default_params, _calc_model_hash as sb_calc_model_hash  # type: ignore
+    from spectrum_builder import default_params_with_hash as sb_default_params_with_hash, invalidate_default_params as sb_invalidate_default_params  # type: ignore
 
 calib_admin_bp = Blueprint('calib_admin', __name__)
 
@@ -264,8 +266,22 @@ def _scan_strict_and_hash(base_path: str) -> Tuple[List[Dict[str, Any]], str]:
 
     multiset_lines.sort()
     data_hash = _sha1_str('\n'.join(multiset_lines))
+    _register_band_hashes(logical_root, entries)
     return entries, data_hash
 
+def _register_band_hashes(logical_root: str, entries: List[Dict[str, Any]]):
+    """把已算出的 sha256 登记给频带能量缓存（与 pipeline 同一导入路径），预览/绑定时免重复哈希。"""
+    try:
+        app_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '../app'))
+        if app_dir not in sys.path:
+            sys.path.append(app_dir)
+        from audio_calib import band_cache as _bc  # type: ignore
+    except Exception:
+        return
+    for e in entries:
+        if e.get('file_type') == 'audio':
+            _bc.register_file_hash(os.path.join(logical_root, e['rel_path']), e['sha256'])
+
 def resp_ok(data=None, message=None, meta=None, http_status=200):
     payload = {'success': True, 'data': data, 'message': message, 'meta': meta or {}}
     return make_response(jsonify(payload), http_status)
@@ -484,8 +500,8 @@ def api_calib_upload_zip():
         pass
 
     # 首次上传音频：照常运行一次 pipeline，并写入 audio_batch / calib_run / report
-    params = sb_load_default_params()
-    param_hash = hashlib.sha1(json.dumps(params, sort_keys=True, separators=(',',':')).encode('utf-8')).hexdigest()
+    # 管理端绕过缓存读取；若发现参数已变化，会通知前台进程失效
+    params, param_hash = sb_default_params_with_hash(fresh=True)
 
     try:
         preview_model_json, per_rpm_rows = _run_inproc_and_collect(base_path, params, model_id, condition_id)
@@ -691,7 +707,7 @@ def api_calib_preview():
     _log('preview:resolved_base', base_path=base_path, model_id=mid, condition_id=cid, base_exists=os.path.isdir(base_path))
 
     try:
-        params = sb_load_default_params()
+        params = sb_load_default_params(fresh=True)
         t0 = time.time()
         _log('pipeline:start', where='preview', base_path=base_path, model_id=mid, condition_id=cid, code_version=CODE_VERSION)
         model_json, _rows = _run_inproc_and_collect(base_path, params, mid, cid)
@@ -880,9 +896,8 @@ def api_bind_model_to_perf():
             'by': admin_name
         })
 
-    # 预热：读取当前默认参数，计算 param_hash/code_version
-    params = sb_load_default_params()
-    param_hash = hashlib.sha1(json.dumps(params, sort_keys=True, separators=(',',':')).encode('utf-8')).hexdigest()
+    # 预热：读取当前默认参数（绕过缓存），取 param_hash/code_version
+    params, param_hash = sb_default_params_with_hash(fresh=True)
     code_ver = CODE_VERSION or ''
 
     # 若已存在频谱文件，且 (audio_data_hash,param_hash,code_version) 一致，仅更新 perf_batch_id，避免重算
@@ -905,7 +920,7 @@ def api_bind_model_to_perf():
                     condition_id=condition_id,
                     extra_meta=new_meta
                 )
-                out_path = spectrum_cache.path(model_id, condition_id)
+                out_path = spectrum_cache.locator(model_id, condition_id)
                 return resp_ok({
                     'perf_batch_id': perf_batch_id,
                     'audio_batch_id': audio_batch_id,
@@ -937,7 +952,7 @@ def api_bind_model_to_perf():
             extra_meta=meta_out
         )
         out_path = saved.get('path')
-        ok_ids = bool(out_path and os.path.isfile(out_path))
+        ok_ids = bool(out_path and spectrum_cache.exists(model_id, condition_id))
         if not ok_ids:
             return resp_err('CACHE_SAVE_FAIL', '频谱缓存落盘失败', 500)
         return resp_ok({
@@ -977,14 +992,43 @@ def api_calib_cache_inspect():
                     files.append({"name": fn, "error": "stat-failed"})
         except Exception as e:
             return resp_err('IO_ERROR', f'列举缓存目录失败: {e}', 500, meta={"cache_dir": cache_dir, "cwd": cwd, "env": cache_dir_env})
+    # 合并存储：统计来自内存索引，不随条目数增长而列目录
+    pack = None
+    store = cache_pack()
+    if store is not None:
+        try:
+            keys = store.keys()
+            pack = dict(store.snapshot(), root=store.root,
+                        perf_keys=sum(1 for k in keys if k.startswith('perf/')),
+                        spectrum_keys=sum(1 for k in keys if k.startswith('spectrum/')))
+        except Exception as e:
+            pack = {"error": str(e)}
     return resp_ok({
         "env_CURVE_CACHE_DIR": cache_dir_env,
         "cache_dir": cache_dir,
         "cwd": cwd,
         "exists": exists,
-        "files": files
+        "files": files,
+        "pack": pack
     }, message="curve-cache inspect")
 
+@calib_admin_bp.post('/admin/api/calib/params/invalidate')
+def api_calib_params_invalidate():
+    """
+    默认校准参数（calibration_params.is_default=1）在库中修改后调用：
+    清空本进程缓存并通知同机前台进程，随后重新读取并返回新的 param_hash。
+    """
+    if not session.get('is_admin'):
+        return resp_err('UNAUTHORIZED', '请先登录', 401)
+    try:
+        sb_invalidate_default_params()
+        _params, param_hash = sb_default_params_with_hash(fresh=True)
+    except Exception as e:
+        return resp_err('PARAMS_LOAD_FAIL', f'读取默认参数失败: {e}', 500)
+    name, _aid = _admin_actor()
+    _log('params:invalidate', by=name, param_hash=param_hash)
+    return resp_ok({'param_hash': param_hash}, message='默认参数缓存已刷新')
+
 @calib_admin_bp.post('/admin/api/calib/cleanup-unbound-audio')
 def api_calib_cleanup_unbound_audio():
     """
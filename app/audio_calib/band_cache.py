@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+"""
+band_cache: 逐文件 A 计权频带能量矩阵（K×T，bands_time_energy_A 的输出）持久缓存
+- 键：音频文件 sha256 + 影响滤波结果的参数（采样率/裁剪/高通/频带/帧长帧移/滤波器组参数）
+  + 代码指纹（CODE_VERSION + pipeline.py 内容摘要；升级代码即整体失效）
+- 文件：{BAND_CACHE_DIR}/{sha[:2]}/{sha}_{spec_hash}.npy，按 mmap（copy-on-write）读取
+- 仅下游参数（mad_tau、sweep_rpm_bin 等）变化时，预览/绑定/重建可直接跳过滤波
+环境变量：
+  BAND_CACHE_ENABLE（默认 1）、BAND_CACHE_DIR（默认 <CURVE_CACHE_DIR>/band_energy）、
+  BAND_CACHE_MAX_MB（默认 4096；写入后按最久未使用淘汰，0 表示不限）、CODE_VERSION
+"""
+from __future__ import annotations
+import os
+import json
+import hashlib
+import tempfile
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+
+try:
+    from app.curves.pchip_cache import curve_cache_dir
+except Exception:
+    import sys
+    CURVES_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '../../app/curves'))
+    if CURVES_DIR not in sys.path:
+        sys.path.append(CURVES_DIR)
+    from pchip_cache import curve_cache_dir  # type: ignore
+
+# 缓存格式/滤波实现的版本；改变帧能量算法时递增
+_SCHEMA = 1
+
+def _env_bool(name: str, default: str = "1") -> bool:
+    return str(os.getenv(name, default)).strip().lower() not in ("0", "false", "no", "off", "")
+
+def enabled() -> bool:
+    return _env_bool("BAND_CACHE_ENABLE", "1")
+
+def cache_dir() -> str:
+    d = os.getenv("BAND_CACHE_DIR") or os.path.join(curve_cache_dir(), "band_energy")
+    os.makedirs(d, exist_ok=True)
+    return d
+
+def _max_bytes() -> int:
+    try:
+        return max(0, int(float(os.getenv("BAND_CACHE_MAX_MB", "4096")) * 1024 * 1024))
+    except Exception:
+        return 4096 * 1024 * 1024
+
+# =========================
+# 文件 sha256（按 stat 记忆）
+# =========================
+_SHA_LOCK = threading.Lock()
+_SHA_MEMO: Dict[Tuple[str, int, int], str] = {}
+
+def _stat_key(path: str) -> Tuple[str, int, int]:
+    ap = os.path.abspath(path)
+    st = os.stat(ap)
+    return ap, int(st.st_size), int(st.st_mtime_ns)
+
+def register_file_hash(path: str, sha256: str):
+    """登记已知 sha256（如 _scan_strict_and_hash 的结果），避免重复读盘计算。"""
+    try:
+        key = _stat_key(path)
+    except OSError:
+        return
+    with _SHA_LOCK:
+        _SHA_MEMO[key] = str(sha256)
+
+def file_sha256(path: str) -> str:
+    key = _stat_key(path)
+    with _SHA_LOCK:
+        hit = _SHA_MEMO.get(key)
+    if hit:
+        return hit
+    h = hashlib.sha256()
+    with open(key[0], 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            h.update(chunk)
+    sha = h.hexdigest()
+    with _SHA_LOCK:
+        _SHA_MEMO[key] = sha
+    return sha
+
+# =========================
+# 代码指纹
+# =========================
+_CODE_FP: Optional[str] = None
+
+def code_fingerprint() -> str:
+    """CODE_VERSION + pipeline.py 源码摘要（进程内只算一次）；频带/阶段缓存键均含此项。"""
+    global _CODE_FP
+    if _CODE_FP is None:
+        h = hashlib.sha1(os.getenv("CODE_VERSION", "").encode("utf-8") + b"\0")
+        try:
+            with open(os.path.join(os.path.dirname(os.path.abspath(__file__)), "pipeline.py"), "rb") as f:
+                h.update(f.read())
+        except OSError:
+            pass
+        _CODE_FP = h.hexdigest()[:16]
+    return _CODE_FP
+
+# =========================
+# 读写
+# =========================
+def spec_hash(spec: Dict[str, Any]) -> str:
+    s = json.dumps({'schema': _SCHEMA, 'code': code_fingerprint(), **spec},
+                   sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha1(s.encode('utf-8')).hexdigest()[:20]
+
+def _path(sha256: str, spec: Dict[str, Any]) -> str:
+    sub = os.path.join(cache_dir(), sha256[:2])
+    return os.path.join(sub, f"{sha256}_{spec_hash(spec)}.npy")
+
+def load(sha256: Optional[str], spec: Dict[str, Any]) -> Optional[np.ndarray]:
+    """命中返回 copy-on-write 内存映射的 (K, T) float64 数组；未命中/损坏返回 None。"""
+    if not sha256 or not enabled():
+        return None
+    p = _path(sha256, spec)
+    if not os.path.isfile(p):
+        return None
+    try:
+        arr = np.load(p, mmap_mode='c', allow_pickle=False)
+    except Exception:
+        return None
+    if arr.ndim != 2 or arr.dtype != np.float64:
+        return None
+    try:
+        os.utime(p, None)   # 命中刷新 mtime，淘汰按最久未使用
+    except Exception:
+        pass
+    return arr
+
+def save(sha256: Optional[str], spec: Dict[str, Any], E_A: np.ndarray) -> bool:
+    if not sha256 or not enabled():
+        return False
+    p = _path(sha256, spec)
+    d = os.path.dirname(p)
+    os.makedirs(d, exist_ok=True)
+    tmp = None
+    try:
+        fd, tmp = tempfile.mkstemp(prefix=".tmp_band_", suffix=".npy", dir=d)
+        with os.fdopen(fd, 'wb') as f:
+            np.save(f, np.ascontiguousarray(E_A, dtype=np.float64), allow_pickle=False)
+        os.replace(tmp, p)
+        tmp = None
+    except Exception:
+        return False
+    finally:
+        if tmp and os.path.exists(tmp):
+            try: os.remove(tmp)
+            except Exception: pass
+    prune_dir(cache_dir(), _max_bytes())
+    return True
+
+def prune_dir(root: str, limit: int):
+    """把 root 下一级子目录中的缓存文件按 mtime 从旧到新删除，直至总量不超过 limit 字节（<=0 不限）。"""
+    if limit <= 0:
+        return
+    items = []
+    total = 0
+    try:
+        for sub in os.scandir(root):
+            if not sub.is_dir():
+                continue
+            for e in os.scandir(sub.path):
+                if e.name.startswith('.tmp_') or not e.is_file():
+                    continue
+                st = e.stat()
+                items.append((st.st_mtime, st.st_size, e.path))
+                total += st.st_size
+    except Exception:
+        return
+    if total <= limit:
+        return
+    items.sort()
+    for _, size, p in items:
+        try:
+            os.remove(p)
+            total -= size
+        except Exception:
+            pass
+        if total <= limit:
+            break
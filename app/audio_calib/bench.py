@@ -0,0 +1,457 @@
+# -*- coding: utf-8 -*-
+"""
+bench.py - pipeline.py 离线基准（合成音频夹具 + 多规模/多频带分辨率）
+
+流程：
+  1) 用手工构造的种子模型，经 synth.synthesize_stationary_audio_from_model / synthesize_from_rpm_track
+     合成批次目录（env/、R*/ 短录音 + .AWA、sweep/ 扫频长录音）；夹具按 (规模, 采样率, 种子) 复用
+  2) 每个用例（规模 × n_per_oct × 重复）在独立 spawn 子进程中跑 run_calibration_and_model，
+     子进程内用 admin_calib._CpuMonitor 统计本进程及其进程池的 CPU，并回报峰值 RSS
+  3) 输出 JSON：各阶段耗时（calibration_phase / sweep_phase 的 *_sec）、总墙钟、CPU 核秒、峰值 RSS
+
+用法示例：
+  python bench.py --out bench.json
+  python bench.py --sizes small,medium --npo 3,12,24 --repeat 2 --out bench.json
+  python bench.py --out new.json --baseline old.json        # 附带与基线的总耗时比值
+  python bench.py --check-invert                            # 混合反演向量化实现与逐帧参考循环的等价性检查
+
+说明：
+  - 不连数据库：叶片数由 --n-blade 提供（替换 pipeline._get_fan_blades_from_db）
+  - 默认关闭 band_cache / stage_cache，测的是完整计算；--with-caches 时第二次重复即为命中路径
+"""
+import os
+import sys
+import json
+import math
+import time
+import argparse
+import platform
+import tempfile
+import subprocess
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Tuple
+
+import numpy as np
+
+# 仓库根目录（app.* / admin.* 包导入）与当前目录（synth.py 以同目录方式导入 pipeline）
+_THIS_DIR = os.path.dirname(os.path.abspath(__file__))
+_REPO_ROOT = os.path.abspath(os.path.join(_THIS_DIR, '..', '..'))
+for _p in (_REPO_ROOT, _THIS_DIR):
+    if _p not in sys.path:
+        sys.path.insert(0, _p)
+
+from app.audio_calib import pipeline  # noqa: E402  与线上一致的包路径（band_cache / stage_cache 可用）
+from app.audio_calib.pipeline import (  # noqa: E402
+    P0,
+    band_edges_from_centers,
+    make_centers_iec61260,
+    predict_spectrum_db_with_harmonics,
+    _build_pchip_anchor,
+    _harmonic_band_map,
+    _hybrid_invert_costs,
+    _invert_hybrid_track,
+    _local_baseline_pa2,
+    _local_baselines_pa2,
+)
+from synth import (  # noqa: E402
+    synthesize_stationary_audio_from_model,
+    synthesize_from_rpm_track,
+    _write_wav,
+)
+
+# 规模：锚点转速挡位数 / 每挡短录音秒数 / 扫频总秒数
+SIZES: Dict[str, Dict[str, Any]] = {
+    "small":  {"anchors": 3, "short_sec": 4.0,  "sweep_sec": 30.0},
+    "medium": {"anchors": 5, "short_sec": 8.0,  "sweep_sec": 120.0},
+    "large":  {"anchors": 8, "short_sec": 10.0, "sweep_sec": 300.0},
+}
+RPM_LO, RPM_HI = 800.0, 3000.0
+SEED_NPO = 3          # 种子模型/合成用 1/3 倍频程，合成开销小；分析分辨率与之无关
+ENV_LEVEL_DB = 8.0
+
+# ---------- 种子模型与夹具 ----------
+
+def _seed_model(n_blade: int, *, env: bool = False) -> Dict[str, Any]:
+    """构造可供 synth 使用的最小模型：宽带谱 ∝ 50·log10(rpm)，峰值约 1 kHz；env=True 时为低电平平坦谱。"""
+    centers = make_centers_iec61260(n_per_octave=SEED_NPO, fmin=20.0, fmax=20000.0)
+    rpms = np.linspace(RPM_LO * 0.5, RPM_HI * 1.2, 9)
+    bands = []
+    for fc in centers:
+        lf = math.log2(max(fc, 1e-9) / 1000.0)
+        if env:
+            ys = [ENV_LEVEL_DB - 1.5 * abs(lf) for _ in rpms]
+        else:
+            shape = -3.0 * abs(lf) - (6.0 * (math.log2(100.0 / fc)) if fc < 100.0 else 0.0)
+            ys = [22.0 + 50.0 * math.log10(r / 1000.0) + shape for r in rpms]
+        bands.append(_build_pchip_anchor(rpms.tolist(), ys))
+    harm_models = []
+    if not env and n_blade > 0:
+        for h in range(1, 5):
+            ys = [32.0 + 50.0 * math.log10(r / 1000.0) - 4.0 * (h - 1) for r in rpms]
+            harm_models.append({"h": h, "amp_pchip_db": _build_pchip_anchor(rpms.tolist(), ys)})
+    return {
+        "centers_hz": centers.tolist(),
+        "band_models_pchip": bands,
+        "rpm_min": float(rpms[0]),
+        "rpm_max": float(rpms[-1]),
+        "calibration": {
+            "n_per_oct": SEED_NPO,
+            "harmonics_enabled": bool(harm_models),
+            "harmonics": {"n_blade": int(n_blade), "kernel": {"sigma_bands": 0.25, "topk": 3},
+                          "models": harm_models},
+        },
+    }
+
+def _la_db(model: Dict[str, Any], rpm: float) -> float:
+    return float(predict_spectrum_db_with_harmonics(model, rpm)[1])
+
+def _write_awa(path: str, la_db: float):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(f"LAeq,T={la_db:.1f}\n")
+
+def _mix_env(y: np.ndarray, env_model: Dict[str, Any], fs: int, seed: int) -> np.ndarray:
+    e = synthesize_stationary_audio_from_model(env_model, 1000.0, seconds=len(y) / fs, fs=fs,
+                                               tones=False, random_seed=seed)
+    n = min(len(y), len(e))
+    return y[:n] + e[:n]
+
+def make_fixture(root: str, size: str, *, fs: int = 48000, seed: int = 0, n_blade: int = 7) -> str:
+    """生成（或复用）一个合成批次目录；完成后写 .bench_fixture.json 作为完整性标记。"""
+    spec = dict(SIZES[size], size=size, fs=int(fs), seed=int(seed), n_blade=int(n_blade))
+    d = os.path.join(os.path.abspath(root), f"{size}_fs{fs}_s{seed}_b{n_blade}")
+    marker = os.path.join(d, ".bench_fixture.json")
+    try:
+        with open(marker, "r", encoding="utf-8") as f:
+            if json.load(f) == spec:
+                return d
+    except Exception:
+        pass
+
+    fan = _seed_model(n_blade)
+    env = _seed_model(0, env=True)
+    t0 = time.perf_counter()
+
+    # env：仅环境噪声
+    os.makedirs(os.path.join(d, "env"), exist_ok=True)
+    y = synthesize_stationary_audio_from_model(env, 1000.0, seconds=spec["short_sec"], fs=fs,
+                                               tones=False, random_seed=seed)
+    _write_wav(os.path.join(d, "env", "env.wav"), y, fs)
+    _write_awa(os.path.join(d, "env", "env.AWA"), _la_db(env, 1000.0))
+
+    # 短录音锚点：风扇 + 环境
+    rpms = np.linspace(RPM_LO, RPM_HI, int(spec["anchors"]))
+    for i, rpm in enumerate(rpms):
+        rd = os.path.join(d, f"R{int(round(rpm))}")
+        os.makedirs(rd, exist_ok=True)
+        y = synthesize_stationary_audio_from_model(fan, float(rpm), seconds=spec["short_sec"], fs=fs,
+                                                   random_seed=seed + 1 + i)
+        _write_wav(os.path.join(rd, f"R{int(round(rpm))}.wav"), _mix_env(y, env, fs, seed + 101 + i), fs)
+        la = 10.0 * math.log10(10.0 ** (_la_db(fan, rpm) / 10.0) + 10.0 ** (_la_db(env, 1000.0) / 10.0))
+        _write_awa(os.path.join(rd, f"R{int(round(rpm))}.AWA"), la)
+
+    # 扫频：首尾各 10% 保持，中间线性爬升；每 2 秒一段
+    step = 2.0
+    n_steps = max(3, int(round(spec["sweep_sec"] / step)))
+    hold = max(1, n_steps // 10)
+    ramp = np.linspace(RPM_LO, RPM_HI, n_steps - 2 * hold)
+    track = [(RPM_LO, step)] * hold + [(float(r), step) for r in ramp] + [(RPM_HI, step)] * hold
+    y = synthesize_from_rpm_track(fan, track, fs=fs)
+    os.makedirs(os.path.join(d, "sweep"), exist_ok=True)
+    _write_wav(os.path.join(d, "sweep", "sweep.wav"), _mix_env(y, env, fs, seed + 999), fs)
+    e_mean = float(np.mean([10.0 ** (_la_db(fan, r) / 10.0) for r, _ in track]))
+    _write_awa(os.path.join(d, "sweep", "sweep.AWA"),
+               10.0 * math.log10(e_mean + 10.0 ** (_la_db(env, 1000.0) / 10.0)))
+
+    with open(marker, "w", encoding="utf-8") as f:
+        json.dump(spec, f)
+    print(f"[bench] fixture {size}: {d} ({time.perf_counter() - t0:.1f}s)", flush=True)
+    return d
+
+# ---------- 单用例（子进程） ----------
+
+def _peak_rss_mb() -> Dict[str, float]:
+    try:
+        import resource
+        scale = 1.0 / 1024.0 if sys.platform != "darwin" else 1.0 / (1024.0 * 1024.0)   # Linux 为 KB
+        return {
+            "self": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale,
+            "children_max": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * scale,
+        }
+    except Exception:
+        return {}
+
+def _run_case(root: str, params: Dict[str, Any], n_blade: int, cpu_interval: float) -> Dict[str, Any]:
+    from dataclasses import asdict
+    from admin.admin_calib import _CpuMonitor
+    pipeline._get_fan_blades_from_db = lambda _mid: int(n_blade)
+    mon = _CpuMonitor(interval=cpu_interval)   # 本进程 + 短录音进程池（子进程树）
+    mon.start()
+    t0 = time.perf_counter()
+    try:
+        model, _rows = pipeline.run_calibration_and_model(root, params, out_dir=None, model_id=1)
+    finally:
+        wall = time.perf_counter() - t0
+        cpu = asdict(mon.stop())
+    cpu.pop("details", None)
+    timings = (model.get("calibration") or {}).get("timings") or {}
+    return {"wall_sec": wall, "timings": timings, "cpu": cpu, "peak_rss_mb": _peak_rss_mb(),
+            "bands": len(model.get("centers_hz") or [])}
+
+def _stage_seconds(timings: Dict[str, Any]) -> Dict[str, float]:
+    out: Dict[str, float] = {}
+    for phase in ("calibration_phase", "sweep_phase"):
+        for k, v in (timings.get(phase) or {}).items():
+            if k.endswith("_sec") and isinstance(v, (int, float)):
+                out[f"{phase}.{k}"] = float(v)
+    return out
+
+def run_case(root: str, params: Dict[str, Any], n_blade: int, cpu_interval: float = 0.1) -> Dict[str, Any]:
+    """在新 spawn 子进程中执行，保证峰值 RSS 与模块级缓存互不干扰。"""
+    import multiprocessing as mp
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(max_workers=1, mp_context=mp.get_context("spawn")) as pool:
+        res = pool.submit(_run_case, root, params, n_blade, cpu_interval).result()
+    return {
+        "wall_sec": res["wall_sec"],
+        "stages_sec": _stage_seconds(res["timings"]),
+        "cpu": res["cpu"],
+        "peak_rss_mb": res["peak_rss_mb"],
+        "bands": res["bands"],
+    }
+
+# ---------- 混合反演等价性检查 ----------
+
+def _invert_hybrid_reference(E: np.ndarray, LA: np.ndarray, valid: np.ndarray, xs: np.ndarray, la_abs_vec: np.ndarray,
+                             n_blade: int, f1: np.ndarray, f2: np.ndarray, *, h_max: int, w_la: float, w_h: float,
+                             adapt: bool, snr_db_lo: float, snr_db_hi: float) -> Tuple[np.ndarray, np.ndarray]:
+    """向量化之前的逐帧 × 逐候选循环实现（逐项保留）；返回 (R_hat, 代价矩阵 (R, T)，无效帧列为 NaN)。"""
+    K, T = E.shape
+    base_all = np.zeros_like(E)
+    for t in range(T):
+        for k in range(K):
+            base_all[k, t] = _local_baseline_pa2(E[:, t], k, win_bands=3)
+    all_costs = np.full((xs.size, T), np.nan)
+    R_hat = np.zeros((T,), float)
+    for t in range(T):
+        y_db = float(LA[t])
+        if not valid[t] or not np.isfinite(y_db):
+            R_hat[t] = R_hat[t-1] if t > 0 else float(xs[0])
+            continue
+        E_t = E[:, t]
+        base_t = base_all[:, t]
+        costs = np.zeros_like(xs)
+        for iR, R in enumerate(xs):
+            la_cost = abs(y_db - la_abs_vec[iR]) if np.isfinite(la_abs_vec[iR]) else 1e9
+            f0 = float(n_blade) * (float(R) / 60.0)
+            E_line_sum = 0.0
+            E_base_sum = 0.0
+            h_cost = 40.0
+            if np.isfinite(f0) and f0 > 0.0:
+                h_max_eff = max(1, int(min(h_max, math.floor((float(f2[-1]) / max(1e-9, f0))))))
+                for h in range(1, h_max_eff + 1):
+                    f_line = h * f0
+                    idxs = np.where((f_line >= f1) & (f_line <= f2))[0]
+                    if idxs.size == 0:
+                        continue
+                    k = int(idxs[0])
+                    decay = 1.0 / (1.0 + 0.15*(h-1))
+                    E_line_sum += max(0.0, float(E_t[k] - base_t[k])) * decay
+                    E_base_sum += max(0.0, float(base_t[k]) * decay)
+                if E_line_sum > 0.0:
+                    h_cost = -10.0 * math.log10(max(E_line_sum / (P0**2), 1e-30))
+            if adapt:
+                if E_line_sum <= 0.0:
+                    alpha = 0.0
+                elif E_base_sum <= 0.0:
+                    alpha = 1.0
+                else:
+                    snr_db = 10.0 * math.log10(max(E_line_sum / max(E_base_sum, 1e-30), 1e-30))
+                    alpha = 0.0 if snr_db <= snr_db_lo else (1.0 if snr_db >= snr_db_hi else (snr_db - snr_db_lo) / (snr_db_hi - snr_db_lo))
+                w_h_eff = w_h * alpha
+            else:
+                w_h_eff = w_h
+            costs[iR] = w_la * la_cost + w_h_eff * h_cost
+        all_costs[:, t] = costs
+        R_hat[t] = float(xs[int(np.argmin(costs))])
+    return R_hat, all_costs
+
+def _synthetic_invert_case(n_blade: int, seed: int, *, npo: int = 3, T: int = 48) -> Dict[str, Any]:
+    """
+    合成频带能量：宽带 + 沿转速轨迹的叶片通过谐波（部分帧谐波被噪声淹没 / 置零），
+    转速下限使低转速候选的 f0 落在最低频带之下（无对应频带）；首尾与若干帧无效或 LA 为 NaN。
+    """
+    rng = np.random.default_rng(seed)
+    centers = make_centers_iec61260(n_per_octave=npo, fmin=20.0, fmax=8000.0)
+    f1, f2 = band_edges_from_centers(centers, npo, grid="iec-decimal")
+    xs = np.arange(120.0, 2400.0 + 1e-9, 3.0)
+    la_abs_vec = 20.0 + 40.0 * np.log10(xs / 1000.0)
+    la_abs_vec[::97] = np.nan                              # 部分候选无 LA 拟合值
+    track = np.linspace(150.0, 2300.0, T) + rng.normal(0.0, 20.0, T)
+    E = (P0**2) * 10.0 ** (rng.uniform(0.5, 3.0, (centers.size, T)))
+    for t, r in enumerate(track):
+        f0 = n_blade * r / 60.0
+        for h in range(1, 5):
+            hit = np.nonzero((h * f0 >= f1) & (h * f0 <= f2))[0]
+            if hit.size and rng.random() > 0.2:
+                E[hit[0], t] *= 10.0 ** rng.uniform(0.0, 2.5)
+    E[:, rng.choice(T, 3, replace=False)] = 0.0           # 全零帧：无谐波超出、基线为 0
+    LA = 20.0 + 40.0 * np.log10(np.maximum(track, 1.0) / 1000.0) + rng.normal(0.0, 0.5, T)
+    LA[rng.choice(T, 2, replace=False)] = np.nan
+    valid = np.ones((T,), dtype=bool)
+    valid[:2] = False
+    valid[-2:] = False
+    return {"E": E, "LA": LA, "valid": valid, "xs": xs, "la_abs_vec": la_abs_vec, "f1": f1, "f2": f2}
+
+def check_invert(seeds: int = 3) -> Dict[str, Any]:
+    """逐用例比较 _invert_hybrid_track / _hybrid_invert_costs 与参考循环：基线、代价（相对误差）、所选转速。"""
+    cases = []
+    ok = True
+    for n_blade in (1, 3, 7, 11):
+        for adapt in (False, True):
+            for seed in range(seeds):
+                c = _synthetic_invert_case(n_blade, seed)
+                kw = dict(h_max=6, w_la=1.0, w_h=0.6, adapt=adapt, snr_db_lo=5.0, snr_db_hi=20.0)
+                t0 = time.perf_counter()
+                ref_track, ref_costs = _invert_hybrid_reference(c["E"], c["LA"], c["valid"], c["xs"], c["la_abs_vec"],
+                                                                n_blade, c["f1"], c["f2"], **kw)
+                t_ref = time.perf_counter() - t0
+                t0 = time.perf_counter()
+                new_track = _invert_hybrid_track(c["E"], c["LA"], c["valid"], c["xs"], c["la_abs_vec"],
+                                                 n_blade, c["f1"], c["f2"], **kw)
+                t_new = time.perf_counter() - t0
+
+                base = _local_baselines_pa2(c["E"], win_bands=3)
+                d = c["E"] - base
+                kmap = _harmonic_band_map(c["xs"], n_blade, c["f1"], c["f2"], kw["h_max"])
+                cols = np.nonzero(np.isfinite(ref_costs[0]))[0]
+                new_costs = _hybrid_invert_costs(np.where(d > 0.0, d, 0.0)[:, cols], base[:, cols], c["LA"][cols],
+                                                 kmap, c["la_abs_vec"], w_la=kw["w_la"], w_h=kw["w_h"], adapt=adapt,
+                                                 snr_db_lo=kw["snr_db_lo"], snr_db_hi=kw["snr_db_hi"])
+                rc = ref_costs[:, cols]
+                cost_err = float(np.max(np.abs(new_costs - rc) / np.maximum(1.0, np.abs(rc)))) if cols.size else 0.0
+                no_band = int(np.count_nonzero(kmap[:, 0] < 0))
+                mism = int(np.count_nonzero(new_track != ref_track))
+                case_ok = mism == 0 and cost_err <= 1e-9
+                ok = ok and case_ok
+                cases.append({"n_blade": n_blade, "adapt": adapt, "seed": seed, "ok": case_ok,
+                              "track_mismatch": mism, "max_rel_cost_err": cost_err,
+                              "candidates_f0_no_band": no_band, "ref_sec": t_ref, "vec_sec": t_new})
+                print(f"[bench] invert n_blade={n_blade} adapt={int(adapt)} seed={seed}: "
+                      f"{'ok' if case_ok else 'MISMATCH'} frames_diff={mism} cost_err={cost_err:.2e} "
+                      f"f0_no_band={no_band} ref={t_ref:.2f}s vec={t_new:.3f}s", flush=True)
+    return {"ok": ok, "cases": cases}
+
+# ---------- 汇总 ----------
+
+def _git_rev() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=_REPO_ROOT,
+                              capture_output=True, text=True, timeout=10).stdout.strip() or None
+    except Exception:
+        return None
+
+def _env_meta() -> Dict[str, Any]:
+    import scipy
+    return {
+        "git": _git_rev(),
+        "created_at": datetime.utcnow().isoformat(timespec="seconds") + "Z",
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "scipy": scipy.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+def _compare(cases: List[Dict[str, Any]], baseline_path: str) -> List[Dict[str, Any]]:
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        base = json.load(f)
+    ref: Dict[Tuple[str, int], List[float]] = {}
+    for c in base.get("cases") or []:
+        ref.setdefault((c.get("size"), c.get("n_per_oct")), []).append(float(c.get("wall_sec") or 0.0))
+    out = []
+    seen = set()
+    for c in cases:
+        k = (c["size"], c["n_per_oct"])
+        if k in seen or k not in ref:
+            continue
+        seen.add(k)
+        cur = min(x["wall_sec"] for x in cases if (x["size"], x["n_per_oct"]) == k)
+        old = min(ref[k])
+        out.append({"size": k[0], "n_per_oct": k[1], "baseline_sec": old, "current_sec": cur,
+                    "ratio": (cur / old) if old > 0 else None})
+    return out
+
+def main():
+    ap = argparse.ArgumentParser(description="pipeline.py 离线基准：合成夹具 + 多规模/多频带分辨率")
+    ap.add_argument("--out", type=str, default="", help="结果 JSON 路径（默认仅打印）")
+    ap.add_argument("--work", type=str, default=os.path.join(tempfile.gettempdir(), "fancool_bench_fixtures"),
+                    help="夹具目录（可复用）")
+    ap.add_argument("--sizes", type=str, default="small,medium", help=f"规模列表：{','.join(SIZES)}")
+    ap.add_argument("--npo", type=str, default="3,12", help="分析的每倍频程带数列表")
+    ap.add_argument("--repeat", type=int, default=1, help="每个用例重复次数")
+    ap.add_argument("--fs", type=int, default=48000, help="夹具采样率")
+    ap.add_argument("--seed", type=int, default=0, help="夹具随机种子")
+    ap.add_argument("--n-blade", type=int, default=7, help="叶片数（决定谐波）")
+    ap.add_argument("--num-workers", type=int, default=0, help="params.num_workers（0 = CPU 数）")
+    ap.add_argument("--params", type=str, default="", help="额外参数 JSON（文件路径或字面量），覆盖默认")
+    ap.add_argument("--with-caches", action="store_true", help="不关闭 band_cache / stage_cache")
+    ap.add_argument("--baseline", type=str, default="", help="基线结果 JSON：输出总耗时比值")
+    ap.add_argument("--check-invert", action="store_true",
+                    help="只做混合反演等价性检查（向量化实现 vs 逐帧参考循环），不一致时退出码为 1")
+    args = ap.parse_args()
+
+    if args.check_invert:
+        res = check_invert()
+        if args.out:
+            with open(args.out, "w", encoding="utf-8") as f:
+                json.dump(res, f, ensure_ascii=False, indent=2)
+        raise SystemExit(0 if res["ok"] else 1)
+
+    sizes = [s.strip() for s in args.sizes.split(",") if s.strip()]
+    for s in sizes:
+        if s not in SIZES:
+            raise SystemExit(f"未知规模：{s}")
+    npos = [int(x) for x in args.npo.split(",") if x.strip()]
+
+    extra: Dict[str, Any] = {}
+    if args.params:
+        src = args.params
+        if os.path.isfile(src):
+            with open(src, "r", encoding="utf-8") as f:
+                src = f.read()
+        extra = json.loads(src)
+
+    cases: List[Dict[str, Any]] = []
+    for size in sizes:
+        root = make_fixture(args.work, size, fs=args.fs, seed=args.seed, n_blade=args.n_blade)
+        for npo in npos:
+            params: Dict[str, Any] = {"n_per_oct": int(npo), "fs": int(args.fs)}
+            if args.num_workers > 0:
+                params["num_workers"] = int(args.num_workers)
+            if not args.with_caches:
+                params.update(band_cache=False, stage_cache=False)
+            params.update(extra)
+            for rep in range(max(1, int(args.repeat))):
+                r = run_case(root, params, args.n_blade)
+                r.update(size=size, n_per_oct=int(npo), repeat=rep)
+                cases.append(r)
+                print(f"[bench] {size} npo={npo} #{rep}: wall={r['wall_sec']:.2f}s "
+                      f"cpu={r['cpu']['cpu_core_seconds']:.2f}core·s "
+                      f"rss={r['peak_rss_mb'].get('self', float('nan')):.0f}MB", flush=True)
+
+    result: Dict[str, Any] = {"meta": _env_meta(), "sizes": {s: SIZES[s] for s in sizes}, "cases": cases}
+    if args.baseline:
+        result["compare"] = _compare(cases, args.baseline)
+        for c in result["compare"]:
+            print(f"[bench] vs baseline {c['size']} npo={c['n_per_oct']}: "
+                  f"{c['baseline_sec']:.2f}s -> {c['current_sec']:.2f}s (x{c['ratio']:.3f})", flush=True)
+    text = json.dumps(result, ensure_ascii=False, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text)
+        print(f"已写出: {args.out}")
+    else:
+        print(text)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+"""
+stage_cache: 构模分阶段产物的持久化（增量重建）
+- 阶段链：calib（env 基线 + 短录音锚点）→ 频带帧（band_cache）→ invert（转速反演）→ binning（分箱建模）→ harmonics
+- 每个阶段的键 = 上游阶段键 + 该阶段实际读取的参数（STAGE_PARAMS）+ 额外输入；任一变化只使本阶段及下游失效
+- 各阶段键另含代码指纹（CODE_VERSION + pipeline.py 摘要，见 band_cache.code_fingerprint），升级代码后全部重算
+- 文件：{STAGE_CACHE_DIR}/{stage}/{key}.json（元数据/JSON 产物）与可选的 {key}.npz（数组产物）；json 最后落盘，
+  其存在即表示该阶段产物完整
+环境变量：STAGE_CACHE_ENABLE（默认 1）、STAGE_CACHE_DIR（默认 <CURVE_CACHE_DIR>/stages）、STAGE_CACHE_MAX_MB（默认 1024）、
+  CODE_VERSION
+"""
+from __future__ import annotations
+import os
+import json
+import hashlib
+import tempfile
+from typing import Any, Dict, Iterable, Optional
+
+import numpy as np
+
+from .band_cache import code_fingerprint, curve_cache_dir, prune_dir
+
+_SCHEMA = 1
+
+# 各阶段读取的参数（calib 阶段另含滤波器组参数）；新增参数时在此登记
+_FB_PARAMS = ('bands_filter_order', 'use_fir_cpb', 'fir_base_taps',
+              'bands_multirate', 'multirate_max_levels', 'frame_energy_mode')
+STAGE_PARAMS: Dict[str, tuple] = {
+    'calib': ('fs', 'n_per_oct', 'fmin_hz', 'fmax_hz', 'frame_sec', 'hop_sec', 'band_grid',
+              'trim_head_sec', 'trim_tail_sec', 'highpass_hz',
+              'env_agg_per_frame', 'env_agg_per_band', 'meas_agg_per_frame', 'meas_agg_per_band',
+              'env_mad_pre_band', 'meas_mad_pre_band', 'mad_tau', 'snr_ratio_min', 'env_band_percentile',
+              'perfile_median', 'collect_raw_anchor') + _FB_PARAMS,
+    'invert': ('rpm_invert_mode', 'rpm_invert_w_la', 'rpm_invert_w_h', 'rpm_invert_h_max',
+               'rpm_invert_adapt_enable', 'rpm_invert_adapt_snr_db_lo', 'rpm_invert_adapt_snr_db_hi',
+               'sweep_head_align_sec', 'sweep_tail_align_sec'),
+    'binning': ('sweep_rpm_bin', 'sweep_stable_only', 'sweep_max_rpm_deriv', 'sweep_max_la_deriv',
+                'sweep_snr_ratio_min', 'sweep_snr_ratio_min_low', 'sweep_low_freq_hz',
+                'sweep_bin_qf_percent', 'sweep_env_floor_dbA', 'sweep_min_count_per_bin',
+                'auto_widen_min_med', 'auto_widen_factor',
+                'lowfreq_mean_smooth_below_hz', 'lowfreq_mean_min_points', 'lowfreq_mean_max_span_bands'),
+    'harmonics': ('harmonics_enable',),
+}
+
+def _env_bool(name: str, default: str = "1") -> bool:
+    return str(os.getenv(name, default)).strip().lower() not in ("0", "false", "no", "off", "")
+
+def enabled() -> bool:
+    return _env_bool("STAGE_CACHE_ENABLE", "1")
+
+def cache_dir() -> str:
+    d = os.getenv("STAGE_CACHE_DIR") or os.path.join(curve_cache_dir(), "stages")
+    os.makedirs(d, exist_ok=True)
+    return d
+
+def _max_bytes() -> int:
+    try:
+        return max(0, int(float(os.getenv("STAGE_CACHE_MAX_MB", "1024")) * 1024 * 1024))
+    except Exception:
+        return 1024 * 1024 * 1024
+
+def digest(obj: Any) -> str:
+    s = json.dumps(obj, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha1(s.encode('utf-8')).hexdigest()
+
+def stage_key(stage: str, upstream: str, params: Dict[str, Any], **extra) -> str:
+    """阶段键：代码指纹 + 上游键 + 本阶段参数（缺省值统一记为 None）+ 额外输入。"""
+    keys: Iterable[str] = STAGE_PARAMS.get(stage, ())
+    return digest({'schema': _SCHEMA, 'code': code_fingerprint(), 'stage': stage, 'up': upstream,
+                   'p': {k: params.get(k) for k in keys}, 'x': extra})
+
+def _paths(stage: str, key: str):
+    d = os.path.join(cache_dir(), stage)
+    return d, os.path.join(d, f"{key}.json"), os.path.join(d, f"{key}.npz")
+
+def load(stage: str, key: Optional[str]) -> Optional[Dict[str, Any]]:
+    """命中返回 {'meta': dict, 'arrays': {name: ndarray}}；未命中/损坏返回 None。"""
+    if not key or not enabled():
+        return None
+    _, pj, pz = _paths(stage, key)
+    if not os.path.isfile(pj):
+        return None
+    try:
+        with open(pj, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        arrays: Dict[str, np.ndarray] = {}
+        if meta.get('_has_arrays'):
+            with np.load(pz, allow_pickle=False) as z:
+                arrays = {k: z[k] for k in z.files}
+        os.utime(pj, None)
+    except Exception:
+        return None
+    meta.pop('_has_arrays', None)
+    return {'meta': meta, 'arrays': arrays}
+
+def _atomic_write(path: str, writer, suffix: str):
+    d = os.path.dirname(path)
+    fd, tmp = tempfile.mkstemp(prefix=".tmp_stage_", suffix=suffix, dir=d)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            writer(f)
+        os.replace(tmp, path)
+        tmp = None
+    finally:
+        if tmp and os.path.exists(tmp):
+            try: os.remove(tmp)
+            except Exception: pass
+
+def save(stage: str, key: Optional[str], meta: Optional[Dict[str, Any]] = None,
+         arrays: Optional[Dict[str, np.ndarray]] = None) -> bool:
+    if not key or not enabled():
+        return False
+    d, pj, pz = _paths(stage, key)
+    os.makedirs(d, exist_ok=True)
+    body = dict(meta or {})
+    body['_has_arrays'] = bool(arrays)
+    try:
+        if arrays:
+            _atomic_write(pz, lambda f: np.savez(f, **{k: np.asarray(v) for k, v in arrays.items()}), ".npz")
+        data = json.dumps(body, ensure_ascii=False).encode('utf-8')
+        _atomic_write(pj, lambda f: f.write(data), ".json")
+    except Exception:
+        return False
+    prune_dir(cache_dir(), _max_bytes())
+    return True
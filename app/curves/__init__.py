@@ -2,13 +2,16 @@ from .pchip_cache import (
     curve_cache_dir,
     raw_points_hash,
     eval_pchip,
+    eval_pchip_many,
+    eval_pchip_many_models,
+    PchipModel,
 )
 
 __all__ = [
     "curve_cache_dir",
     "raw_points_hash",
     "eval_pchip",
+    "eval_pchip_many",
+    "eval_pchip_many_models",
+    "PchipModel",
 ]
-
-
-
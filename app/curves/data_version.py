@@ -0,0 +1,132 @@
+"""
+性能数据版本戳（按 (model_id, condition_id)）：
+
+- 由 fan_performance_data 的对外行聚合得出（行数 / data_id 和 / 最近 update_date / 对外 batch_id），
+  admin 端的激活、关闭、替换、补空编辑都会改变其中至少一项
+- 进程内整表快照，至多每 DATA_VERSION_POLL_SEC 秒（默认 5）刷新一次；热路径仅做字典查找 + 整数比较
+- 首次加载在请求线程内同步完成；之后过期时由后台线程刷新（非阻塞抢锁，同时只刷一次），期间继续使用旧快照
+- 数据源由应用注册（set_version_source），未注册或读取失败时返回 None，调用方回退到原始点散列
+- 调用方须在读取性能行之前取版本（version_snapshot + version_in），否则快照恰在两者之间刷新时，
+  由旧行构建的模型会被打上新版本，此后各级缓存按版本命中、不再校验散列
+"""
+import os
+import time
+import hashlib
+import threading
+from typing import Callable, Dict, List, Optional, Tuple
+
+VERSION_SQL = """
+  SELECT model_id, condition_id,
+         COUNT(*) AS n, COALESCE(SUM(data_id),0) AS s, MAX(update_date) AS u, MAX(batch_id) AS b
+  FROM fan_performance_data
+  WHERE is_valid=1
+  GROUP BY model_id, condition_id
+"""
+
+def _env_poll_sec() -> float:
+    try:
+        return max(0.0, float(os.getenv("DATA_VERSION_POLL_SEC", "5")))
+    except Exception:
+        return 5.0
+
+_SOURCE: Optional[Callable[[], List[dict]]] = None
+_LOCK = threading.Lock()
+_VERSIONS: Dict[Tuple[int, int], int] = {}
+_COND_STAMPS: Dict[int, int] = {}
+_LOADED_AT = 0.0
+_LOADED = False
+_REFRESHING = False
+
+def set_version_source(fn: Optional[Callable[[], List[dict]]]):
+    """注册快照读取函数：返回 VERSION_SQL 形态的行（dict）。"""
+    global _SOURCE, _LOADED_AT, _LOADED
+    with _LOCK:
+        _SOURCE = fn
+        _LOADED_AT = 0.0
+        _LOADED = False
+
+def _stamp(*parts) -> int:
+    buf = "|".join(str(p) for p in parts)
+    return int.from_bytes(hashlib.blake2b(buf.encode("utf-8"), digest_size=8).digest(), "big")
+
+def _refresh_locked():
+    global _VERSIONS, _COND_STAMPS, _LOADED_AT, _LOADED
+    _LOADED_AT = time.time()
+    try:
+        rows = _SOURCE() if _SOURCE else None
+    except Exception:
+        rows = None
+    if rows is None:
+        return
+    versions: Dict[Tuple[int, int], int] = {}
+    per_cond: Dict[int, List[Tuple[int, int]]] = {}
+    for r in rows:
+        mid = int(r['model_id']); cid = int(r['condition_id'])
+        v = _stamp(r.get('n'), r.get('s'), r.get('u'), r.get('b'))
+        versions[(mid, cid)] = v
+        per_cond.setdefault(cid, []).append((mid, v))
+    _VERSIONS = versions
+    _COND_STAMPS = {cid: _stamp(*sorted(items)) for cid, items in per_cond.items()}
+    _LOADED = True
+
+def _stale() -> bool:
+    return (time.time() - _LOADED_AT) >= _env_poll_sec()
+
+def _refresh_bg():
+    global _REFRESHING
+    try:
+        with _LOCK:
+            _refresh_locked()
+    finally:
+        _REFRESHING = False
+
+def _ensure_fresh():
+    global _REFRESHING
+    if _SOURCE is None:
+        return
+    if _LOADED and not _stale():
+        return
+    if _LOADED:
+        # 已有快照：不在请求线程上等待整表聚合，交给后台线程刷新
+        if _REFRESHING or not _LOCK.acquire(blocking=False):
+            return
+        try:
+            if _REFRESHING or not _stale():
+                return
+            _REFRESHING = True
+        finally:
+            _LOCK.release()
+        try:
+            threading.Thread(target=_refresh_bg, name="data-version-refresh", daemon=True).start()
+        except Exception:
+            _REFRESHING = False
+        return
+    with _LOCK:
+        if _LOADED and not _stale():
+            return
+        _refresh_locked()
+
+def version_snapshot() -> Optional[Dict[Tuple[int, int], int]]:
+    """当前整表快照（刷新时整体替换，取到的字典不再变化）；无快照时返回 None。读取性能行之前调用。"""
+    _ensure_fresh()
+    return _VERSIONS if _LOADED else None
+
+def version_in(snapshot: Optional[Dict[Tuple[int, int], int]], model_id: int, condition_id: int) -> Optional[int]:
+    """从 version_snapshot() 的结果中取 (model_id, condition_id) 的版本。"""
+    if snapshot is None:
+        return None
+    return snapshot.get((int(model_id), int(condition_id)), 0)
+
+def perf_data_version(model_id: int, condition_id: int) -> Optional[int]:
+    """(model_id, condition_id) 的当前数据版本；无快照时返回 None。"""
+    _ensure_fresh()
+    if not _LOADED:
+        return None
+    return _VERSIONS.get((int(model_id), int(condition_id)), 0)
+
+def condition_data_stamp(condition_id: int) -> Optional[int]:
+    """工况级数据戳（该工况下各型号版本的组合）；无快照时返回 None。"""
+    _ensure_fresh()
+    if not _LOADED:
+        return None
+    return _COND_STAMPS.get(int(condition_id), 0)
@@ -0,0 +1,167 @@
+"""
+进程内共享的 SQLAlchemy engine 工厂：同一 DSN 在一个进程内只建一个带连接池的 engine，
+前台接口 / 频谱重建 / 管理端 / pipeline 共用，避免按调用新建 engine（泄漏连接、每次重连）。
+
+- 连接池大小按进程角色取值：public（前台 worker）、admin（管理端）、worker（重建子进程）、cli（离线脚本）
+  角色由入口调用 set_role() 指定，或环境变量 DB_POOL_ROLE；默认 public
+- fork 后子进程自动丢弃继承的连接（dispose(close=False)），按子进程角色重建连接池
+- 指标：db_pool_wait_seconds（取连接耗时，含排队与新建连接）、db_pool_timeouts、db_pool 仪表（占用/空闲/溢出）
+环境变量（角色专用值优先，如 DB_POOL_SIZE_ADMIN）：
+  DB_POOL_SIZE、DB_POOL_MAX_OVERFLOW、DB_POOL_TIMEOUT（秒）、DB_POOL_RECYCLE（秒，默认 1800）
+用法：
+  from app.curves.dbpool import get_engine
+  engine = get_engine(os.getenv('FANDB_DSN', ...), name='fandb')
+"""
+import os
+import time
+import threading
+from typing import Dict, Tuple
+
+from sqlalchemy import create_engine, exc
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.pool import QueuePool
+
+try:
+    from . import metrics as _metrics
+except ImportError:
+    import metrics as _metrics  # type: ignore
+
+# 角色默认值：(pool_size, max_overflow, timeout)
+_ROLE_DEFAULTS: Dict[str, Tuple[int, int, float]] = {
+    "public": (10, 20, 10.0),
+    "admin": (5, 10, 30.0),
+    "worker": (2, 2, 30.0),
+    "cli": (4, 4, 30.0),
+}
+
+_LOCK = threading.Lock()
+_ENGINES: Dict[str, Engine] = {}
+_role = (os.getenv("DB_POOL_ROLE") or "public").strip().lower()
+
+POOL_WAIT_SECONDS = _metrics.histogram("db_pool_wait_seconds", "Time to obtain a pooled DB connection", ("db",),
+                                       buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0))
+POOL_TIMEOUTS = _metrics.counter("db_pool_timeouts", "Connection checkouts that timed out waiting for the pool", ("db",))
+
+def _env_num(name: str, role: str, default: float) -> float:
+    for key in (f"{name}_{role.upper()}", name):
+        v = os.getenv(key)
+        if v not in (None, ""):
+            try:
+                return float(v)
+            except ValueError:
+                pass
+    return default
+
+def pool_config(role: str = "") -> Dict[str, float]:
+    role = role or _role
+    size, overflow, timeout = _ROLE_DEFAULTS.get(role, _ROLE_DEFAULTS["public"])
+    return {
+        "pool_size": max(1, int(_env_num("DB_POOL_SIZE", role, size))),
+        "max_overflow": int(_env_num("DB_POOL_MAX_OVERFLOW", role, overflow)),
+        "timeout": max(0.1, _env_num("DB_POOL_TIMEOUT", role, timeout)),
+        "recycle": int(_env_num("DB_POOL_RECYCLE", role, 1800)),
+    }
+
+class _TimedQueuePool(QueuePool):
+    """QueuePool + 取连接计时；recreate（dispose / fork / 切换角色）时按当前角色重新取池大小。"""
+    _fc_db = ""
+
+    def connect(self):
+        t0 = time.perf_counter()
+        try:
+            return super().connect()
+        except exc.TimeoutError:
+            POOL_TIMEOUTS.inc(db=self._fc_db)
+            raise
+        finally:
+            POOL_WAIT_SECONDS.observe(time.perf_counter() - t0, db=self._fc_db)
+
+    def recreate(self):
+        cfg = pool_config()
+        self.logger.info("Pool recreating")
+        p = self.__class__(
+            self._creator,
+            pool_size=cfg["pool_size"],
+            max_overflow=cfg["max_overflow"],
+            pre_ping=self._pre_ping,
+            use_lifo=self._pool.use_lifo,
+            timeout=cfg["timeout"],
+            recycle=cfg["recycle"],
+            echo=self.echo,
+            logging_name=self._orig_logging_name,
+            reset_on_return=self._reset_on_return,
+            _dispatch=self.dispatch,
+            dialect=self._dialect,
+        )
+        p._fc_db = self._fc_db
+        return p
+
+def _poolable(dsn: str) -> bool:
+    """内存 SQLite 只能用单连接池，保持 SQLAlchemy 默认。"""
+    try:
+        url = make_url(dsn)
+    except Exception:
+        return True
+    return not (url.get_backend_name() == "sqlite" and (url.database or ":memory:") == ":memory:")
+
+def get_engine(dsn: str, name: str = "fandb", **kw) -> Engine:
+    """同一 DSN 返回同一 engine（首次调用时按当前角色建池并接入 SQL 计时）；name 为指标标签。"""
+    with _LOCK:
+        eng = _ENGINES.get(dsn)
+        if eng is not None:
+            return eng
+        args = dict(pool_pre_ping=True, future=True)
+        if _poolable(dsn):
+            cfg = pool_config()
+            args.update(poolclass=_TimedQueuePool, pool_size=cfg["pool_size"], max_overflow=cfg["max_overflow"],
+                        pool_timeout=cfg["timeout"], pool_recycle=cfg["recycle"])
+        args.update(kw)
+        eng = create_engine(dsn, **args)
+        if isinstance(eng.pool, _TimedQueuePool):
+            eng.pool._fc_db = name
+        _metrics.instrument_engine(eng, name)
+        _ENGINES[dsn] = eng
+        return eng
+
+def set_role(role: str):
+    """指定本进程角色；已建的 engine 立即按新角色重建连接池（归还的空闲连接一并关闭）。"""
+    global _role
+    role = (role or "public").strip().lower()
+    with _LOCK:
+        if role == _role:
+            return
+        _role = role
+        engines = list(_ENGINES.values())
+    for eng in engines:
+        eng.dispose()
+
+def role() -> str:
+    return _role
+
+def _after_fork_in_child():
+    # 继承自父进程的连接不可复用（同一 socket 被两个进程读写）：只丢弃、不关闭
+    global _LOCK
+    _LOCK = threading.Lock()
+    for eng in list(_ENGINES.values()):
+        try:
+            eng.dispose(close=False)
+        except Exception:
+            pass
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
+
+def _pool_stats():
+    out = {}
+    for eng in list(_ENGINES.values()):
+        p = eng.pool
+        if not isinstance(p, _TimedQueuePool):
+            continue
+        db = p._fc_db
+        out[(db, "size")] = p.size()
+        out[(db, "checked_out")] = p.checkedout()
+        out[(db, "idle")] = p.checkedin()
+        out[(db, "overflow")] = max(0, p.overflow())
+    return out
+
+_metrics.gauge_func("db_pool", "Connection pool occupancy per engine", _pool_stats, ("db", "stat"))
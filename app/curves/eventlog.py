@@ -0,0 +1,297 @@
+"""
+访问/事件日志的异步批量写入（write-behind）：请求线程只入队，后台线程攒批后多行 INSERT。
+
+- 有界队列：满时直接丢弃（不阻塞请求），计入 analytics_dropped
+- 每批：未缓存/过期用户的 (访问次数, 最近访问 id) 用一条 GROUP BY 查询补齐；
+  visit_logs 先插入（visit_index 由计数缓存递增得出），再一次查询刷新这些用户的最近访问 id，
+  最后插入 event_logs（visit_id 取缓存）
+- 批内按队列顺序切段（某用户已有事件后又来新访问时另起一段），事件总是关联入队时该用户的最近访问；
+  每段一个事务，数据错误时对半拆分重试，只有单行仍失败才计为丢弃；
+  连接类错误（数据库不可用 / 连接池超时）不拆分：整批剩余行按退避重试，用尽后整批丢弃（reason=db_unavailable）
+- 计数缓存按 TTL 过期（同一用户的请求可能落在其它 worker 进程）；有新访问的用户每批都重查计数，visit_index 不依赖缓存
+- 写线程按进程懒启动（gunicorn preload 后 fork 的 worker 各自一条）；进程退出时尽量写完剩余条目
+- 指标：analytics_enqueued / analytics_written / analytics_dropped / analytics_batch_rows / analytics_flush_seconds / analytics_queue
+环境变量：
+  EVENT_LOG_ASYNC（默认 1；0 时在请求线程内同步写入）、EVENT_LOG_QUEUE_MAX（默认 10000）、
+  EVENT_LOG_BATCH（每批最多条数，默认 500）、EVENT_LOG_FLUSH_MS（攒批等待，默认 500）、
+  EVENT_LOG_UID_CACHE（用户缓存条数，默认 50000）、EVENT_LOG_UID_TTL_SEC（默认 120）、
+  EVENT_LOG_DB_RETRIES（连接错误重试次数，默认 3；同步模式不重试）、EVENT_LOG_DB_BACKOFF_MS（首次退避，默认 1000，逐次翻倍）
+"""
+import os
+import time
+import queue
+import atexit
+import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import exc as sa_exc, text
+
+try:
+    from . import metrics as _metrics
+except ImportError:
+    import metrics as _metrics  # type: ignore
+
+log = logging.getLogger('curves.eventlog')
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, str(default)))
+    except Exception:
+        return default
+
+ENQUEUED = _metrics.counter("analytics_enqueued", "Analytics rows accepted into the write-behind queue", ("kind",))
+WRITTEN = _metrics.counter("analytics_written", "Analytics rows written to the database", ("kind",))
+DROPPED = _metrics.counter("analytics_dropped", "Analytics rows dropped", ("kind", "reason"))
+BATCH_ROWS = _metrics.histogram("analytics_batch_rows", "Rows per analytics write batch", (),
+                                buckets=(1, 5, 10, 25, 50, 100, 250, 500, 1000))
+FLUSH_SECONDS = _metrics.histogram("analytics_flush_seconds", "Analytics batch write time", ())
+
+_VISIT_SQL = """
+    INSERT INTO visit_logs
+    (user_identifier, uid_source, visit_index, is_new_user,
+     user_agent_raw, os_name, device_type,
+     screen_w, screen_h, device_pixel_ratio, language, is_touch,
+     ui_theme)
+    VALUES
+    (:uid, :usrc, :vidx, :isnew, :ua, :osn, :dtype, :sw, :sh, :dpr, :lang, :touch, :theme)
+"""
+
+_EVENT_SQL = """
+    INSERT INTO event_logs
+      (user_identifier, visit_id, event_type_code, occurred_at, page_key, target_url)
+    VALUES
+      (:u, :vid, :type, :at, :page_key, :target_url)
+"""
+
+def _is_conn_error(e: BaseException) -> bool:
+    """数据库不可用类错误：重试整批，而不是逐行拆分。"""
+    if isinstance(e, (sa_exc.OperationalError, sa_exc.InterfaceError, sa_exc.TimeoutError, sa_exc.DisconnectionError)):
+        return True
+    return isinstance(e, sa_exc.DBAPIError) and bool(e.connection_invalidated)
+
+class EventLogWriter:
+    def __init__(self, engine):
+        self.engine = engine
+        self.async_enabled = os.getenv('EVENT_LOG_ASYNC', '1') != '0'
+        self.batch = max(1, _env_int('EVENT_LOG_BATCH', 500))
+        self.flush_sec = max(0.0, _env_int('EVENT_LOG_FLUSH_MS', 500) / 1000.0)
+        self.uid_cache_max = max(0, _env_int('EVENT_LOG_UID_CACHE', 50000))
+        self.uid_ttl = max(0, _env_int('EVENT_LOG_UID_TTL_SEC', 120))
+        self.db_retries = max(0, _env_int('EVENT_LOG_DB_RETRIES', 3))
+        self.db_backoff = max(0.0, _env_int('EVENT_LOG_DB_BACKOFF_MS', 1000) / 1000.0)
+        self._q: "queue.Queue[Tuple[str, Dict[str, Any]]]" = queue.Queue(maxsize=max(1, _env_int('EVENT_LOG_QUEUE_MAX', 10000)))
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._users: "OrderedDict[str, List[Any]]" = OrderedDict()   # uid -> [访问次数, 最近访问 id, 刷新时刻]
+        self._thread: Optional[threading.Thread] = None
+        self._pid = 0
+        _metrics.gauge_func("analytics_queue", "Analytics write-behind queue depth and capacity",
+                            lambda: {("depth",): self._q.qsize(), ("max",): self._q.maxsize}, ("stat",))
+        atexit.register(self.flush)
+
+    # ---------- 入队 ----------
+    def log_visit(self, row: Dict[str, Any]):
+        """row：visit_logs 各列（uid/usrc/ua/osn/dtype/sw/sh/dpr/lang/touch/theme）；visit_index 由写线程计算。"""
+        self._submit('visit', row)
+
+    def log_event(self, row: Dict[str, Any]):
+        """row：u/type/page_key/target_url；occurred_at 取入队时刻，visit_id 由写线程补齐。"""
+        row.setdefault('at', datetime.now().replace(microsecond=0))
+        self._submit('event', row)
+
+    def peek_visit_index(self, uid: str) -> Optional[int]:
+        """用户计数已缓存时，估计本次访问序号（仅用于接口回显）。"""
+        with self._lock:
+            st = self._users.get(uid)
+            if st is None or time.monotonic() - st[2] > self.uid_ttl:
+                return None
+            return int(st[0]) + 1
+
+    def _submit(self, kind: str, row: Dict[str, Any]):
+        if not self.async_enabled:
+            ENQUEUED.inc(kind=kind)
+            self._write([(kind, row)])
+            return
+        self._ensure_thread()
+        try:
+            self._q.put_nowait((kind, row))
+            ENQUEUED.inc(kind=kind)
+        except queue.Full:
+            DROPPED.inc(kind=kind, reason='queue_full')
+
+    def _ensure_thread(self):
+        pid = os.getpid()
+        if self._pid == pid and self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._pid == pid and self._thread is not None and self._thread.is_alive():
+                return
+            self._pid = pid
+            self._thread = threading.Thread(target=self._loop, name='eventlog-writer', daemon=True)
+            self._thread.start()
+
+    # ---------- 写线程 ----------
+    def _drain(self, first: Tuple[str, Dict[str, Any]]) -> List[Tuple[str, Dict[str, Any]]]:
+        items = [first]
+        deadline = time.monotonic() + self.flush_sec
+        while len(items) < self.batch:
+            left = deadline - time.monotonic()
+            try:
+                items.append(self._q.get(timeout=left) if left > 0 else self._q.get_nowait())
+            except queue.Empty:
+                break
+        return items
+
+    def _loop(self):
+        while True:
+            try:
+                first = self._q.get()
+                self._write(self._drain(first))
+            except Exception as e:  # 写线程不可退出
+                log.warning("event log writer loop error: %s", e)
+
+    def flush(self):
+        """同步写完队列中剩余条目（进程退出 / 测试）。"""
+        while True:
+            items = []
+            try:
+                while len(items) < self.batch:
+                    items.append(self._q.get_nowait())
+            except queue.Empty:
+                pass
+            if not items:
+                return
+            self._write(items)
+
+    # ---------- 用户计数缓存 ----------
+    def _refresh_users(self, conn, uids: List[str]):
+        if not uids:
+            return
+        params = {f"u{i}": u for i, u in enumerate(uids, start=1)}
+        rows = conn.execute(text(f"""
+            SELECT user_identifier, COUNT(*) AS c, MAX(id) AS last_id
+            FROM visit_logs
+            WHERE user_identifier IN ({",".join(':' + k for k in params)})
+            GROUP BY user_identifier
+        """), params).fetchall()
+        found = {r._mapping['user_identifier']: r._mapping for r in rows}
+        now = time.monotonic()
+        with self._lock:
+            for u in uids:
+                m = found.get(u)
+                st = [int(m['c']), int(m['last_id']) if m['last_id'] is not None else None, now] if m else [0, None, now]
+                self._users[u] = st
+                self._users.move_to_end(u)
+            while len(self._users) > max(self.uid_cache_max, len(uids)):
+                self._users.popitem(last=False)
+
+    def _stale_uids(self, uids) -> List[str]:
+        now = time.monotonic()
+        with self._lock:
+            return [u for u in uids if u not in self._users or now - self._users[u][2] > self.uid_ttl]
+
+    @staticmethod
+    def _segments(items: List[Tuple[str, Dict[str, Any]]]) -> List[List[Tuple[str, Dict[str, Any]]]]:
+        """
+        按队列顺序切段：某用户在本段已有事件后又来新访问时另起一段。
+        段内各用户的访问都排在其事件之前，事件取“入队时该用户的最近访问 id”即段末的最近访问 id。
+        """
+        segs: List[List[Tuple[str, Dict[str, Any]]]] = []
+        cur: List[Tuple[str, Dict[str, Any]]] = []
+        evt_uids = set()
+        for kind, r in items:
+            if kind == 'visit' and r['uid'] in evt_uids:
+                segs.append(cur)
+                cur, evt_uids = [], set()
+            elif kind == 'event':
+                evt_uids.add(r['u'])
+            cur.append((kind, r))
+        if cur:
+            segs.append(cur)
+        return segs
+
+    def _write(self, items: List[Tuple[str, Dict[str, Any]]]):
+        t0 = time.perf_counter()
+        pending = self._segments(items)
+        attempt = 0
+        while pending:
+            left, err = self._write_retry(pending[0])
+            if not left:
+                pending.pop(0)
+                attempt = 0
+                continue
+            pending[0] = left
+            # 数据库不可用：同步模式或重试用尽时整批剩余行丢弃，否则退避后从未写入处继续
+            if not self.async_enabled or attempt >= self.db_retries:
+                rows = [kr for seg in pending for kr in seg]
+                nv = sum(1 for k, _ in rows if k == 'visit')
+                log.warning("event log database unavailable, dropped %d rows: %s", len(rows), err)
+                if nv:
+                    DROPPED.inc(nv, kind='visit', reason='db_unavailable')
+                if len(rows) > nv:
+                    DROPPED.inc(len(rows) - nv, kind='event', reason='db_unavailable')
+                break
+            time.sleep(self.db_backoff * (2 ** attempt))
+            attempt += 1
+        FLUSH_SECONDS.observe(time.perf_counter() - t0)
+        BATCH_ROWS.observe(len(items))
+
+    def _write_retry(self, items: List[Tuple[str, Dict[str, Any]]]) -> Tuple[List[Tuple[str, Dict[str, Any]]], Any]:
+        """
+        整段一个事务；数据错误时对半拆分重试（保持顺序），直到单行仍失败才计为丢弃。
+        遇到连接类错误立即停止拆分，返回 (尚未写入的行, 错误)；全部处理完返回 ([], None)。
+        """
+        try:
+            self._write_tx(items)
+        except Exception as e:
+            with self._lock:   # 计数缓存可能已被本事务递增，丢弃后由下一次写入重查
+                for k, r in items:
+                    self._users.pop(r['uid'] if k == 'visit' else r['u'], None)
+            if _is_conn_error(e):
+                return items, e
+            if len(items) > 1:
+                log.debug("event log write failed, splitting %d rows: %s", len(items), e)
+                mid = len(items) // 2
+                left, err = self._write_retry(items[:mid])
+                if left:
+                    return left + items[mid:], err
+                return self._write_retry(items[mid:])
+            kind = items[0][0]
+            log.warning("event log row dropped (%s): %s", kind, e)
+            DROPPED.inc(kind=kind, reason='write_error')
+            return [], None
+        nv = sum(1 for k, _ in items if k == 'visit')
+        if nv:
+            WRITTEN.inc(nv, kind='visit')
+        if len(items) > nv:
+            WRITTEN.inc(len(items) - nv, kind='event')
+        return [], None
+
+    def _write_tx(self, items: List[Tuple[str, Dict[str, Any]]]):
+        visits = [r for k, r in items if k == 'visit']
+        events = [r for k, r in items if k == 'event']
+        with self._write_lock, self.engine.begin() as conn:
+            visit_uids = list(dict.fromkeys(r['uid'] for r in visits))
+            event_uids = list(dict.fromkeys(r['u'] for r in events))
+            # 有新访问的用户总是重查计数；仅有事件的用户按 TTL 复用缓存
+            vset = set(visit_uids)
+            need = visit_uids + [u for u in self._stale_uids(event_uids) if u not in vset]
+            self._refresh_users(conn, need)
+            if visits:
+                with self._lock:
+                    for r in visits:
+                        st = self._users[r['uid']]
+                        st[0] += 1
+                        r['vidx'] = st[0]
+                        r['isnew'] = 1 if st[0] == 1 else 0
+                conn.execute(text(_VISIT_SQL), visits)
+                self._refresh_users(conn, visit_uids)
+            if events:
+                with self._lock:
+                    for r in events:
+                        st = self._users.get(r['u'])
+                        r['vid'] = st[1] if st else None
+                conn.execute(text(_EVENT_SQL), events)
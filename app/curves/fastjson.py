@@ -0,0 +1,171 @@
+"""
+接口响应的 JSON 编码层：
+
+- 有 orjson 时用 orjson（直接序列化 NumPy 数组），否则回退标准库 json；两者输出与 Flask jsonify 兼容
+  （datetime/date → HTTP 日期，Decimal → 字符串）；NaN/Inf 输出为 null（Flask 默认会输出非法的 NaN 字面量）
+- 可选浮点舍入（按有效数字）：曲线/频谱数组以 NumPy 向量化处理，显著缩小响应体
+- ETag：调用方用缓存元信息（数据版本、参数散列等）算出 ETag，请求带 If-None-Match 且一致时直接返回 304
+- Fragment：已编码好的 JSON 片段（如缓存的瘦身频谱模型），encode 时原样拼入，不再重复序列化
+环境变量：
+  API_JSON_FAST（默认 1；0 时回退 Flask jsonify）、API_JSON_FLOAT_DIGITS（有效数字位数，默认 0 = 不舍入）
+"""
+import os
+import re
+import json
+import math
+import hashlib
+import decimal
+from datetime import date, datetime
+from typing import Any
+
+import numpy as np
+
+try:
+    import orjson  # type: ignore
+    HAS_ORJSON = True
+except Exception:
+    orjson = None  # type: ignore
+    HAS_ORJSON = False
+
+def enabled() -> bool:
+    return (os.getenv("API_JSON_FAST", "1") or "").strip().lower() not in ("0", "false", "no", "off")
+
+def float_digits() -> int:
+    try:
+        return max(0, min(17, int(os.getenv("API_JSON_FLOAT_DIGITS", "0"))))
+    except Exception:
+        return 0
+
+# =========================
+# 浮点舍入
+# =========================
+def _round_array(a: np.ndarray, digits: int) -> np.ndarray:
+    a = np.asarray(a, dtype=np.float64)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        mag = np.floor(np.log10(np.abs(a)))
+    mag = np.where(np.isfinite(mag), mag, 0.0)
+    scale = np.power(10.0, digits - 1 - mag)
+    out = np.round(a * scale) / scale
+    return np.where(np.isfinite(a), out, a)
+
+def _round_scalar(x: float, digits: int) -> float:
+    if x == 0.0 or not math.isfinite(x):
+        return x
+    return round(x, digits - 1 - int(math.floor(math.log10(abs(x)))))
+
+def round_floats(obj: Any, digits: int) -> Any:
+    """按有效数字舍入 obj 中的所有浮点；纯数值列表/数组整体向量化（结果为 ndarray，由编码器输出）。"""
+    if digits <= 0:
+        return obj
+    t = type(obj)
+    if t is float:
+        return _round_scalar(obj, digits)
+    if t is dict:
+        return {k: round_floats(v, digits) for k, v in obj.items()}
+    if t is list or t is tuple:
+        if obj and all(type(v) is float or type(v) is int for v in obj) and any(type(v) is float for v in obj):
+            return _round_array(np.asarray(obj, dtype=np.float64), digits)
+        return [round_floats(v, digits) for v in obj]
+    if isinstance(obj, np.ndarray) and obj.dtype.kind == "f":
+        return _round_array(obj, digits)
+    return obj
+
+# =========================
+# 编码
+# =========================
+def _http_date(d) -> str:
+    from werkzeug.http import http_date
+    return http_date(d)
+
+def _default(o: Any):
+    if isinstance(o, (datetime, date)):
+        return _http_date(o)
+    if isinstance(o, decimal.Decimal):
+        return str(o)
+    if isinstance(o, np.ndarray):
+        return o.tolist()
+    if isinstance(o, np.generic):
+        return o.item()
+    if hasattr(o, "__html__"):
+        return str(o.__html__())
+    raise TypeError(f"Object of type {type(o).__name__} is not JSON serializable")
+
+def _nan_to_none(obj: Any) -> Any:
+    t = type(obj)
+    if t is float:
+        return obj if math.isfinite(obj) else None
+    if t is dict:
+        return {k: _nan_to_none(v) for k, v in obj.items()}
+    if t is list or t is tuple:
+        return [_nan_to_none(v) for v in obj]
+    if isinstance(obj, np.ndarray):
+        return _nan_to_none(obj.tolist())
+    return obj
+
+if HAS_ORJSON:
+    _OPTS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+
+    def dumps(obj: Any, default=_default) -> bytes:
+        try:
+            return orjson.dumps(obj, default=default, option=_OPTS)
+        except orjson.JSONEncodeError:
+            # 非连续/非原生字节序的数组等：退回通用路径
+            return orjson.dumps(json.loads(_std_dumps(obj, default)), option=_OPTS)
+else:
+    def dumps(obj: Any, default=_default) -> bytes:
+        return _std_dumps(obj, default).encode("utf-8")
+
+def _std_dumps(obj: Any, default=_default) -> str:
+    try:
+        return json.dumps(obj, default=default, ensure_ascii=False, separators=(",", ":"), allow_nan=False)
+    except ValueError:
+        return json.dumps(_nan_to_none(obj), default=default, ensure_ascii=False, separators=(",", ":"))
+
+class Fragment:
+    """已编码的 JSON 字节（调用方保证合法；不参与 round_floats）。"""
+    __slots__ = ("data",)
+
+    def __init__(self, data: bytes):
+        self.data = bytes(data)
+
+# =========================
+# ETag / 响应
+# =========================
+def etag_for(*parts: Any) -> str:
+    h = hashlib.blake2b(digest_size=12)
+    for p in parts:
+        h.update(str(p).encode("utf-8"))
+        h.update(b"\x1f")
+    # 编码选项影响响应体，纳入 ETag
+    h.update(f"fast={int(enabled())}|orjson={int(HAS_ORJSON)}|digits={float_digits()}".encode("ascii"))
+    return h.hexdigest()
+
+def etag_matches(etag: str, if_none_match) -> bool:
+    """if_none_match 为 werkzeug 的 ETags（request.if_none_match）。"""
+    return bool(etag) and if_none_match is not None and etag in if_none_match
+
+def encode(payload: Any, digits: int = 0) -> bytes:
+    # 片段先编码为带随机串的占位字符串（\x00 在两种编码器下都输出为 \u0000），再整体替换
+    frags = []
+    nonce = os.urandom(6).hex()
+
+    def default(o: Any):
+        if type(o) is Fragment:
+            frags.append(o.data)
+            return f"\x00{nonce}:{len(frags) - 1}\x00"
+        return _default(o)
+
+    body = dumps(round_floats(payload, digits) if digits else payload, default)
+    if frags:
+        pat = re.compile(rb'"\\u0000' + nonce.encode("ascii") + rb':(\d+)\\u0000"')
+        body = pat.sub(lambda m: frags[int(m.group(1))], body)
+    return body
+
+def body_etag(body: bytes) -> str:
+    return hashlib.blake2b(body, digest_size=12).hexdigest()
+
+def not_modified(etag: str):
+    from flask import Response
+    resp = Response(status=304)
+    resp.set_etag(etag)
+    return resp
@@ -0,0 +1,537 @@
+"""
+进程内轻量指标（计数器 / 直方图 / 回调仪表）与 Prometheus 文本导出：
+
+- 无第三方依赖；每个进程一份注册表
+- 多进程（gunicorn 多 worker）：设置 METRICS_MULTIPROC_DIR（各 worker 共享、启动前清空的目录）后，
+  每个进程每 METRICS_FLUSH_SEC 秒（默认 5）及退出时把注册表快照写入 {dir}/metrics_{pid}.json；
+  /metrics 由被抓到的 worker 合并全部快照：计数器/直方图跨进程求和（不带 pid 标签；已退出进程的累计值并入
+  归档文件，总数不回退），仪表只取存活进程并带 pid 标签。未设置时只导出本进程，每条样本带 pid 标签，
+  仅适用于单 worker（否则每次抓取落到不同 worker，序列在各 pid 间跳变）
+- 请求级：init_flask 在 before/after_request 中计时，并把请求内累计的 DB 时间按端点归档
+- DB：instrument_engine 通过 SQLAlchemy 游标事件统计每条语句耗时（fetch_all / exec_write / 其它直接执行均覆盖）
+- 缓存层：cache_lookup(cache, tier) 记录本次请求由哪一层满足（mem / disk / rebuild ...）
+- /metrics：默认仅回环地址可访问；设置 METRICS_TOKEN 后改为校验 Bearer token；METRICS_ENABLE=0 关闭
+"""
+import os
+import time
+import json
+import atexit
+import bisect
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+try:
+    import fcntl  # type: ignore
+except ImportError:  # Windows：单进程，不需要合并
+    fcntl = None  # type: ignore
+
+_PREFIX = "fancool_"
+_DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+def _env_enable() -> bool:
+    return (os.getenv("METRICS_ENABLE", "1") or "").strip().lower() not in ("0", "false", "no", "off")
+
+def _fmt_labels(names: Tuple[str, ...], values: Tuple[str, ...], *extra: str) -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    parts.extend(e for e in extra if e)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+def _escape(v: Any) -> str:
+    return str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _fmt_num(v: float) -> str:
+    if v == float("inf"):
+        return "+Inf"
+    return repr(float(v))
+
+# =========================
+# 指标类型
+# =========================
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, doc: str, labels: Iterable[str] = ()):
+        self.name = _PREFIX + name
+        self.doc = doc
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+
+    def _key(self, kw: Dict[str, Any]) -> Tuple[str, ...]:
+        return tuple(str(kw.get(n, "")) for n in self.labels)
+
+    def render(self, pid: str = "") -> List[str]:
+        """pid：附加到每条样本的 pid 标签（render() 按当前进程传入）。"""
+        return [f"# HELP {self.name} {self.doc}", f"# TYPE {self.name} {self.kind}"] + self._samples(pid)
+
+    def _samples(self, pid: str) -> List[str]:
+        return []
+
+    def _export(self) -> List[list]:
+        """快照：[[标签值列表, 值], ...]（多进程汇总用）。"""
+        return []
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, doc: str, labels: Iterable[str] = ()):
+        super().__init__(name, doc, labels)
+        self._vals: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, n: float = 1.0, **labels):
+        k = self._key(labels)
+        with self._lock:
+            self._vals[k] = self._vals.get(k, 0.0) + n
+
+    def value(self, **labels) -> float:
+        return self._vals.get(self._key(labels), 0.0)
+
+    def _samples(self, pid: str) -> List[str]:
+        with self._lock:
+            items = sorted(self._vals.items())
+        return _counter_lines(self.name, self.labels, items, pid)
+
+    def _export(self) -> List[list]:
+        with self._lock:
+            return [[list(k), v] for k, v in self._vals.items()]
+
+def _counter_lines(name: str, labels: Tuple[str, ...], items, pid: str = "") -> List[str]:
+    return [f"{name}_total{_fmt_labels(labels, k, pid)} {_fmt_num(v)}" for k, v in items]
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, doc: str, labels: Iterable[str] = (), buckets: Iterable[float] = _DEFAULT_BUCKETS):
+        super().__init__(name, doc, labels)
+        self.buckets = tuple(sorted(float(b) for b in buckets))
+        self._vals: Dict[Tuple[str, ...], List[float]] = {}   # [count_per_bucket..., +Inf, sum]
+
+    def observe(self, v: float, **labels):
+        k = self._key(labels)
+        i = bisect.bisect_left(self.buckets, v)
+        with self._lock:
+            row = self._vals.get(k)
+            if row is None:
+                row = self._vals[k] = [0.0] * (len(self.buckets) + 2)
+            row[i] += 1
+            row[-1] += v
+
+    def time(self, **labels) -> "_Timer":
+        return _Timer(self, labels)
+
+    def _samples(self, pid: str) -> List[str]:
+        with self._lock:
+            items = sorted((k, list(v)) for k, v in self._vals.items())
+        return _hist_lines(self.name, self.labels, self.buckets, items, pid)
+
+    def _export(self) -> List[list]:
+        with self._lock:
+            return [[list(k), list(v)] for k, v in self._vals.items()]
+
+def _hist_lines(name: str, labels: Tuple[str, ...], buckets: Tuple[float, ...], items, pid: str = "") -> List[str]:
+    out: List[str] = []
+    for k, row in items:
+        acc = 0.0
+        for b, c in zip(buckets + (float("inf"),), row[:-1]):
+            acc += c
+            le = 'le="%s"' % _fmt_num(b)
+            out.append(f"{name}_bucket{_fmt_labels(labels, k, pid, le)} {_fmt_num(acc)}")
+        out.append(f"{name}_sum{_fmt_labels(labels, k, pid)} {_fmt_num(row[-1])}")
+        out.append(f"{name}_count{_fmt_labels(labels, k, pid)} {_fmt_num(acc)}")
+    return out
+
+class _Timer:
+    def __init__(self, hist: Histogram, labels: Dict[str, Any]):
+        self.hist = hist
+        self.labels = labels
+        self.t0 = 0.0
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.hist.observe(time.perf_counter() - self.t0, **self.labels)
+        return False
+
+class GaugeFunc(_Metric):
+    """抓取时回调取值：fn 返回数值，或 {标签值元组: 数值}。"""
+    kind = "gauge"
+
+    def __init__(self, name: str, doc: str, fn: Callable[[], Any], labels: Iterable[str] = ()):
+        super().__init__(name, doc, labels)
+        self.fn = fn
+
+    def _samples(self, pid: str) -> List[str]:
+        return _gauge_lines(self.name, self.labels, self._export(), pid)
+
+    def _export(self) -> List[list]:
+        try:
+            v = self.fn()
+        except Exception:
+            return []
+        if isinstance(v, dict):
+            return [[[str(x) for x in (k if isinstance(k, tuple) else (k,))], float(x)]
+                    for k, x in v.items() if x is not None]
+        return [] if v is None else [[[], float(v)]]
+
+def _gauge_lines(name: str, labels: Tuple[str, ...], items, pid: str = "") -> List[str]:
+    return [f"{name}{_fmt_labels(labels, tuple(k), pid)} {_fmt_num(x)}" for k, x in sorted(items)]
+
+# =========================
+# 注册表
+# =========================
+_REG_LOCK = threading.Lock()
+_REGISTRY: Dict[str, _Metric] = {}
+
+def _register(m: _Metric) -> _Metric:
+    with _REG_LOCK:
+        cur = _REGISTRY.get(m.name)
+        if cur is not None:
+            return cur
+        _REGISTRY[m.name] = m
+        return m
+
+def counter(name: str, doc: str, labels: Iterable[str] = ()) -> Counter:
+    return _register(Counter(name, doc, labels))  # type: ignore[return-value]
+
+def histogram(name: str, doc: str, labels: Iterable[str] = (), buckets: Iterable[float] = _DEFAULT_BUCKETS) -> Histogram:
+    return _register(Histogram(name, doc, labels, buckets))  # type: ignore[return-value]
+
+def gauge_func(name: str, doc: str, fn: Callable[[], Any], labels: Iterable[str] = ()) -> GaugeFunc:
+    """同名重复注册时以最新回调为准（模块重载 / 两个应用同进程）。"""
+    g = GaugeFunc(name, doc, fn, labels)
+    with _REG_LOCK:
+        _REGISTRY[g.name] = g
+    return g
+
+def render() -> str:
+    with _REG_LOCK:
+        metrics = sorted(_REGISTRY.values(), key=lambda m: m.name)
+    pid = f'pid="{os.getpid()}"'
+    lines: List[str] = []
+    for m in metrics:
+        lines.extend(m.render(pid))
+    return "\n".join(lines) + "\n"
+
+# =========================
+# 公共指标
+# =========================
+HTTP_SECONDS = histogram("http_request_seconds", "HTTP request latency", ("app", "endpoint", "method", "status"))
+HTTP_DB_SECONDS = histogram("http_request_db_seconds", "DB time spent within one HTTP request", ("app", "endpoint"))
+DB_SECONDS = histogram("db_query_seconds", "SQL statement execution time", ("db", "op"))
+DB_ERRORS = counter("db_errors", "SQL statements that raised", ("db",))
+JSON_SECONDS = histogram("json_serialize_seconds", "JSON response serialization time", ("app", "endpoint"),
+                         buckets=(0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25))
+JSON_BYTES = counter("json_response_bytes", "Serialized JSON response bytes", ("app", "endpoint"))
+CACHE_LOOKUPS = counter("cache_lookups", "Cache lookups by the tier that served them", ("cache", "tier"))
+CACHE_LOAD_SECONDS = histogram("cache_load_seconds", "Disk cache load time", ("cache",),
+                               buckets=(0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5))
+
+def cache_lookup(cache: str, tier: str):
+    CACHE_LOOKUPS.inc(cache=cache, tier=tier)
+
+# =========================
+# 请求级累计（线程局部；Flask 每请求一个线程/协程）
+# =========================
+_REQ = threading.local()
+
+def _req_db_add(dt: float):
+    if getattr(_REQ, "active", False):
+        _REQ.db_sec = getattr(_REQ, "db_sec", 0.0) + dt
+
+def observe_json(seconds: float, nbytes: int = 0):
+    """由应用的 JSON 响应封装调用；端点标签取当前请求。"""
+    app_name, endpoint = getattr(_REQ, "app", ""), getattr(_REQ, "endpoint", "")
+    JSON_SECONDS.observe(seconds, app=app_name, endpoint=endpoint)
+    if nbytes:
+        JSON_BYTES.inc(nbytes, app=app_name, endpoint=endpoint)
+
+# =========================
+# SQLAlchemy
+# =========================
+def instrument_engine(engine, db: str):
+    """为 engine 的每条语句计时；同一 engine 重复调用无副作用。"""
+    if getattr(engine, "_fc_metrics", False):
+        return
+    from sqlalchemy import event
+
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("_fc_t0", []).append(time.perf_counter())
+
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        stack = conn.info.get("_fc_t0") or []
+        if not stack:
+            return
+        dt = time.perf_counter() - stack.pop()
+        head = (statement or "").lstrip()[:6].upper()
+        op = "read" if head.startswith(("SELECT", "WITH", "SHOW")) else "write"
+        DB_SECONDS.observe(dt, db=db, op=op)
+        _req_db_add(dt)
+
+    def _error(ctx):
+        try:
+            stack = ctx.connection.info.get("_fc_t0") if ctx.connection is not None else None
+            if stack:
+                stack.pop()
+        except Exception:
+            pass
+        DB_ERRORS.inc(db=db)
+
+    event.listen(engine, "before_cursor_execute", _before)
+    event.listen(engine, "after_cursor_execute", _after)
+    event.listen(engine, "handle_error", _error)
+    engine._fc_metrics = True
+
+# =========================
+# Flask
+# =========================
+def _metrics_allowed(req) -> bool:
+    token = (os.getenv("METRICS_TOKEN") or "").strip()
+    if token:
+        import hmac
+        got = (req.headers.get("Authorization") or "").removeprefix("Bearer ").strip() or (req.args.get("token") or "")
+        return hmac.compare_digest(got, token)
+    addr = (req.remote_addr or "").strip()
+    return addr in ("127.0.0.1", "::1", "localhost") or addr.startswith("127.")
+
+def init_flask(app, app_name: str, *, path: str = "/metrics"):
+    """挂载请求计时钩子与 /metrics 端点（METRICS_ENABLE=0 时不挂载）。"""
+    if not _env_enable():
+        return
+    from flask import request, Response
+
+    @app.before_request
+    def _metrics_begin():
+        _REQ.active = True
+        _REQ.t0 = time.perf_counter()
+        _REQ.db_sec = 0.0
+        _REQ.app = app_name
+        _REQ.endpoint = request.endpoint or "unmatched"
+
+    @app.after_request
+    def _metrics_end(resp):
+        if getattr(_REQ, "active", False):
+            ep = getattr(_REQ, "endpoint", "unmatched")
+            HTTP_SECONDS.observe(time.perf_counter() - _REQ.t0, app=app_name, endpoint=ep,
+                                 method=request.method, status=resp.status_code)
+            HTTP_DB_SECONDS.observe(getattr(_REQ, "db_sec", 0.0), app=app_name, endpoint=ep)
+            _REQ.active = False
+        return resp
+
+    @app.teardown_request
+    def _metrics_teardown(_exc):
+        _REQ.active = False
+
+    def _metrics_view():
+        if not _metrics_allowed(request):
+            return Response("forbidden\n", status=403, mimetype="text/plain")
+        if _mp_dir():
+            body = render_multiproc()
+        else:
+            body = render() + _process_lines([(os.getpid(), app_name, _proc_usage())])
+        return Response(body, mimetype="text/plain; version=0.0.4; charset=utf-8")
+
+    app.add_url_rule(path, endpoint="metrics", view_func=_metrics_view, methods=["GET"])
+    global _APP_NAME
+    _APP_NAME = _APP_NAME or app_name
+    _ensure_writer()
+
+def _proc_usage() -> Optional[List[float]]:
+    """[CPU 秒, 峰值 RSS 字节]；不可用时为 None。"""
+    try:
+        import resource
+        ru = resource.getrusage(resource.RUSAGE_SELF)
+        return [ru.ru_utime + ru.ru_stime, ru.ru_maxrss * 1024.0]
+    except Exception:
+        return None
+
+def _process_lines(procs: List[Tuple[int, str, Optional[List[float]]]]) -> str:
+    """procs：[(pid, 应用名, _proc_usage())]。"""
+    lines = [f"# TYPE {_PREFIX}process_info gauge"]
+    lines += [f'{_PREFIX}process_info{{app="{_escape(app)}",pid="{pid}"}} 1' for pid, app, _ in procs]
+    usage = [(pid, u) for pid, _, u in procs if u]
+    if usage:
+        lines.append(f"# TYPE {_PREFIX}process_cpu_seconds counter")
+        lines += [f'{_PREFIX}process_cpu_seconds_total{{pid="{pid}"}} {_fmt_num(u[0])}' for pid, u in usage]
+        lines.append(f"# TYPE {_PREFIX}process_max_rss_bytes gauge")
+        lines += [f'{_PREFIX}process_max_rss_bytes{{pid="{pid}"}} {_fmt_num(u[1])}' for pid, u in usage]
+    return "\n".join(lines) + "\n"
+
+# =========================
+# 多进程汇总（METRICS_MULTIPROC_DIR）
+# =========================
+_APP_NAME = ""          # 写入快照，供 process_info 使用
+_WRITER_PID = 0         # 快照写线程所在进程
+_ARCHIVE = "metrics_archive.json"
+
+def _mp_dir() -> str:
+    return (os.getenv("METRICS_MULTIPROC_DIR") or "").strip()
+
+def _env_flush_sec() -> float:
+    try:
+        return max(0.5, float(os.getenv("METRICS_FLUSH_SEC", "5")))
+    except Exception:
+        return 5.0
+
+def _snapshot() -> Dict[str, Any]:
+    with _REG_LOCK:
+        metrics = list(_REGISTRY.values())
+    out = {}
+    for m in metrics:
+        out[m.name] = {"kind": m.kind, "doc": m.doc, "labels": list(m.labels),
+                       "buckets": list(m.buckets) if isinstance(m, Histogram) else None,
+                       "samples": m._export()}
+    return {"pid": os.getpid(), "app": _APP_NAME, "usage": _proc_usage(), "metrics": out}
+
+def _write_json(path: str, obj: Any):
+    tmp = f"{path}.tmp{os.getpid()}"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(obj, f, separators=(",", ":"))
+    os.replace(tmp, path)
+
+def _read_json(path: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception:
+        return None
+
+def flush_snapshot():
+    """把本进程注册表写入 {METRICS_MULTIPROC_DIR}/metrics_{pid}.json（未设置目录时无操作）。"""
+    d = _mp_dir()
+    if not d:
+        return
+    try:
+        os.makedirs(d, exist_ok=True)
+        _write_json(os.path.join(d, f"metrics_{os.getpid()}.json"), _snapshot())
+    except Exception:
+        pass
+
+def _writer_loop():
+    while True:
+        time.sleep(_env_flush_sec())
+        flush_snapshot()
+
+def _ensure_writer():
+    global _WRITER_PID
+    if not _mp_dir() or _WRITER_PID == os.getpid():
+        return
+    _WRITER_PID = os.getpid()
+    threading.Thread(target=_writer_loop, name="metrics-flush", daemon=True).start()
+
+def _after_fork_in_child():
+    # gunicorn preload：父进程的累计值由父进程自己的快照计入，子进程从零开始，另起写线程
+    global _WRITER_PID
+    if not _mp_dir():
+        return
+    for m in list(_REGISTRY.values()):
+        if isinstance(m, (Counter, Histogram)):
+            m._lock = threading.Lock()
+            m._vals = {}
+    had_writer, _WRITER_PID = _WRITER_PID != 0, 0
+    if had_writer:
+        _ensure_writer()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
+atexit.register(flush_snapshot)
+
+def _pid_alive(pid: int) -> bool:
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+        return True
+    except ProcessLookupError:
+        return False
+    except Exception:
+        return True
+
+def _merge(acc: Dict[str, Dict[str, Any]], metrics: Dict[str, Any], pid: Optional[int] = None):
+    """计数器/直方图按标签求和；仪表仅在给出 pid（存活进程）时并入，按 (标签, pid) 区分。"""
+    for name, m in (metrics or {}).items():
+        kind = m.get("kind")
+        if kind == "gauge" and pid is None:
+            continue
+        ent = acc.setdefault(name, {"kind": kind, "doc": m.get("doc", ""), "labels": list(m.get("labels") or ()),
+                                    "buckets": m.get("buckets"), "samples": {}})
+        if ent["kind"] != kind:
+            continue
+        vals = ent["samples"]
+        for k, v in m.get("samples") or ():
+            if kind == "gauge":
+                vals[(tuple(k), pid)] = v
+            elif kind == "counter":
+                vals[tuple(k)] = vals.get(tuple(k), 0.0) + v
+            elif kind == "histogram":
+                cur = vals.get(tuple(k))
+                if cur is None:
+                    vals[tuple(k)] = list(v)
+                elif len(cur) == len(v):
+                    vals[tuple(k)] = [a + b for a, b in zip(cur, v)]
+
+def _to_export(acc: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    return {name: dict(ent, samples=[[list(k), v] for k, v in ent["samples"].items()])
+            for name, ent in acc.items() if ent["kind"] != "gauge"}
+
+def _collect(d: str) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+    """读取归档与各进程快照；已退出进程的计数器/直方图并入归档后删除其快照。调用方持目录锁。"""
+    arch_path = os.path.join(d, _ARCHIVE)
+    archive = (_read_json(arch_path) or {}).get("metrics") or {}
+    live: List[Dict[str, Any]] = []
+    dead: List[Tuple[str, Dict[str, Any]]] = []
+    for fn in sorted(os.listdir(d)):
+        if not (fn.startswith("metrics_") and fn.endswith(".json")) or fn == _ARCHIVE:
+            continue
+        try:
+            pid = int(fn[len("metrics_"):-len(".json")])
+        except ValueError:
+            continue
+        snap = _read_json(os.path.join(d, fn))
+        if snap is None:
+            continue
+        if _pid_alive(pid):
+            live.append(snap)
+        else:
+            dead.append((fn, snap))
+    if dead:
+        acc: Dict[str, Dict[str, Any]] = {}
+        _merge(acc, archive)
+        for _, snap in dead:
+            _merge(acc, snap.get("metrics"))
+        archive = _to_export(acc)
+        _write_json(arch_path, {"metrics": archive})
+        for fn, _ in dead:
+            try:
+                os.remove(os.path.join(d, fn))
+            except Exception:
+                pass
+    return archive, live
+
+def render_multiproc() -> str:
+    """合并 METRICS_MULTIPROC_DIR 下全部进程的快照（本进程先写入最新值）。"""
+    d = _mp_dir()
+    flush_snapshot()
+    lock = open(os.path.join(d, "metrics.lock"), "a+b")
+    try:
+        if fcntl is not None:
+            fcntl.flock(lock.fileno(), fcntl.LOCK_EX)
+        archive, live = _collect(d)
+    finally:
+        lock.close()
+    acc: Dict[str, Dict[str, Any]] = {}
+    _merge(acc, archive)
+    for snap in live:
+        _merge(acc, snap.get("metrics"), pid=int(snap.get("pid") or 0))
+    lines: List[str] = []
+    for name in sorted(acc):
+        ent = acc[name]
+        labels = tuple(ent["labels"])
+        lines += [f"# HELP {name} {ent['doc']}", f"# TYPE {name} {ent['kind']}"]
+        if ent["kind"] == "counter":
+            lines += _counter_lines(name, labels, sorted(ent["samples"].items()))
+        elif ent["kind"] == "histogram":
+            lines += _hist_lines(name, labels, tuple(ent["buckets"] or ()), sorted(ent["samples"].items()))
+        else:
+            for (k, pid), v in sorted(ent["samples"].items()):
+                lines += _gauge_lines(name, labels, [(k, v)], f'pid="{pid}"')
+    procs = [(int(sn.get("pid") or 0), sn.get("app") or "", sn.get("usage")) for sn in live]
+    return "\n".join(lines) + "\n" + _process_lines(sorted(procs, key=lambda p: p[0]))
@@ -0,0 +1,456 @@
+"""
+pack_store: 曲线/频谱缓存的合并存储（少量段文件 + 内存键索引），取代“每个 (型号, 工况) 一个文件”
+
+目录 <CURVE_CACHE_DIR>/pack/：
+  seg_000001.dat ...  只追加的段文件；记录 = 24 字节头（magic/键长/类型/值长/crc32）+ 键 + 值，8 字节对齐
+  head                24 字节：u64 代号 / u64 当前段号 / u64 当前段已提交长度（各进程只读映射）
+  lock                写者 flock（读者在整体重载时持共享锁）
+- 批量写：一批记录之后追加一条提交记录，扫描时只应用已提交的批次，崩溃留下的半批自动忽略并在下次写入时截断
+- 启动时只扫描记录头（跳过值）建立 键 → (段, 偏移, 长度, crc) 索引；读时按 crc 校验
+- 其它进程写入后更新 head，读者每次查询比较映射中的 head，变化时增量扫描新增部分；代号变化（压缩）时整体重载
+- 失效字节超过 CURVE_PACK_COMPACT_RATIO 且总量超过 CURVE_PACK_COMPACT_MIN_MB 时，写后自动压缩：
+  活跃记录重写到新段，代号 +1，删除旧段
+- 段号大于 head 当前段号的段文件是未完成的压缩（进程在切换 head 前被杀）遗留：读者忽略，写者持排他锁时删除
+环境变量：
+  CURVE_PACK_ENABLE（默认 1）、CURVE_PACK_SEGMENT_MB（默认 64）、CURVE_PACK_COMPACT_RATIO（默认 0.5）、
+  CURVE_PACK_COMPACT_MIN_MB（默认 16）、CURVE_PACK_FSYNC（默认 0）
+维护（仓库根目录）：
+  python -m app.curves.precompute --pack-migrate   # 把旧的 perf_*.pchb / perf_*.json / *_spectrum.json 并入并删除
+  python -m app.curves.precompute --pack-compact
+"""
+import os
+import mmap
+import zlib
+import struct
+import threading
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import fcntl  # type: ignore
+except ImportError:  # Windows：仅单进程写入安全
+    fcntl = None  # type: ignore
+
+_REC = struct.Struct("<4sIIQI")      # magic, key_len, kind, val_len, crc32(value) / 提交记录中为批内条数
+_REC_MAGIC = b"PKR1"
+_HEAD = struct.Struct("<QQQ")        # gen, last_seg, last_size
+_K_PUT, _K_DEL, _K_COMMIT = 0, 1, 2
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, str(default)))
+    except Exception:
+        return default
+
+def enabled() -> bool:
+    return str(os.getenv("CURVE_PACK_ENABLE", "1")).strip().lower() not in ("0", "false", "no", "off", "")
+
+def _pad8(n: int) -> int:
+    return (-n) % 8
+
+def _seg_name(seg: int) -> str:
+    return f"seg_{seg:06d}.dat"
+
+def _rec_bytes(key: str, vlen: int) -> int:
+    n = _REC.size + len(key.encode("utf-8")) + vlen
+    return n + _pad8(n)
+
+def _encode(kind: int, key: bytes, value: bytes, crc: int) -> bytes:
+    rec = _REC.pack(_REC_MAGIC, len(key), kind, len(value), crc) + key + value
+    return rec + b"\0" * _pad8(len(rec))
+
+class _Flock:
+    def __init__(self, path: str, exclusive: bool):
+        self.path = path
+        self.mode = (fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH) if fcntl else 0
+        self._fh = None
+    def __enter__(self):
+        self._fh = open(self.path, "a+b")
+        if fcntl is not None:
+            fcntl.flock(self._fh.fileno(), self.mode)
+        return self
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        try:
+            if fcntl is not None:
+                fcntl.flock(self._fh.fileno(), fcntl.LOCK_UN)
+        finally:
+            self._fh.close()
+        return False
+
+class PackStore:
+    def __init__(self, root: str):
+        self.root = os.path.abspath(root)
+        os.makedirs(self.root, exist_ok=True)
+        self.segment_bytes = max(1, int(_env_float("CURVE_PACK_SEGMENT_MB", 64) * 1024 * 1024))
+        self.compact_ratio = min(0.95, max(0.05, _env_float("CURVE_PACK_COMPACT_RATIO", 0.5)))
+        self.compact_min_bytes = int(_env_float("CURVE_PACK_COMPACT_MIN_MB", 16) * 1024 * 1024)
+        self.fsync = os.getenv("CURVE_PACK_FSYNC", "0") == "1"
+        self._lock = threading.RLock()
+        self._index: Dict[str, Tuple[int, int, int, int]] = {}   # key -> (seg, val_off, val_len, crc)
+        self._scanned: Dict[int, int] = {}                        # seg -> 已应用到的偏移（最后一个提交之后）
+        self._seg_bytes: Dict[int, int] = {}
+        self._live = 0
+        self._ex_held = False                                     # 本进程已持排他锁（flock 按打开的文件描述区分，不可再取共享锁）
+        self._fds: Dict[int, int] = {}
+        self._gen = -1
+        self._seen: Tuple[int, int] = (0, 0)
+        self._head_path = os.path.join(self.root, "head")
+        self._lock_path = os.path.join(self.root, "lock")
+        self._head_mm = None
+        self.stats: Dict[str, int] = {"hit": 0, "miss": 0, "put": 0, "delete": 0, "batches": 0,
+                                      "compactions": 0, "crc_error": 0, "reloads": 0}
+
+    # ---------- head ----------
+    def _ensure_head(self):
+        if self._head_mm is not None:
+            return
+        if not os.path.exists(self._head_path) or os.path.getsize(self._head_path) < _HEAD.size:
+            with _Flock(self._lock_path, True):
+                if not os.path.exists(self._head_path) or os.path.getsize(self._head_path) < _HEAD.size:
+                    with open(self._head_path, "wb") as f:
+                        f.write(_HEAD.pack(0, 0, 0))
+        with open(self._head_path, "rb") as f:
+            self._head_mm = mmap.mmap(f.fileno(), _HEAD.size, access=mmap.ACCESS_READ)
+
+    def _read_head(self) -> Tuple[int, int, int]:
+        # 写者一次 pwrite 24 字节；读到不一致的中间态只会触发一次多余的扫描（扫描以文件内容为准）
+        return _HEAD.unpack(self._head_mm[:_HEAD.size])
+
+    def _write_head(self, gen: int, last_seg: int, last_size: int):
+        fd = os.open(self._head_path, os.O_WRONLY)
+        try:
+            os.pwrite(fd, _HEAD.pack(gen, last_seg, last_size), 0)
+        finally:
+            os.close(fd)
+
+    # ---------- 段文件 ----------
+    def _seg_path(self, seg: int) -> str:
+        return os.path.join(self.root, _seg_name(seg))
+
+    def _list_segs(self) -> List[int]:
+        out = []
+        for fn in os.listdir(self.root):
+            if fn.startswith("seg_") and fn.endswith(".dat"):
+                try:
+                    out.append(int(fn[4:-4]))
+                except ValueError:
+                    pass
+        return sorted(out)
+
+    def _fd(self, seg: int) -> int:
+        fd = self._fds.get(seg)
+        if fd is None:
+            fd = os.open(self._seg_path(seg), os.O_RDONLY)
+            self._fds[seg] = fd
+        return fd
+
+    def _close_fds(self):
+        for fd in self._fds.values():
+            try:
+                os.close(fd)
+            except Exception:
+                pass
+        self._fds.clear()
+
+    def _scan(self, seg: int, start: int) -> int:
+        """从 start 扫描段文件记录头，应用已提交批次；返回最后一个提交之后的偏移。"""
+        try:
+            fd = self._fd(seg)
+            size = os.fstat(fd).st_size
+        except FileNotFoundError:
+            return start
+        pos = committed = start
+        pending: List[Tuple[int, str, int, int, int]] = []
+        while pos + _REC.size <= size:
+            raw = os.pread(fd, _REC.size + 128, pos)   # 记录头与（通常较短的）键一次读出
+            if len(raw) < _REC.size:
+                break
+            magic, klen, kind, vlen, crc = _REC.unpack_from(raw)
+            if magic != _REC_MAGIC:
+                break
+            rec_len = _REC.size + klen + vlen
+            end = pos + rec_len + _pad8(rec_len)
+            if end > size:
+                break
+            if kind == _K_COMMIT:
+                for k_kind, key, voff, vl, c in pending:
+                    old = self._index.pop(key, None)
+                    if old is not None:
+                        self._live -= _rec_bytes(key, old[2])
+                    if k_kind == _K_PUT:
+                        self._index[key] = (seg, voff, vl, c)
+                        self._live += _rec_bytes(key, vl)
+                pending = []
+                committed = end
+            else:
+                kb = raw[_REC.size:_REC.size + klen]
+                if len(kb) < klen:
+                    kb = os.pread(fd, klen, pos + _REC.size)
+                key = kb.decode("utf-8")
+                pending.append((kind, key, pos + _REC.size + klen, vlen, crc))
+            pos = end
+        self._scanned[seg] = committed
+        self._seg_bytes[seg] = committed
+        return committed
+
+    def _reload(self):
+        if self._ex_held:
+            self._reload_nolock()
+        else:
+            with _Flock(self._lock_path, False):
+                self._reload_nolock()
+        self.stats["reloads"] += 1
+
+    def _reload_nolock(self):
+        gen, last_seg, last_size = self._read_head()
+        self._index.clear()
+        self._scanned.clear()
+        self._seg_bytes.clear()
+        self._live = 0
+        self._close_fds()
+        for seg in self._list_segs():
+            if seg <= last_seg:          # 更大的段号尚未经 head 提交
+                self._scan(seg, 0)
+        self._gen = gen
+        self._seen = (last_seg, last_size)
+
+    def _refresh(self):
+        """与其它进程的写入同步；调用方持有 self._lock。"""
+        self._ensure_head()
+        gen, last_seg, last_size = self._read_head()
+        if gen != self._gen:
+            self._reload()
+            return
+        if (last_seg, last_size) == self._seen:
+            return
+        # 早于最后已知段的段都已封闭；最后已知段可能在其后又追加过
+        first = max(self._scanned) if self._scanned else 1
+        for seg in range(max(1, first), last_seg + 1):
+            if not os.path.exists(self._seg_path(seg)):
+                continue
+            self._scan(seg, self._scanned.get(seg, 0))
+        self._seen = (last_seg, last_size)
+
+    # ---------- 读 ----------
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            self._refresh()
+            ent = self._index.get(key)
+            if ent is None:
+                self.stats["miss"] += 1
+                return None
+            seg, off, n, crc = ent
+            try:
+                data = os.pread(self._fd(seg), n, off)
+            except FileNotFoundError:
+                # 段已被其它进程压缩删除：重载后再取一次
+                self._reload()
+                ent = self._index.get(key)
+                if ent is None:
+                    self.stats["miss"] += 1
+                    return None
+                seg, off, n, crc = ent
+                data = os.pread(self._fd(seg), n, off)
+        if len(data) != n or (zlib.crc32(data) & 0xFFFFFFFF) != crc:
+            self.stats["crc_error"] += 1
+            return None
+        self.stats["hit"] += 1
+        return data
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            self._refresh()
+            return key in self._index
+
+    def keys(self, prefix: str = "") -> List[str]:
+        with self._lock:
+            self._refresh()
+            return sorted(k for k in self._index if k.startswith(prefix))
+
+    def entry_size(self, key: str) -> Optional[int]:
+        with self._lock:
+            self._refresh()
+            ent = self._index.get(key)
+            return ent[2] if ent else None
+
+    def entry_stamp(self, key: str) -> Optional[Tuple[int, int]]:
+        """条目内容标识 (长度, crc32)：不读值即可判断是否被改写（压缩搬移不改变）。"""
+        with self._lock:
+            self._refresh()
+            ent = self._index.get(key)
+            return (ent[2], ent[3]) if ent else None
+
+    # ---------- 写 ----------
+    def put(self, key: str, value: bytes):
+        self.put_many({key: value})
+
+    def delete(self, key: str) -> bool:
+        with self._lock:
+            self._refresh()
+            if key not in self._index:
+                return False
+        self.put_many({key: None})
+        return True
+
+    def put_if_absent(self, key: str, value: bytes) -> bool:
+        """键不存在时写入（在排他锁内判断，不覆盖其它进程刚写入的值）；返回是否写入。"""
+        return bool(self.put_many({key: value}, if_absent=True))
+
+    def put_many(self, items: Dict[str, Optional[bytes]], *, if_absent: bool = False) -> int:
+        """
+        原子批量写：整批要么全部可见，要么全部不可见；值为 None 表示删除。
+        if_absent=True：持排他锁同步后跳过已存在的键（迁移旧文件用）。返回实际写入的条数。
+        """
+        if not items:
+            return 0
+        with self._lock:
+            self._ensure_head()
+            with _Flock(self._lock_path, True):
+                self._ex_held = True
+                try:
+                    self._refresh()
+                    if if_absent:
+                        items = {k: v for k, v in items.items() if v is not None and k not in self._index}
+                        if not items:
+                            return 0
+                    self._put_many_locked(items)
+                finally:
+                    self._ex_held = False
+        return len(items)
+
+    def _put_many_locked(self, items: Dict[str, Optional[bytes]]):
+        buf = bytearray()
+        for key, value in items.items():
+            kb = key.encode("utf-8")
+            if value is None:
+                buf += _encode(_K_DEL, kb, b"", 0)
+            else:
+                value = bytes(value)
+                buf += _encode(_K_PUT, kb, value, zlib.crc32(value) & 0xFFFFFFFF)
+        buf += _encode(_K_COMMIT, b"", b"", len(items))
+        gen, last_seg, last_size = self._read_head()
+        self._drop_orphans_locked(last_seg)
+        self._append_locked(gen, last_seg, last_size, bytes(buf))
+        n_put = sum(1 for v in items.values() if v is not None)
+        self.stats["put"] += n_put
+        self.stats["delete"] += len(items) - n_put
+        self.stats["batches"] += 1
+        if self._should_compact():
+            self._compact_locked()
+
+    def _append_locked(self, gen: int, last_seg: int, last_size: int, data: bytes) -> Tuple[int, int]:
+        seg = max(1, last_seg)
+        size = last_size if last_seg else 0
+        if size > 0 and size + len(data) > self.segment_bytes:
+            seg, size = seg + 1, 0
+        p = self._seg_path(seg)
+        fd = os.open(p, os.O_WRONLY | os.O_CREAT, 0o644)
+        try:
+            if os.fstat(fd).st_size != size:
+                os.ftruncate(fd, size)          # 丢弃崩溃遗留的未提交尾部
+            os.pwrite(fd, data, size)
+            if self.fsync:
+                os.fsync(fd)
+        finally:
+            os.close(fd)
+        self._write_head(gen, seg, size + len(data))
+        self._refresh()
+        return seg, size + len(data)
+
+    def _drop_orphans_locked(self, last_seg: int):
+        """删除段号大于 head 当前段号的段文件（压缩中途崩溃的遗留）；调用方持排他锁。"""
+        for seg in self._list_segs():
+            if seg > last_seg:
+                fd = self._fds.pop(seg, None)
+                if fd is not None:
+                    os.close(fd)
+                try:
+                    os.remove(self._seg_path(seg))
+                except FileNotFoundError:
+                    pass
+
+    # ---------- 压缩 ----------
+    def _should_compact(self) -> bool:
+        total = sum(self._seg_bytes.values())
+        if total < self.compact_min_bytes:
+            return False
+        return (total - self._live) > total * self.compact_ratio
+
+    def compact(self):
+        with self._lock:
+            self._ensure_head()
+            with _Flock(self._lock_path, True):
+                self._ex_held = True
+                try:
+                    self._refresh()
+                    self._drop_orphans_locked(self._read_head()[1])
+                    self._compact_locked()
+                finally:
+                    self._ex_held = False
+
+    def _compact_locked(self):
+        gen, last_seg, _ = self._read_head()
+        old_segs = self._list_segs()
+        seg, size = max([last_seg] + old_segs) + 1, 0
+        fd = os.open(self._seg_path(seg), os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+        batch = bytearray()
+        n_batch = 0
+        try:
+            for key in sorted(self._index):
+                s, off, n, crc = self._index[key]
+                value = os.pread(self._fd(s), n, off)
+                batch += _encode(_K_PUT, key.encode("utf-8"), value, crc)
+                n_batch += 1
+                if len(batch) >= 4 * 1024 * 1024:
+                    batch += _encode(_K_COMMIT, b"", b"", n_batch)
+                    if size > 0 and size + len(batch) > self.segment_bytes:
+                        os.close(fd)
+                        seg, size = seg + 1, 0
+                        fd = os.open(self._seg_path(seg), os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+                    os.pwrite(fd, bytes(batch), size)
+                    size += len(batch)
+                    batch, n_batch = bytearray(), 0
+            if n_batch:
+                batch += _encode(_K_COMMIT, b"", b"", n_batch)
+                if size > 0 and size + len(batch) > self.segment_bytes:
+                    os.close(fd)
+                    seg, size = seg + 1, 0
+                    fd = os.open(self._seg_path(seg), os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+                os.pwrite(fd, bytes(batch), size)
+                size += len(batch)
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+        # 新段就绪后切换代号，再删除旧段；读者见到代号变化即整体重载
+        self._write_head(gen + 1, seg, size)
+        self._close_fds()
+        for s in old_segs:
+            try:
+                os.remove(self._seg_path(s))
+            except Exception:
+                pass
+        self._reload_nolock()
+        self.stats["compactions"] += 1
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            try:
+                self._refresh()
+            except Exception:
+                pass
+            total = sum(self._seg_bytes.values())
+            return dict(self.stats, keys=len(self._index), segments=len(self._seg_bytes),
+                        bytes=total, live_bytes=self._live, gen=max(0, self._gen))
+
+# =========================
+# 按目录复用实例
+# =========================
+_STORES: Dict[str, PackStore] = {}
+_STORES_LOCK = threading.Lock()
+
+def open_store(root: str) -> PackStore:
+    root = os.path.abspath(root)
+    with _STORES_LOCK:
+        st = _STORES.get(root)
+        if st is None:
+            st = _STORES[root] = PackStore(root)
+        return st
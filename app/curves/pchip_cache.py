@@ -5,7 +5,18 @@ import hashlib
 import threading
 from collections import OrderedDict
 from datetime import datetime
-from typing import List, Dict, Any, Optional, Tuple
+from typing import List, Dict, Any, Optional, Tuple, Sequence
+
+import numpy as np
+
+try:
+    from . import metrics as _metrics
+    from .shared_arena import SharedArena
+    from . import pack_store as _pack_store
+except ImportError:
+    import metrics as _metrics  # type: ignore
+    from shared_arena import SharedArena  # type: ignore
+    import pack_store as _pack_store  # type: ignore
 
 # =========================
 # 环境参数（兼容原逻辑）
@@ -27,6 +38,8 @@ def reload_curve_params_from_env():
     _ALPHA["noise_db"]    = float(os.getenv("CURVE_SMOOTH_ALPHA_NOISE",       str(_ALPHA["noise_db"])))
     _TAU["rpm"]           = float(os.getenv("CURVE_TENSION_TAU_RPM",          str(_TAU["rpm"])))
     _TAU["noise_db"]      = float(os.getenv("CURVE_TENSION_TAU_NOISE",        str(_TAU["noise_db"])))
+    global _ENV_KEY_CACHE
+    _ENV_KEY_CACHE = None
 
 def _axis_norm(axis: str) -> str:
     return "noise_db" if axis == "noise" else axis
@@ -66,6 +79,12 @@ def curve_cache_dir() -> str:
     os.makedirs(d, exist_ok=True)
     return d
 
+def cache_pack() -> Optional["_pack_store.PackStore"]:
+    """性能/频谱模型的合并存储（<CURVE_CACHE_DIR>/pack）；CURVE_PACK_ENABLE=0 时为 None，沿用逐文件布局。"""
+    if not _pack_store.enabled():
+        return None
+    return _pack_store.open_store(os.path.join(curve_cache_dir(), "pack"))
+
 def _env_inmem_enable() -> bool:
     return _env_bool("CURVE_CACHE_INMEM_ENABLE", "1")
 
@@ -81,17 +100,90 @@ def _env_inmem_admit_hits() -> int:
 def _env_inmem_hits_window() -> int:
     return max(512, _env_int("CURVE_CACHE_INMEM_HITS_WINDOW", 4096))
 
+def _env_shared_enable() -> bool:
+    return _env_bool("CURVE_CACHE_SHARED_ENABLE", "1")
+
+def _env_shared_max_mb() -> int:
+    return max(0, _env_int("CURVE_CACHE_SHARED_MAX_MB", 256))
+
+def _env_shared_slots() -> int:
+    return max(1024, _env_int("CURVE_CACHE_SHARED_SLOTS", 65536))
+
 # =========================
-# In-Mem LRU（兼容旧逻辑）
+# In-Mem 缓存：频率草图准入 + 分段 LRU（TinyLFU 风格）
 # =========================
 
+_LIST_POINT_BYTES = 3 * (8 + 24)  # 列表形态每个节点：x/y/m 各一个指针 + float 对象
+_PROTECTED_RATIO = 0.8            # 受保护段占总预算的比例，其余为试用段
+
+class _FreqSketch:
+    """
+    Count-Min 草图（4 行，计数饱和于 15）估计键的近期访问频率。
+    每累计 10×width 次记录将全部计数减半（老化），使过气的热点逐步让位。
+    """
+    _DEPTH = 4
+    _MAX = 15
+
+    def __init__(self, width: int):
+        w = 1
+        while w < max(16, int(width)):
+            w <<= 1
+        self.width = w
+        self._mask = w - 1
+        self._table = np.zeros((self._DEPTH, w), dtype=np.uint8)
+        self._sample = 10 * w
+        self._adds = 0
+
+    def _slots(self, key: str):
+        h = hash(key) & 0xFFFFFFFFFFFFFFFF
+        h1, h2 = h & 0xFFFFFFFF, (h >> 32) | 1
+        return [(h1 + i * h2) & self._mask for i in range(self._DEPTH)]
+
+    def estimate(self, key: str) -> int:
+        t = self._table
+        return int(min(t[i, s] for i, s in enumerate(self._slots(key))))
+
+    def add(self, key: str):
+        t = self._table
+        slots = self._slots(key)
+        est = min(t[i, s] for i, s in enumerate(slots))
+        if est < self._MAX:
+            # 保守更新：只抬升等于最小值的行，降低哈希碰撞带来的高估
+            for i, s in enumerate(slots):
+                if t[i, s] == est:
+                    t[i, s] = est + 1
+        self._adds += 1
+        if self._adds >= self._sample:
+            self._table >>= 1
+            self._adds //= 2
+
 class _InMemLRU:
-    def __init__(self, max_models: int, max_points: int):
+    """
+    分段 LRU：新条目进入试用段（probation），在试用段再次命中后晋升受保护段（protected）；
+    受保护段超出 80% 预算时把最久未用的条目降回试用段。容量以 max_models / max_points 双重约束。
+    准入：键的草图频率须达到 admit_hits；缓存已满时还须高于试用段淘汰候选的频率，
+    因此搜索等一次性扫描不会把热门型号挤出。
+    """
+    def __init__(self, max_models: int, max_points: int, admit_hits: int = 1, sketch_width: int = 4096):
         self.max_models = int(max_models)
         self.max_points = int(max_points)
+        self.admit_hits = max(1, int(admit_hits))
         self._lock = threading.Lock()
-        self._map: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._probation: "OrderedDict[str, Tuple[Dict[str, Any], int]]" = OrderedDict()
+        self._protected: "OrderedDict[str, Tuple[Dict[str, Any], int]]" = OrderedDict()
         self._points_sum = 0
+        self._protected_points = 0
+        self._sketch = _FreqSketch(max(int(sketch_width), self.max_models))
+        self.stats = {"hit": 0, "miss": 0, "admit": 0, "reject": 0, "evict": 0, "promote": 0}
+
+    @staticmethod
+    def _curve_weight(m: Any) -> int:
+        # MAX_POINTS 以“列表形态节点”为单位；数组形态每点 24 字节，约为列表形态（3×(8+24)）的 1/4
+        if isinstance(m, PchipModel):
+            return -(-m.nbytes // _LIST_POINT_BYTES)
+        if m and isinstance(m, dict):
+            return int(len(m.get("x") or []))
+        return 0
 
     def _weight(self, model: Dict[str, Any]) -> int:
         """按样条节点数估重；四合一模型统计 4 条曲线的点数总和。"""
@@ -101,56 +193,123 @@ class _InMemLRU:
                 p = (model.get("pchip") or {})
                 total = 0
                 for k in ("rpm_to_airflow","rpm_to_noise_db","noise_to_rpm","noise_to_airflow"):
-                    m = p.get(k)
-                    if m and isinstance(m, dict):
-                        total += int(len(m.get("x") or []))
+                    total += self._curve_weight(p.get(k))
                 return total
             # 兜底：当存入的是单条 pchip（不推荐），按其 x 长度估重
-            return int(len(model.get("x", []) or []))
+            return self._curve_weight(model)
         except Exception:
             return 0
 
+    def __len__(self) -> int:
+        return len(self._probation) + len(self._protected)
+
+    def _over(self, extra_models: int = 0, extra_points: int = 0) -> bool:
+        return (len(self) + extra_models > self.max_models) or (self._points_sum + extra_points > self.max_points)
+
+    def _victim(self) -> Optional[str]:
+        if self._probation:
+            return next(iter(self._probation))
+        if self._protected:
+            return next(iter(self._protected))
+        return None
+
+    def _evict_one(self):
+        seg = self._probation if self._probation else self._protected
+        _k, (_v, w) = seg.popitem(last=False)
+        self._points_sum -= w
+        if seg is self._protected:
+            self._protected_points -= w
+        self.stats["evict"] += 1
+
+    def _rebalance_protected(self):
+        cap_models = max(1, int(self.max_models * _PROTECTED_RATIO))
+        cap_points = max(1, int(self.max_points * _PROTECTED_RATIO))
+        while self._protected and (len(self._protected) > cap_models or self._protected_points > cap_points):
+            k, (v, w) = self._protected.popitem(last=False)
+            self._protected_points -= w
+            self._probation[k] = (v, w)
+
     def get(self, key: str) -> Optional[Dict[str, Any]]:
         with self._lock:
-            m = self._map.get(key)
-            if m is None:
+            self._sketch.add(key)
+            ent = self._protected.get(key)
+            if ent is not None:
+                self._protected.move_to_end(key, last=True)
+                self.stats["hit"] += 1
+                return ent[0]
+            ent = self._probation.pop(key, None)
+            if ent is None:
+                self.stats["miss"] += 1
                 return None
-            self._map.move_to_end(key, last=True)
-            return m
+            # 试用段再次命中：晋升
+            self._protected[key] = ent
+            self._protected_points += ent[1]
+            self.stats["hit"] += 1
+            self.stats["promote"] += 1
+            self._rebalance_protected()
+            return ent[0]
 
-    def put(self, key: str, model: Dict[str, Any]):
+    def put(self, key: str, model: Dict[str, Any]) -> bool:
+        """写入/替换；新键需通过准入判定，返回是否已驻留。"""
         if self.max_models <= 0 or self.max_points <= 0:
-            return
+            return False
         w = self._weight(model)
+        if w > self.max_points:
+            return False
         with self._lock:
-            old = self._map.pop(key, None)
-            if old is not None:
-                self._points_sum -= self._weight(old)
-            self._map[key] = model
+            for seg in (self._protected, self._probation):
+                old = seg.get(key)
+                if old is not None:
+                    seg[key] = (model, w)
+                    seg.move_to_end(key, last=True)
+                    self._points_sum += w - old[1]
+                    if seg is self._protected:
+                        self._protected_points += w - old[1]
+                        self._rebalance_protected()
+                    while self._over() and len(self) > 1:
+                        self._evict_one()
+                    return key in self._protected or key in self._probation
+            freq = self._sketch.estimate(key)
+            if freq < self.admit_hits:
+                self.stats["reject"] += 1
+                return False
+            if self._over(1, w):
+                victim = self._victim()
+                if victim is not None and freq <= self._sketch.estimate(victim):
+                    self.stats["reject"] += 1
+                    return False
+                while len(self) and self._over(1, w):
+                    self._evict_one()
+            self._probation[key] = (model, w)
             self._points_sum += w
-            while (len(self._map) > self.max_models) or (self._points_sum > self.max_points):
-                k, v = self._map.popitem(last=False)
-                self._points_sum -= self._weight(v)
-
-_INMEM = _InMemLRU(_env_inmem_max_models(), _env_inmem_max_points()) if _env_inmem_enable() else None
-_ADMIT_HITS = _env_inmem_admit_hits()
-_HITS_WINDOW = _env_inmem_hits_window()
-_HITS: Dict[str, int] = {}
-_HITS_LOCK = threading.Lock()
-
-def _note_hit(key: str) -> int:
-    if not _INMEM or _ADMIT_HITS <= 1:
-        return _ADMIT_HITS
-    with _HITS_LOCK:
-        cnt = _HITS.get(key, 0) + 1
-        _HITS[key] = cnt
-        if len(_HITS) > _HITS_WINDOW:
-            n_purge = max(1, _HITS_WINDOW // 10)
-            for i, k in enumerate(list(_HITS.keys())):
-                _HITS.pop(k, None)
-                if i + 1 >= n_purge:
-                    break
-        return cnt
+            self.stats["admit"] += 1
+            return True
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self.stats, models=len(self), points=self._points_sum,
+                        protected=len(self._protected), probation=len(self._probation))
+
+_INMEM = _InMemLRU(_env_inmem_max_models(), _env_inmem_max_points(),
+                   _env_inmem_admit_hits(), _env_inmem_hits_window()) if _env_inmem_enable() else None
+
+def inmem_stats() -> Dict[str, int]:
+    """内存缓存计数：hit / miss / admit / reject / evict / promote 及当前占用。"""
+    return _INMEM.snapshot() if _INMEM else {}
+
+_metrics.gauge_func("perf_model_inmem", "Perf model in-memory cache counters and occupancy",
+                    lambda: {(k,): v for k, v in inmem_stats().items()}, ("stat",))
+
+# 同机跨进程共享层（L2）：各 worker 的 _INMEM 为 L1，条目以 PCHB 字节存放在 curve_cache_dir() 的 arena 中
+_SHARED = (SharedArena(curve_cache_dir, "perf_arena",
+                       max_bytes=_env_shared_max_mb() * 1024 * 1024, nslots=_env_shared_slots())
+           if _env_shared_enable() and SharedArena.enabled() else None)
+
+def shared_stats() -> Dict[str, int]:
+    return _SHARED.snapshot() if _SHARED else {}
+
+_metrics.gauge_func("perf_model_shared", "Perf model cross-process arena counters and occupancy",
+                    lambda: {(k,): v for k, v in shared_stats().items()}, ("stat",))
 
 # =========================
 # 通用散列与轴向 PCHIP 构建
@@ -361,15 +520,317 @@ def eval_pchip(model: Dict[str, Any], x: float) -> float:
     h11 = (t**3 - t**2)
     return h00 * y0 + h10 * m0 + h01 * y1 + h11 * m1
 
+# =========================
+# 批量评估（向量化，与 eval_pchip 逐点按位一致）
+# =========================
+
+def _hermite_eval_arrays(kx: np.ndarray, ky: np.ndarray, km: np.ndarray,
+                         i: np.ndarray, xc: np.ndarray) -> np.ndarray:
+    # 运算顺序与 eval_pchip 完全一致；幂次用 float_power（走 libm pow，与标量 ** 同结果）
+    x0 = np.take_along_axis(kx, i, axis=-1) if kx.ndim > 1 else kx[i]
+    x1 = np.take_along_axis(kx, i + 1, axis=-1) if kx.ndim > 1 else kx[i + 1]
+    y0 = np.take_along_axis(ky, i, axis=-1) if ky.ndim > 1 else ky[i]
+    y1 = np.take_along_axis(ky, i + 1, axis=-1) if ky.ndim > 1 else ky[i + 1]
+    s0 = np.take_along_axis(km, i, axis=-1) if km.ndim > 1 else km[i]
+    s1 = np.take_along_axis(km, i + 1, axis=-1) if km.ndim > 1 else km[i + 1]
+    h = x1 - x0
+    t = np.zeros_like(xc)
+    np.divide(xc - x0, h, out=t, where=(h != 0))
+    m0 = s0 * h; m1 = s1 * h
+    t2 = np.float_power(t, 2)
+    t3 = np.float_power(t, 3)
+    h00 = (2 * t3 - 3 * t2 + 1)
+    h10 = (t3 - 2 * t2 + t)
+    h01 = (-2 * t3 + 3 * t2)
+    h11 = (t3 - t2)
+    return h00 * y0 + h10 * m0 + h01 * y1 + h11 * m1
+
+def eval_pchip_many(model: Dict[str, Any], xs) -> np.ndarray:
+    """eval_pchip 的批量版：xs 为任意形状数组，返回同形状 float64 数组。"""
+    xq = np.asarray(xs, dtype=float)
+    kx = np.asarray(model["x"], dtype=float)
+    n = kx.size
+    if n == 0:
+        return np.full(xq.shape, float("nan"))
+    ky = np.asarray(model["y"], dtype=float)
+    if n == 1:
+        return np.full(xq.shape, float(ky[0]))
+    km = np.asarray(model["m"], dtype=float)
+    xc = np.minimum(np.maximum(xq, kx[0]), kx[-1])
+    # 节点处左右两段的取值按位相同（t=0/1 时基函数退化为 0/1），故无需复刻标量二分的落段
+    i = np.searchsorted(kx, xc, side="right") - 1
+    np.clip(i, 0, n - 2, out=i)
+    return _hermite_eval_arrays(kx, ky, km, i, xc)
+
+class PchipStack:
+    """
+    一组 PCHIP 模型按行堆叠（节点不足处以 +inf 填充），可复用于多次批量评估。
+    - 模型为 None/非 dict/无节点时该行恒为 NaN；单节点模型恒为其 y
+    """
+    __slots__ = ("size", "kx", "ky", "km", "lens", "rows", "const")
+
+    def __init__(self, models: Sequence[Optional[Dict[str, Any]]]):
+        self.size = len(models)
+        self.const = np.full((self.size,), float("nan"))
+        rows: List[int] = []
+        for k, mdl in enumerate(models):
+            if isinstance(mdl, PchipModel):
+                n = len(mdl)
+            elif isinstance(mdl, dict):
+                n = len(mdl.get("x") or [])
+            else:
+                continue
+            if n == 1:
+                self.const[k] = float(mdl["y"][0])
+            elif n >= 2:
+                rows.append(k)
+        self.rows = np.array(rows, dtype=np.intp)
+        self.lens = np.array([len(models[k]["x"]) for k in rows], dtype=np.intp)
+        L = int(self.lens.max()) if rows else 0
+        self.kx = np.full((len(rows), L), np.inf)
+        self.ky = np.zeros((len(rows), L))
+        self.km = np.zeros((len(rows), L))
+        for r, k in enumerate(rows):
+            mdl = models[k]; n = int(self.lens[r])
+            self.kx[r, :n] = mdl["x"]; self.ky[r, :n] = mdl["y"]; self.km[r, :n] = mdl["m"]
+
+    def _eval_2d(self, xq: np.ndarray) -> np.ndarray:
+        # xq: (R, N)，每行对应 self.rows 中的一个模型
+        lens = self.lens
+        x_lo = self.kx[:, :1]
+        x_hi = self.kx[np.arange(lens.size), lens - 1][:, None]
+        xc = np.minimum(np.maximum(xq, x_lo), x_hi)
+        # 逐行 searchsorted(side="right") 的等价形式；填充的 +inf 不参与计数
+        i = np.count_nonzero(self.kx[:, :, None] <= xc[:, None, :], axis=1) - 1
+        np.clip(i, 0, (lens - 2)[:, None], out=i)
+        return _hermite_eval_arrays(self.kx, self.ky, self.km, i, xc)
+
+    def eval(self, xs) -> np.ndarray:
+        """所有模型在同一组 xs 上求值，返回 (size, len(xs))。"""
+        xq = np.asarray(xs, dtype=float).reshape(-1)
+        out = np.repeat(self.const[:, None], xq.size, axis=1)
+        if self.rows.size and xq.size:
+            out[self.rows, :] = self._eval_2d(np.broadcast_to(xq, (self.rows.size, xq.size)))
+        return out
+
+    def eval_rows(self, xs_per_row) -> np.ndarray:
+        """第 k 个模型在 xs_per_row[k] 处求值，返回 (size,)。"""
+        xq = np.asarray(xs_per_row, dtype=float).reshape(-1)
+        out = self.const.copy()
+        if self.rows.size:
+            out[self.rows] = self._eval_2d(xq[self.rows][:, None])[:, 0]
+        return out
+
+def eval_pchip_many_models(models: Sequence[Optional[Dict[str, Any]]], xs) -> np.ndarray:
+    """
+    多模型批量评估（如频带模型组）：返回 (len(models), len(xs)) 数组。
+    - 各模型节点按行堆叠（见 PchipStack），一次完成定位与求值
+    - 模型为 None/非 dict/无节点时该行为 NaN
+    """
+    return PchipStack(models).eval(xs)
+
+# =========================
+# 紧凑模型（float64 连续数组）与二进制落盘
+# =========================
+
+class PchipModel:
+    """
+    数组版 PCHIP 模型：x/y/m 为连续 float64 数组（可为 memmap 视图）。
+    - 支持 model["x"] / model.get("x0") 等只读访问，可直接传给 eval_pchip / eval_pchip_many
+    - to_dict() 导出与 build_pchip_model_with_opts 相同的 JSON 形态（供前端）
+    """
+    __slots__ = ("x", "y", "m")
+
+    def __init__(self, x, y, m):
+        self.x = np.ascontiguousarray(x, dtype=np.float64)
+        self.y = np.ascontiguousarray(y, dtype=np.float64)
+        self.m = np.ascontiguousarray(m, dtype=np.float64)
+
+    @classmethod
+    def from_dict(cls, d: Any) -> Optional["PchipModel"]:
+        if isinstance(d, PchipModel):
+            return d
+        if not isinstance(d, dict):
+            return None
+        try:
+            xs = d.get("x") or []; ys = d.get("y") or []; ms = d.get("m") or []
+            if not xs or len(xs) != len(ys) or len(xs) != len(ms):
+                return None
+            return cls(xs, ys, ms)
+        except Exception:
+            return None
+
+    @property
+    def x0(self) -> float:
+        return float(self.x[0])
+
+    @property
+    def x1(self) -> float:
+        return float(self.x[-1])
+
+    def __len__(self) -> int:
+        return int(self.x.size)
+
+    @property
+    def nbytes(self) -> int:
+        return int(self.x.nbytes + self.y.nbytes + self.m.nbytes)
+
+    def __getitem__(self, key: str):
+        if key in ("x", "y", "m"):
+            return getattr(self, key)
+        if key in ("x0", "x1"):
+            return getattr(self, key)
+        raise KeyError(key)
+
+    def get(self, key: str, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __contains__(self, key: str) -> bool:
+        return key in ("x", "y", "m", "x0", "x1")
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"x": self.x.tolist(), "y": self.y.tolist(), "m": self.m.tolist(),
+                "x0": self.x0, "x1": self.x1}
+
+def pchip_to_dict(model: Any) -> Optional[Dict[str, Any]]:
+    """PchipModel → dict；dict/None 原样返回。"""
+    if isinstance(model, PchipModel):
+        return model.to_dict()
+    return model
+
+# 二进制格式：b"PCHB" + u32 版本 + u32 头长度 + JSON 头（补齐到 8 字节）+ 小端 float64 数据区
+# 头内 "curves": {name: [offset, n] | null}，每条曲线在数据区依次存放 x[n], y[n], m[n]
+_PACK_MAGIC = b"PCHB"
+_PACK_VERSION = 1
+
+def pack_pchip_bytes(curves: Dict[str, Any], header: Optional[Dict[str, Any]] = None) -> bytes:
+    """把一组命名 PCHIP 曲线（dict 或 PchipModel，None 允许）编码为二进制格式。"""
+    import struct
+    index: Dict[str, Any] = {}
+    chunks: List[np.ndarray] = []
+    off = 0
+    for name, mdl in (curves or {}).items():
+        pm = PchipModel.from_dict(mdl)
+        if pm is None:
+            index[name] = None
+            continue
+        n = len(pm)
+        index[name] = [off, n]
+        chunks.extend((pm.x, pm.y, pm.m))
+        off += 3 * n
+    head = dict(header or {})
+    head["curves"] = index
+    hb = json.dumps(head, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    pad = (-(12 + len(hb))) % 8
+    hb += b" " * pad
+    data = np.concatenate(chunks).astype("<f8", copy=False) if chunks else np.zeros((0,), "<f8")
+    return _PACK_MAGIC + struct.pack("<II", _PACK_VERSION, len(hb)) + hb + data.tobytes()
+
+def write_pchip_pack(path: str, curves: Dict[str, Any], header: Optional[Dict[str, Any]] = None) -> str:
+    """原子写入一组命名 PCHIP 曲线（dict 或 PchipModel，None 允许）。"""
+    import tempfile
+    buf = pack_pchip_bytes(curves, header)
+    d = os.path.dirname(path) or "."
+    os.makedirs(d, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(prefix="pchb_", suffix=".tmp", dir=d)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(buf)
+        os.replace(tmp, path)
+    finally:
+        try:
+            os.remove(tmp)
+        except Exception:
+            pass
+    return path
+
+def _pack_curves(head: Dict[str, Any], data: np.ndarray) -> Optional[Dict[str, Optional[PchipModel]]]:
+    curves: Dict[str, Optional[PchipModel]] = {}
+    for name, ent in (head.get("curves") or {}).items():
+        if not ent:
+            curves[name] = None
+            continue
+        off, n = int(ent[0]), int(ent[1])
+        if off + 3 * n > data.size:
+            return None
+        pm = PchipModel.__new__(PchipModel)
+        pm.x = data[off:off + n]
+        pm.y = data[off + n:off + 2 * n]
+        pm.m = data[off + 2 * n:off + 3 * n]
+        curves[name] = pm
+    return curves
+
+def read_pchip_pack(path: str, *, mmap: bool = False) -> Optional[Tuple[Dict[str, Optional[PchipModel]], Dict[str, Any]]]:
+    """
+    读取 write_pchip_pack 的产物，返回 (curves, header)；格式不符返回 None。
+    mmap=True 时曲线数组为只读 memmap 视图（零拷贝）。
+    """
+    import struct
+    try:
+        with open(path, "rb") as f:
+            pre = f.read(12)
+            if len(pre) != 12 or pre[:4] != _PACK_MAGIC:
+                return None
+            ver, hlen = struct.unpack("<II", pre[4:])
+            if ver != _PACK_VERSION:
+                return None
+            head = json.loads(f.read(hlen).decode("utf-8"))
+            data_off = 12 + hlen
+            if not mmap:
+                data = np.fromfile(f, dtype="<f8")
+        if mmap:
+            total = (os.path.getsize(path) - data_off) // 8
+            data = (np.memmap(path, dtype="<f8", mode="r", offset=data_off, shape=(total,))
+                    if total > 0 else np.zeros((0,), "<f8"))
+        curves = _pack_curves(head, data)
+        return (curves, head) if curves is not None else None
+    except Exception:
+        return None
+
+def unpack_pchip_buffer(buf) -> Optional[Tuple[Dict[str, Optional[PchipModel]], Dict[str, Any]]]:
+    """从内存缓冲区（bytes / memoryview / mmap 切片）解析二进制格式；曲线数组直接引用该缓冲区。"""
+    import struct
+    try:
+        mv = memoryview(buf)
+        if len(mv) < 12 or bytes(mv[:4]) != _PACK_MAGIC:
+            return None
+        ver, hlen = struct.unpack_from("<II", mv, 4)
+        if ver != _PACK_VERSION:
+            return None
+        head = json.loads(bytes(mv[12:12 + hlen]).decode("utf-8"))
+        data = np.frombuffer(mv, dtype="<f8", offset=12 + hlen)
+        curves = _pack_curves(head, data)
+        return (curves, head) if curves is not None else None
+    except Exception:
+        return None
+
 # =========================
 # 四合一模型：落盘/加载/构建/失效
 # =========================
 
+_PERF_CURVES = ("rpm_to_airflow", "rpm_to_noise_db", "noise_to_rpm", "noise_to_airflow")
+
 def _unified_path(model_id: int, condition_id: int) -> str:
+    # 逐文件布局（CURVE_PACK_ENABLE=0 时使用；启用合并存储时仅作迁移来源）
+    return os.path.join(curve_cache_dir(), f"perf_{int(model_id)}_{int(condition_id)}.pchb")
+
+def _unified_legacy_json_path(model_id: int, condition_id: int) -> str:
+    # 旧版 JSON 落盘路径：仅用于读取迁移，新写入统一走二进制
     return os.path.join(curve_cache_dir(), f"perf_{int(model_id)}_{int(condition_id)}.json")
 
+def _unified_pack_key(model_id: int, condition_id: int) -> str:
+    return f"perf/{int(model_id)}_{int(condition_id)}"
+
+_ENV_KEY_CACHE: Optional[str] = None
+
 def _env_key_for_perf() -> str:
-    # 将影响拟合的环境参数和代码版本纳入统一 env-key
+    # 将影响拟合的环境参数和代码版本纳入统一 env-key；进程内缓存，reload_curve_params_from_env 时重算
+    global _ENV_KEY_CACHE
+    if _ENV_KEY_CACHE is not None:
+        return _ENV_KEY_CACHE
     ek = "|".join([
         f"alpha_rpm={_env_alpha_for_axis('rpm'):.6f}",
         f"alpha_noise={_env_alpha_for_axis('noise_db'):.6f}",
@@ -381,45 +842,64 @@ def _env_key_for_perf() -> str:
         f"lock_noise={int(_env_node_lock('noise_db'))}",
         f"code={_CODE_VERSION}",
     ])
+    _ENV_KEY_CACHE = ek
     return ek
 
-def save_unified_perf_model(model_id: int, condition_id: int, models: dict, *, data_hash: str, env_key: str) -> str:
-    payload = {
+def _unified_meta(data_hash: str, env_key: str, data_version: Optional[int]) -> Dict[str, Any]:
+    meta = {
+        "data_hash": data_hash,
+        "env_key": env_key,
+        "code_version": _CODE_VERSION,
+        "created_at": datetime.utcnow().isoformat(timespec="seconds") + "Z",
+    }
+    if data_version is not None:
+        meta["data_version"] = int(data_version)
+    return meta
+
+def save_unified_perf_model(model_id: int, condition_id: int, models: dict, *, data_hash: str, env_key: str,
+                            data_version: Optional[int] = None) -> str:
+    header = {
         "type": "perf_pchip_v1",
         "model_id": int(model_id),
         "condition_id": int(condition_id),
-        "pchip": {
-            "rpm_to_airflow": models.get("rpm_to_airflow"),
-            "rpm_to_noise_db": models.get("rpm_to_noise_db"),
-            "noise_to_rpm": models.get("noise_to_rpm"),
-            "noise_to_airflow": models.get("noise_to_airflow"),
-        },
-        "meta": {
-            "data_hash": data_hash,
-            "env_key": env_key,
-            "code_version": _CODE_VERSION,
-            "created_at": datetime.utcnow().isoformat(timespec="seconds") + "Z",
-        }
+        "meta": _unified_meta(data_hash, env_key, data_version),
     }
-    p = _unified_path(model_id, condition_id)
-    # 原子替换写入，避免并发读到半成品
-    import tempfile
-    d = os.path.dirname(p)
-    os.makedirs(d, exist_ok=True)
-    fd, tmp = tempfile.mkstemp(prefix="perf_", suffix=".json", dir=d)
-    try:
-        with os.fdopen(fd, "w", encoding="utf-8") as f:
-            json.dump(payload, f, ensure_ascii=False)
-        os.replace(tmp, p)
-    finally:
-        try:
-            os.remove(tmp)
-        except Exception:
-            pass
+    curves = {k: models.get(k) for k in _PERF_CURVES}
+    store = cache_pack()
+    if store is None:
+        p = write_pchip_pack(_unified_path(model_id, condition_id), curves, header)
+    else:
+        key = _unified_pack_key(model_id, condition_id)
+        store.put(key, pack_pchip_bytes(curves, header))
+        p = f"{store.root}#{key}"
+        _remove_quiet(_unified_path(model_id, condition_id))
+    # 已写入二进制版本，移除旧 JSON，避免两份并存
+    _remove_quiet(_unified_legacy_json_path(model_id, condition_id))
     return p
 
-def load_unified_perf_model(model_id: int, condition_id: int) -> dict | None:
-    p = _unified_path(model_id, condition_id)
+def _remove_quiet(p: str):
+    try:
+        os.remove(p)
+    except Exception:
+        pass
+
+def _unified_entry(model_id: int, condition_id: int, curves: Dict[str, Any], head: Dict[str, Any]) -> dict | None:
+    if head.get("type") != "perf_pchip_v1" or "meta" not in head:
+        return None
+    return {
+        "type": "perf_pchip_v1",
+        "model_id": int(model_id),
+        "condition_id": int(condition_id),
+        "pchip": {k: curves.get(k) for k in _PERF_CURVES},
+        "meta": head["meta"],
+    }
+
+def _load_unified_file(model_id: int, condition_id: int) -> dict | None:
+    """逐文件布局读取：优先二进制，兼容旧 JSON。"""
+    got = read_pchip_pack(_unified_path(model_id, condition_id))
+    if got is not None:
+        return _unified_entry(model_id, condition_id, *got)
+    p = _unified_legacy_json_path(model_id, condition_id)
     if not os.path.isfile(p):
         return None
     try:
@@ -431,12 +911,126 @@ def load_unified_perf_model(model_id: int, condition_id: int) -> dict | None:
             return None
         if "pchip" not in data or "meta" not in data:
             return None
+        pset = data.get("pchip") or {}
+        data["pchip"] = {k: PchipModel.from_dict(pset.get(k)) for k in _PERF_CURVES}
         return data
     except Exception:
         return None
 
-def _inmem_key_unified(model_id: int, condition_id: int, data_hash: str, env_key: str) -> str:
-    return f"{int(model_id)}|{int(condition_id)}|perf|{data_hash}|{env_key}"
+def _entry_pack_bytes(entry: dict) -> bytes:
+    header = {"type": "perf_pchip_v1", "model_id": int(entry["model_id"]),
+              "condition_id": int(entry["condition_id"]), "meta": entry.get("meta") or {}}
+    pchip = entry.get("pchip") or {}
+    return pack_pchip_bytes({k: pchip.get(k) for k in _PERF_CURVES}, header)
+
+def _load_unified_compact(model_id: int, condition_id: int) -> dict | None:
+    """读取四合一模型，曲线为 PchipModel；启用合并存储时未命中再读旧文件并顺带迁入。"""
+    store = cache_pack()
+    if store is None:
+        return _load_unified_file(model_id, condition_id)
+    buf = store.get(_unified_pack_key(model_id, condition_id))
+    if buf is not None:
+        got = unpack_pchip_buffer(buf)
+        return _unified_entry(model_id, condition_id, *got) if got else None
+    entry = _load_unified_file(model_id, condition_id)
+    if entry is not None:
+        # 仅在键仍不存在时迁入：与保存并发时不以旧文件覆盖刚写入的新模型
+        if not store.put_if_absent(_unified_pack_key(model_id, condition_id), _entry_pack_bytes(entry)):
+            buf = store.get(_unified_pack_key(model_id, condition_id))
+            got = unpack_pchip_buffer(buf) if buf is not None else None
+            if got:
+                entry = _unified_entry(model_id, condition_id, *got)
+        _remove_quiet(_unified_path(model_id, condition_id))
+        _remove_quiet(_unified_legacy_json_path(model_id, condition_id))
+    return entry
+
+def migrate_perf_files_to_pack(batch_size: int = 256) -> int:
+    """把 curve_cache_dir() 下的 perf_{mid}_{cid}.pchb / .json 批量并入合并存储并删除原文件；返回迁移条数。"""
+    import re
+    store = cache_pack()
+    if store is None:
+        return 0
+    pat = re.compile(r"^perf_(\d+)_(\d+)\.(pchb|json)$")
+    pairs = sorted({(int(m.group(1)), int(m.group(2)))
+                    for m in (pat.match(fn) for fn in os.listdir(curve_cache_dir())) if m})
+    n = 0
+    for i in range(0, len(pairs), max(1, int(batch_size))):
+        batch: Dict[str, Optional[bytes]] = {}
+        done = []
+        for mid, cid in pairs[i:i + batch_size]:
+            entry = _load_unified_file(mid, cid)
+            if entry is not None:
+                batch[_unified_pack_key(mid, cid)] = _entry_pack_bytes(entry)
+            done.append((mid, cid))
+        n += store.put_many(batch, if_absent=True)
+        for mid, cid in done:
+            _remove_quiet(_unified_path(mid, cid))
+            _remove_quiet(_unified_legacy_json_path(mid, cid))
+    return n
+
+def _unified_export(entry: dict) -> dict:
+    """紧凑条目 → 对外 dict 形态（曲线为 {x,y,m,x0,x1} 列表）。"""
+    out = dict(entry)
+    out["pchip"] = {k: pchip_to_dict(v) for k, v in (entry.get("pchip") or {}).items()}
+    return out
+
+def load_unified_perf_model(model_id: int, condition_id: int) -> dict | None:
+    entry = _load_unified_compact(model_id, condition_id)
+    return _unified_export(entry) if entry else None
+
+def _inmem_key_unified(model_id: int, condition_id: int, env_key: str) -> str:
+    # 每个 (型号, 工况, env) 仅保留一份；数据是否过期由条目 meta 的 data_version / data_hash 判定
+    return f"{int(model_id)}|{int(condition_id)}|perf|{env_key}"
+
+def _retag_unified(entry: dict, data_version: Optional[int]) -> dict:
+    # 数据版本变了但原始点散列未变：沿用曲线，仅更新 meta 中的版本
+    out = dict(entry)
+    meta = dict(entry.get("meta") or {})
+    if data_version is not None:
+        meta["data_version"] = int(data_version)
+    out["meta"] = meta
+    return out
+
+def _shared_key(model_id: int, condition_id: int, data_version: int, env_key: str) -> str:
+    return f"{int(model_id)}|{int(condition_id)}|v{int(data_version)}|{env_key}"
+
+def _shared_get(model_id: int, condition_id: int, data_version: int, env_key: str) -> dict | None:
+    """从共享 arena 取条目；曲线数组直接指向共享映射（零拷贝）。"""
+    buf = _SHARED.get(_shared_key(model_id, condition_id, data_version, env_key)) if _SHARED else None
+    if buf is None:
+        return None
+    got = unpack_pchip_buffer(buf)
+    if got is None:
+        return None
+    curves, head = got
+    meta = head.get("meta") or {}
+    # 键为 64 位散列，落地前再核对一次完整键
+    if (head.get("type") != "perf_pchip_v1" or int(head.get("model_id", -1)) != int(model_id)
+            or int(head.get("condition_id", -1)) != int(condition_id)
+            or meta.get("env_key") != env_key or meta.get("data_version") != data_version):
+        return None
+    return {
+        "type": "perf_pchip_v1",
+        "model_id": int(model_id),
+        "condition_id": int(condition_id),
+        "pchip": {k: curves.get(k) for k in _PERF_CURVES},
+        "meta": meta,
+    }
+
+def _shared_publish(entry: dict, data_version: Optional[int], env_key: str) -> dict | None:
+    """把条目发布到共享 arena，成功时返回指向共享映射的条目（供 L1 引用，避免每个 worker 各持一份）。"""
+    if _SHARED is None or data_version is None:
+        return None
+    meta = entry.get("meta") or {}
+    if meta.get("data_version") != data_version or meta.get("env_key") != env_key:
+        return None
+    mid, cid = int(entry["model_id"]), int(entry["condition_id"])
+    header = {"type": "perf_pchip_v1", "model_id": mid, "condition_id": cid, "meta": meta}
+    pchip = entry.get("pchip") or {}
+    if not _SHARED.put(_shared_key(mid, cid, data_version, env_key),
+                       pack_pchip_bytes({k: pchip.get(k) for k in _PERF_CURVES}, header)):
+        return None
+    return _shared_get(mid, cid, data_version, env_key)
 
 def _collect_valid_xy(xs: List[float], ys: List[float]) -> Tuple[List[float], List[float]]:
     outx: List[float] = []
@@ -455,33 +1049,69 @@ def _collect_valid_xy(xs: List[float], ys: List[float]) -> Tuple[List[float], Li
     return outx, outy
 
 def get_or_build_unified_perf_model(model_id: int, condition_id: int,
-                                    rpm: List[float], airflow: List[float], noise: List[float]) -> Optional[Dict[str, Any]]:
+                                    rpm: List[float], airflow: List[float], noise: List[float],
+                                    *, data_version: Optional[int] = None) -> Optional[Dict[str, Any]]:
     """
     四合一模型唯一入口：
-      - 依据三轴原始点计算 data_hash
       - 组成 env_key（含平滑/张力/单调/节点锁定/代码版本）
-      - 先查内存 LRU；再查磁盘；任一命中且 meta 匹配则直接返回
+      - 传入 data_version（见 curves.data_version）时，内存/磁盘条目版本一致即直接返回，不做散列
+      - 版本缺失或不一致时才依据三轴原始点计算 data_hash；散列一致则仅更新版本标记
       - 否则重建四条曲线并落盘 + 进入 LRU
+      - 查找顺序：进程内 LRU（L1）→ 同机共享 arena（L2，需 data_version）→ 磁盘 .pchb → 重建；
+        命中磁盘或重建后发布到 arena，其它 worker 直接零拷贝复用
     """
-    data_hash = raw_triples_hash(rpm or [], airflow or [], noise or [])
     env_key = _env_key_for_perf()
-    ikey = _inmem_key_unified(model_id, condition_id, data_hash, env_key)
+    ikey = _inmem_key_unified(model_id, condition_id, env_key)
+    data_hash: Optional[str] = None
 
     if _INMEM:
         m = _INMEM.get(ikey)
         if m is not None:
-            _note_hit(ikey)
-            return m
+            meta = m.get("meta") or {}
+            if data_version is not None and meta.get("data_version") == data_version:
+                _metrics.cache_lookup("perf_model", "mem")
+                return _unified_export(m)
+            data_hash = raw_triples_hash(rpm or [], airflow or [], noise or [])
+            if meta.get("data_hash") == data_hash:
+                if data_version is not None:
+                    m = _retag_unified(m, data_version)
+                    _INMEM.put(ikey, m)
+                _metrics.cache_lookup("perf_model", "mem")
+                return _unified_export(m)
 
-    cached = load_unified_perf_model(model_id, condition_id)
+    if _SHARED is not None and data_version is not None:
+        shared = _shared_get(model_id, condition_id, data_version, env_key)
+        if shared is not None:
+            if _INMEM:
+                _INMEM.put(ikey, shared)
+            _metrics.cache_lookup("perf_model", "shared")
+            return _unified_export(shared)
+
+    with _metrics.CACHE_LOAD_SECONDS.time(cache="perf_model"):
+        cached = _load_unified_compact(model_id, condition_id)
     if cached:
         meta = cached.get("meta") or {}
-        if meta.get("data_hash") == data_hash and meta.get("env_key") == env_key:
-            if _INMEM and _note_hit(ikey) >= _ADMIT_HITS:
-                _INMEM.put(ikey, cached)
-            return cached
+        if meta.get("env_key") == env_key:
+            hit = data_version is not None and meta.get("data_version") == data_version
+            if not hit:
+                if data_hash is None:
+                    data_hash = raw_triples_hash(rpm or [], airflow or [], noise or [])
+                hit = meta.get("data_hash") == data_hash
+                if hit and data_version is not None:
+                    cached = _retag_unified(cached, data_version)
+                    save_unified_perf_model(model_id, condition_id, cached["pchip"], data_hash=data_hash,
+                                            env_key=env_key, data_version=data_version)
+            if hit:
+                cached = _shared_publish(cached, data_version, env_key) or cached
+                if _INMEM:
+                    _INMEM.put(ikey, cached)
+                _metrics.cache_lookup("perf_model", "disk")
+                return _unified_export(cached)
 
     # 现算
+    _metrics.cache_lookup("perf_model", "rebuild")
+    if data_hash is None:
+        data_hash = raw_triples_hash(rpm or [], airflow or [], noise or [])
     x_rpm_air, y_rpm_air = _collect_valid_xy(rpm, airflow)
     x_rpm_nz,  y_rpm_nz  = _collect_valid_xy(rpm, noise)
     x_nz_rpm,  y_nz_rpm  = _collect_valid_xy(noise, rpm)
@@ -495,19 +1125,20 @@ def get_or_build_unified_perf_model(model_id: int, condition_id: int,
     }
 
     # 落盘
-    save_unified_perf_model(model_id, condition_id, pack, data_hash=data_hash, env_key=env_key)
+    save_unified_perf_model(model_id, condition_id, pack, data_hash=data_hash, env_key=env_key,
+                            data_version=data_version)
     out = {
         "type": "perf_pchip_v1",
         "model_id": int(model_id),
         "condition_id": int(condition_id),
         "pchip": pack,
-        "meta": {
-            "data_hash": data_hash,
-            "env_key": env_key,
-            "code_version": _CODE_VERSION,
-            "created_at": datetime.utcnow().isoformat(timespec="seconds") + "Z",
-        }
+        "meta": _unified_meta(data_hash, env_key, data_version),
     }
-    if _INMEM and _note_hit(ikey) >= _ADMIT_HITS:
-        _INMEM.put(ikey, out)
-    return out
\ No newline at end of file
+    shared = _shared_publish(out, data_version, env_key)
+    if _INMEM:
+        compact = shared
+        if compact is None:
+            compact = dict(out)
+            compact["pchip"] = {k: PchipModel.from_dict(v) for k, v in pack.items()}
+        _INMEM.put(ikey, compact)
+    return out
@@ -0,0 +1,275 @@
+# -*- coding: utf-8 -*-
+"""
+curves.precompute: 批量预计算频谱缓存（部署切换前离峰预热）
+- 枚举 perf_audio_binding 中每个 (model_id, condition_id) 的最新绑定
+- 与已缓存频谱（spectrum_cache）的 meta 比对当前 param_hash / code_version / audio_data_hash
+- 仅重建过期项；独立进程池执行（复用 spectrum_builder._process_job：跨进程锁 + CPU 预算）
+- 进度逐条输出；状态文件记录每个 pair 的结果，中断后重跑自动续做（已完成项由缓存 meta 判定为最新而跳过）
+
+用法（仓库根目录）：
+  python -m app.curves.precompute --procs 4
+  python -m app.curves.precompute --dry-run
+  python -m app.curves.precompute --model 12 --model 15 --retry-failed
+  python -m app.curves.precompute --pack-migrate   # 旧的逐文件缓存并入合并存储（见 pack_store）
+  python -m app.curves.precompute --pack-compact
+"""
+from __future__ import annotations
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+# 保证子进程内 _run_pipeline_and_collect 能以 audio_calib.pipeline 导入（spawn 会继承 sys.path）
+_APP_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if _APP_DIR not in sys.path:
+    sys.path.append(_APP_DIR)
+
+from sqlalchemy import text
+
+from . import spectrum_cache
+from . import pchip_cache
+from . import dbpool
+from .pchip_cache import curve_cache_dir
+from .spectrum_builder import (
+    _engine, CODE_VERSION, default_params_with_hash,
+    _process_job, _init_rebuild_worker, _make_key,
+)
+
+BINDINGS_SQL = """
+  SELECT b.model_id, b.condition_id, b.audio_batch_id, b.audio_data_hash, b.perf_batch_id,
+         ab.base_path
+  FROM perf_audio_binding b
+  LEFT JOIN audio_batch ab ON ab.batch_id = b.audio_batch_id
+  ORDER BY b.created_at DESC
+"""
+
+# =========================
+# 枚举与过期判定
+# =========================
+def list_bindings(model_ids: Optional[List[int]] = None,
+                  condition_ids: Optional[List[int]] = None) -> List[Dict[str, Any]]:
+    """每个 (mid, cid) 仅保留最新一条绑定（与 /api/spectrum-models 的取法一致）。"""
+    with _engine.begin() as conn:
+        rows = conn.execute(text(BINDINGS_SQL)).fetchall()
+    mids = set(int(x) for x in model_ids or [])
+    cids = set(int(x) for x in condition_ids or [])
+    seen = set()
+    out: List[Dict[str, Any]] = []
+    for r in rows:
+        m = r._mapping
+        try:
+            mid = int(m['model_id']); cid = int(m['condition_id'])
+        except Exception:
+            continue
+        if (mid, cid) in seen:
+            continue
+        seen.add((mid, cid))
+        if (mids and mid not in mids) or (cids and cid not in cids):
+            continue
+        out.append({
+            'model_id': mid,
+            'condition_id': cid,
+            'audio_batch_id': m.get('audio_batch_id'),
+            'audio_data_hash': (m.get('audio_data_hash') or '').strip(),
+            'perf_batch_id': m.get('perf_batch_id'),
+            'base_path': m.get('base_path'),
+        })
+    out.sort(key=lambda b: (b['model_id'], b['condition_id']))
+    return out
+
+def stale_reason(binding: Dict[str, Any], param_hash: str, code_ver: str) -> Optional[str]:
+    """缓存最新返回 None；否则返回过期原因（missing / empty_model / param / code / audio）。"""
+    j = spectrum_cache.load(binding['model_id'], binding['condition_id'])
+    if not isinstance(j, dict):
+        return 'missing'
+    meta = j.get('meta') or {}
+    if not j.get('model'):
+        return 'empty_model'
+    if str(meta.get('param_hash') or '') != param_hash:
+        return 'param'
+    if str(meta.get('code_version') or '') != code_ver:
+        return 'code'
+    meta_audio = str(meta.get('audio_data_hash') or '')
+    if meta_audio != (binding.get('audio_data_hash') or meta_audio):
+        return 'audio'
+    return None
+
+# =========================
+# 续做状态文件
+# =========================
+def _default_state_path() -> str:
+    return os.path.join(os.path.abspath(curve_cache_dir()), 'precompute_state.json')
+
+def _load_state(p: str, signature: str) -> Dict[str, Any]:
+    try:
+        with open(p, 'r', encoding='utf-8') as f:
+            st = json.load(f)
+        if isinstance(st, dict) and st.get('signature') == signature:
+            st.setdefault('pairs', {})
+            return st
+    except Exception:
+        pass
+    # 参数或代码版本变化后旧状态作废
+    return {'signature': signature, 'started_at': _now(), 'pairs': {}}
+
+def _save_state(p: str, st: Dict[str, Any]):
+    d = os.path.dirname(p) or '.'
+    os.makedirs(d, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(prefix='.tmp_precompute_', suffix='.json', dir=d)
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(st, f, ensure_ascii=False, indent=1)
+        os.replace(tmp, p)
+    finally:
+        try:
+            os.remove(tmp)
+        except Exception:
+            pass
+
+def _now() -> str:
+    return datetime.utcnow().isoformat(timespec='seconds') + 'Z'
+
+def _fmt_sec(s: float) -> str:
+    s = int(max(0, s))
+    return f"{s // 3600:d}:{s % 3600 // 60:02d}:{s % 60:02d}"
+
+# =========================
+# 执行
+# =========================
+def _plan(bindings: List[Dict[str, Any]], param_hash: str, code_ver: str, state: Dict[str, Any],
+          force: bool, retry_failed: bool) -> Tuple[List[Dict[str, Any]], Dict[str, int]]:
+    todo: List[Dict[str, Any]] = []
+    summary = {'total': len(bindings), 'fresh': 0, 'no_audio': 0, 'skipped_failed': 0, 'stale': 0}
+    for b in bindings:
+        key = _make_key(b['model_id'], b['condition_id'])
+        if not b.get('base_path') or not os.path.isdir(str(b['base_path'])):
+            summary['no_audio'] += 1
+            continue
+        reason = 'forced' if force else stale_reason(b, param_hash, code_ver)
+        if reason is None:
+            summary['fresh'] += 1
+            continue
+        prev = state['pairs'].get(key) or {}
+        if prev.get('status') == 'failed' and not retry_failed and not force:
+            summary['skipped_failed'] += 1
+            continue
+        todo.append(dict(b, reason=reason))
+    summary['stale'] = len(todo)
+    return todo, summary
+
+def run(procs: int = 2, *, model_ids: Optional[List[int]] = None, condition_ids: Optional[List[int]] = None,
+        force: bool = False, retry_failed: bool = False, dry_run: bool = False, limit: int = 0,
+        cpu_budget_sec: int = 0, job_workers: int = 0, nice: int = 10,
+        state_path: Optional[str] = None, out=None) -> Dict[str, Any]:
+    out = out or sys.stdout
+    params, param_hash = default_params_with_hash(fresh=True)
+    code_ver = CODE_VERSION or ''
+    signature = f"ph={param_hash}|cv={code_ver}"
+    state_path = state_path or _default_state_path()
+    state = _load_state(state_path, signature)
+
+    bindings = list_bindings(model_ids, condition_ids)
+    todo, summary = _plan(bindings, param_hash, code_ver, state, force, retry_failed)
+    if limit and limit > 0:
+        todo = todo[:int(limit)]
+    print(f"[precompute] param_hash={param_hash[:12]} code_version={code_ver or '-'} "
+          f"bindings={summary['total']} fresh={summary['fresh']} stale={summary['stale']} "
+          f"no_audio={summary['no_audio']} skipped_failed={summary['skipped_failed']} run={len(todo)}",
+          file=out, flush=True)
+    if dry_run or not todo:
+        for b in todo:
+            print(f"  {b['model_id']}_{b['condition_id']} reason={b['reason']} batch={b['audio_batch_id']}", file=out)
+        return {'summary': summary, 'done': 0, 'failed': 0, 'planned': len(todo)}
+
+    import multiprocessing as mp
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+
+    run_overrides = {'num_workers': int(job_workers)} if job_workers > 0 else None
+    n_done = n_fail = 0
+    t0 = time.time()
+    try:
+        with ProcessPoolExecutor(max_workers=max(1, int(procs)),
+                                 mp_context=mp.get_context('spawn'),
+                                 initializer=_init_rebuild_worker, initargs=(int(nice),)) as pool:
+            futs = {}
+            for b in todo:
+                args = (b['model_id'], b['condition_id'], b['audio_batch_id'], b['base_path'],
+                        params, b.get('perf_batch_id'), int(cpu_budget_sec), run_overrides)
+                futs[pool.submit(_process_job, *args)] = (b, time.time())
+            for i, fut in enumerate(as_completed(futs), 1):
+                b, t_sub = futs[fut]
+                key = _make_key(b['model_id'], b['condition_id'])
+                try:
+                    res = fut.result() or {}
+                    err = None if res.get('ok') else (res.get('error') or 'rebuild_not_ok')
+                except Exception as e:
+                    err = f"{type(e).__name__}: {str(e).splitlines()[0] if str(e) else ''}"
+                if err is None:
+                    n_done += 1
+                else:
+                    n_fail += 1
+                state['pairs'][key] = {'status': 'done' if err is None else 'failed',
+                                       'reason': b['reason'], 'error': err, 'at': _now()}
+                _save_state(state_path, state)
+                elapsed = time.time() - t0
+                eta = elapsed / i * (len(todo) - i)
+                print(f"[{i}/{len(todo)}] {key} {'ok' if err is None else 'FAIL'} reason={b['reason']} "
+                      f"elapsed={_fmt_sec(elapsed)} eta={_fmt_sec(eta)}" + (f" error={err}" if err else ''),
+                      file=out, flush=True)
+    except KeyboardInterrupt:
+        print("[precompute] interrupted; rerun to resume", file=out, flush=True)
+        raise
+    print(f"[precompute] finished done={n_done} failed={n_fail} in {_fmt_sec(time.time() - t0)}",
+          file=out, flush=True)
+    return {'summary': summary, 'done': n_done, 'failed': n_fail, 'planned': len(todo)}
+
+def _pack_maintenance(migrate: bool, compact: bool, out=None) -> int:
+    out = out or sys.stdout
+    store = pchip_cache.cache_pack()
+    if store is None:
+        print("[precompute] CURVE_PACK_ENABLE=0，未启用合并存储", file=out)
+        return 1
+    if migrate:
+        n_perf = pchip_cache.migrate_perf_files_to_pack()
+        n_spec = spectrum_cache.migrate_files_to_pack()
+        print(f"[precompute] pack migrated perf={n_perf} spectrum={n_spec}", file=out, flush=True)
+    if compact:
+        store.compact()
+    print(f"[precompute] pack {json.dumps(store.snapshot(), ensure_ascii=False)}", file=out, flush=True)
+    return 0
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="批量预计算 perf_audio_binding 中全部 (型号, 工况) 的频谱缓存")
+    ap.add_argument("--procs", type=int, default=int(os.getenv('CURVE_REBUILD_PROCS', '2')), help="并行进程数")
+    ap.add_argument("--job-workers", type=int, default=int(os.getenv('CURVE_REBUILD_JOB_WORKERS', '0')),
+                    help="单次重建内部并行度（覆盖 params.num_workers，0 = 沿用参数）")
+    ap.add_argument("--cpu-budget-sec", type=int, default=int(os.getenv('CURVE_REBUILD_CPU_BUDGET_SEC', '0')),
+                    help="单次重建 CPU 秒上限（0 = 不限）")
+    ap.add_argument("--nice", type=int, default=int(os.getenv('CURVE_REBUILD_NICE', '10')), help="子进程 nice 值")
+    ap.add_argument("--model", type=int, action="append", default=[], help="仅处理指定 model_id（可重复）")
+    ap.add_argument("--condition", type=int, action="append", default=[], help="仅处理指定 condition_id（可重复）")
+    ap.add_argument("--limit", type=int, default=0, help="本次最多重建多少个（0 = 不限）")
+    ap.add_argument("--force", action="store_true", help="忽略缓存 meta，全部重建")
+    ap.add_argument("--retry-failed", action="store_true", help="续做时重试上次失败的 pair（默认跳过）")
+    ap.add_argument("--dry-run", action="store_true", help="只列出待重建项，不执行")
+    ap.add_argument("--state", type=str, default="", help="续做状态文件（默认 <CURVE_CACHE_DIR>/precompute_state.json）")
+    ap.add_argument("--pack-migrate", action="store_true", help="仅把旧的逐文件缓存并入合并存储后退出")
+    ap.add_argument("--pack-compact", action="store_true", help="仅压缩合并存储后退出")
+    args = ap.parse_args(argv)
+    dbpool.set_role('cli')
+
+    if args.pack_migrate or args.pack_compact:
+        return _pack_maintenance(args.pack_migrate, args.pack_compact)
+
+    res = run(args.procs, model_ids=args.model, condition_ids=args.condition,
+              force=args.force, retry_failed=args.retry_failed, dry_run=args.dry_run, limit=args.limit,
+              cpu_budget_sec=args.cpu_budget_sec, job_workers=args.job_workers, nice=args.nice,
+              state_path=args.state or None)
+    return 1 if res.get('failed') else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
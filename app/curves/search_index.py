@@ -0,0 +1,285 @@
+"""
+按工况（condition_id）的进程内搜索索引：
+
+- 一次读取该工况全部行，按 (model_id, condition_id) 分组后：
+    * 型号元数据（品牌/型号/尺寸/厚度/价格/点赞/最高转速）存为对齐数组
+    * 转速轴 / 噪音轴的原始点以 NaN 填充成二维数组
+    * rpm_to_airflow / noise_to_airflow 拟合曲线按行堆叠为 PchipStack
+- 查询（过滤 + 限制值 + 排序）在 NumPy 数组上向量化完成，
+  结果与 fancoolserver._effective_value_for_series 的“原始优先、无原始则拟合”逐项一致
+- 以数据版本戳失效（戳由调用方提供）；另有最大存活时间，用于刷新点赞数等非性能字段
+"""
+import os
+import time
+import threading
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+from .pchip_cache import PchipStack, get_or_build_unified_perf_model
+from .data_version import version_in, version_snapshot
+from . import metrics as _metrics
+
+def _env_enable() -> bool:
+    return (os.getenv("SEARCH_INDEX_ENABLE", "1") or "").strip() in ("1", "true", "True", "YES", "yes")
+
+def _env_max_age_sec() -> float:
+    try:
+        return max(0.0, float(os.getenv("SEARCH_INDEX_MAX_AGE_SEC", "60")))
+    except Exception:
+        return 60.0
+
+def _to_float(v) -> float:
+    try:
+        f = float(v) if v is not None else float("nan")
+    except Exception:
+        return float("nan")
+    return f if np.isfinite(f) else float("nan")
+
+def _versioned_perf_model(model_id: int, condition_id: int, rpm: list, airflow: list, noise: list,
+                          data_version: Optional[int] = None):
+    return get_or_build_unified_perf_model(model_id, condition_id, rpm, airflow, noise, data_version=data_version)
+
+def _first_true(mask: np.ndarray) -> np.ndarray:
+    # 每行第一个 True 的列号（整行无 True 时为 0，由调用方另行屏蔽）
+    return np.argmax(mask, axis=1) if mask.shape[1] else np.zeros((mask.shape[0],), np.intp)
+
+class _AxisData:
+    """单一轴向（rpm 或 noise_db）的原始点与拟合曲线。"""
+    __slots__ = ("rx", "ry", "nraw", "x_min", "x_max",
+                 "max_x", "max_y", "top_x", "top_y",
+                 "has_model", "fit_x0", "fit_x1", "stack")
+
+    def __init__(self, raw_xy: List[List[tuple]], models: List[Optional[Dict[str, Any]]]):
+        G = len(raw_xy)
+        P = max([len(v) for v in raw_xy] + [1])
+        self.rx = np.full((G, P), np.nan)
+        self.ry = np.full((G, P), np.nan)
+        self.nraw = np.zeros((G,), np.intp)
+        self.x_min = np.full((G,), np.nan); self.x_max = np.full((G,), np.nan)
+        self.max_x = np.full((G,), np.nan); self.max_y = np.full((G,), np.nan)
+        self.top_x = np.full((G,), np.nan); self.top_y = np.full((G,), np.nan)
+        for gi, pts in enumerate(raw_xy):
+            n = len(pts)
+            self.nraw[gi] = n
+            if n == 0:
+                continue
+            xs = [p[0] for p in pts]; ys = [p[1] for p in pts]
+            self.rx[gi, :n] = xs; self.ry[gi, :n] = ys
+            x_min, x_max = min(xs), max(xs)
+            self.x_min[gi] = x_min; self.x_max[gi] = x_max
+            # 未限制：原始最大风量点（同值取首个）
+            idx = max(range(n), key=lambda i: ys[i])
+            self.max_x[gi] = xs[idx]; self.max_y[gi] = ys[idx]
+            # 限制值 ≥ 最大 x：取 x_max 处最大风量点
+            idxs = [i for i, x in enumerate(xs) if abs(x - x_max) < 1e-9]
+            best = max(idxs, key=lambda i: ys[i])
+            self.top_x[gi] = xs[best]; self.top_y[gi] = ys[best]
+
+        self.has_model = np.array([bool(m and isinstance(m, dict)) for m in models], dtype=bool)
+        self.fit_x0 = np.array([_to_float(m.get("x0")) if (m and isinstance(m, dict)) else np.nan for m in models], float)
+        self.fit_x1 = np.array([_to_float(m.get("x1")) if (m and isinstance(m, dict)) else np.nan for m in models], float)
+        self.stack = PchipStack([m if (m and isinstance(m, dict)) else None for m in models])
+
+    def effective(self, lv: Optional[float], tol: float):
+        """返回 (ok, eff_x, eff_y, is_fit)，各为长度 G 的数组。"""
+        G = self.nraw.size
+        ok = self.nraw > 0
+        if lv is None:
+            return ok, self.max_x.copy(), self.max_y.copy(), np.zeros((G,), bool)
+
+        lv = float(lv)
+        eff_x = np.full((G,), np.nan); eff_y = np.full((G,), np.nan)
+        is_fit = np.zeros((G,), bool)
+        ok = ok & ~(lv < self.x_min - 1e-9)
+        todo = ok.copy()
+
+        top = todo & (lv >= self.x_max - 1e-9)
+        eff_x[top] = self.top_x[top]; eff_y[top] = self.top_y[top]
+        todo &= ~top
+
+        with np.errstate(invalid="ignore"):
+            match = (self.rx == lv) if tol == 0.0 else (np.abs(self.rx - lv) <= tol)
+        exact = todo & match.any(axis=1)
+        if np.any(exact):
+            j = _first_true(match)
+            r = np.nonzero(exact)[0]
+            eff_x[r] = self.rx[r, j[r]]; eff_y[r] = self.ry[r, j[r]]
+        todo &= ~exact
+
+        fit = todo & self.has_model
+        if np.any(fit):
+            # 与 float(mdl.get('x0') or lv) 一致：缺失或为 0 时退化为限制值
+            lo = np.where(np.isnan(self.fit_x0) | (self.fit_x0 == 0), lv, self.fit_x0)
+            hi = np.where(np.isnan(self.fit_x1) | (self.fit_x1 == 0), lv, self.fit_x1)
+            lx = np.maximum(lo, np.minimum(lv, hi))
+            y = self.stack.eval_rows(lx)
+            eff_x[fit] = lx[fit]; eff_y[fit] = y[fit]; is_fit[fit] = True
+        todo &= ~fit
+
+        if np.any(todo):
+            # 无拟合模型：取最接近限制值的原始点
+            d = np.abs(self.rx - lv)
+            d[np.isnan(d)] = np.inf
+            j = np.argmin(d, axis=1)
+            r = np.nonzero(todo)[0]
+            eff_x[r] = self.rx[r, j[r]]; eff_y[r] = self.ry[r, j[r]]
+        return ok, eff_x, eff_y, is_fit
+
+class ConditionIndex:
+    """单一工况的搜索索引；构建后只读，可被多线程共享。versions 为读取 rows 之前取的版本快照。"""
+
+    def __init__(self, condition_id: int, rows: List[dict], stamp: Any,
+                 perf_getter: Callable[..., Optional[Dict[str, Any]]] = _versioned_perf_model,
+                 versions: Optional[Dict[tuple, int]] = None):
+        self.condition_id = int(condition_id)
+        self.stamp = stamp
+        self.built_at = time.time()
+
+        groups: Dict[tuple, dict] = {}
+        for r in rows:
+            mid = int(r['model_id']); cid = int(r['condition_id'])
+            g = groups.setdefault((mid, cid), {
+                'rows': [], 'brand': r['brand_name_zh'], 'model': r['model_name'],
+                'condition_name': r['condition_name_zh'], 'size': r['size'], 'thickness': r['thickness'],
+                'like_count': 0, 'max_speed': None, 'reference_price': r['reference_price']
+            })
+            g['rows'].append((r['rpm'], r['noise_db'], r['airflow']))
+            try:
+                g['like_count'] = max(g['like_count'], int(r['like_count']))
+            except Exception:
+                pass
+            try:
+                if r['rpm'] is not None:
+                    g['max_speed'] = max(g['max_speed'] or 0, int(r['rpm']))
+            except Exception:
+                pass
+
+        self.keys = list(groups.keys())
+        self.meta = [groups[k] for k in self.keys]
+        self.size = np.array([_to_float(g['size']) for g in self.meta], float)
+        self.thickness = np.array([_to_float(g['thickness']) for g in self.meta], float)
+        self.price = np.array([_to_float(g['reference_price']) for g in self.meta], float)
+
+        raw_rpm: List[List[tuple]] = []
+        raw_noise: List[List[tuple]] = []
+        m_rpm: List[Optional[Dict[str, Any]]] = []
+        m_noise: List[Optional[Dict[str, Any]]] = []
+        for (mid, cid), g in zip(self.keys, self.meta):
+            rpm = [t[0] for t in g['rows']]
+            noise = [t[1] for t in g['rows']]
+            airflow = [t[2] for t in g['rows']]
+            raw_rpm.append(self._valid_xy(rpm, airflow))
+            raw_noise.append(self._valid_xy(noise, airflow))
+            unified = perf_getter(mid, cid, rpm, airflow, noise, data_version=version_in(versions, mid, cid)) or {}
+            p = unified.get('pchip') or {}
+            m_rpm.append(p.get('rpm_to_airflow'))
+            m_noise.append(p.get('noise_to_airflow'))
+            del g['rows']
+        self.axes = {'rpm': _AxisData(raw_rpm, m_rpm), 'noise_db': _AxisData(raw_noise, m_noise)}
+
+    @staticmethod
+    def _valid_xy(xs: list, ys: list) -> List[tuple]:
+        out = []
+        for x, y in zip(xs, ys):
+            try:
+                xf = float(x) if x is not None else None
+                yf = float(y) if y is not None else None
+            except Exception:
+                continue
+            if xf is None or yf is None:
+                continue
+            if not (np.isfinite(xf) and np.isfinite(yf)):
+                continue
+            out.append((xf, yf))
+        return out
+
+    def query(self, sort_by: str = 'none', sort_value: Optional[float] = None,
+              size_filter=None, thickness_min=None, thickness_max=None,
+              price_min=None, price_max=None, limit: int = 200) -> List[dict]:
+        G = len(self.keys)
+        if G == 0:
+            return []
+        mask = np.ones((G,), bool)
+        with np.errstate(invalid="ignore"):
+            if size_filter and size_filter != '不限':
+                mask &= (self.size == float(int(size_filter)))
+            if thickness_min is not None and thickness_max is not None:
+                mask &= (self.thickness >= int(thickness_min)) & (self.thickness <= int(thickness_max))
+            if price_min is not None and price_max is not None:
+                mask &= (self.price >= int(price_min)) & (self.price <= int(price_max))
+
+        axis = 'rpm' if sort_by == 'rpm' or sort_by == 'none' else 'noise_db'
+        lv = None if sort_by == 'none' else float(sort_value)
+        tol = 0.05 if axis == 'noise_db' else 0.0
+        ok, eff_x, eff_y, is_fit = self.axes[axis].effective(lv, tol)
+        mask &= ok
+
+        idx = np.nonzero(mask)[0]
+        if idx.size == 0:
+            return []
+        # 与 list.sort(reverse=True) 一致：按有效风量降序，同值保持分组原始顺序
+        order = idx[np.argsort(-eff_y[idx], kind='stable')][:max(0, int(limit))]
+
+        items = []
+        for gi in order.tolist():
+            mid, cid = self.keys[gi]
+            g = self.meta[gi]
+            eff = float(eff_y[gi])
+            items.append({
+                'model_id': mid, 'condition_id': cid,
+                'brand_name_zh': g['brand'], 'model_name': g['model'], 'condition_name_zh': g['condition_name'],
+                'size': g['size'], 'thickness': g['thickness'], 'like_count': g['like_count'],
+                'effective_airflow': eff, 'effective_x': float(eff_x[gi]),
+                'effective_axis': axis, 'effective_source': 'fit' if is_fit[gi] else 'raw',
+                'max_airflow': eff, 'max_speed': g['max_speed'],
+                'reference_price': g['reference_price']
+            })
+        return items
+
+# =========================
+# 进程内索引表
+# =========================
+
+_INDEX: Dict[int, ConditionIndex] = {}
+_INDEX_LOCK = threading.Lock()
+_BUILD_LOCKS: Dict[int, threading.Lock] = {}
+
+def get_condition_index(condition_id: int, stamp: Any,
+                        load_rows: Callable[[], List[dict]]) -> Optional[ConditionIndex]:
+    """
+    取工况索引；戳不一致或超过最大存活时间则重建（同一工况并发请求只重建一次）。
+    关闭（SEARCH_INDEX_ENABLE=0）时返回 None，由调用方走原查询路径。
+    """
+    if not _env_enable():
+        return None
+    cid = int(condition_id)
+    max_age = _env_max_age_sec()
+
+    def _fresh(ix: Optional[ConditionIndex]) -> bool:
+        return ix is not None and ix.stamp == stamp and (time.time() - ix.built_at) <= max_age
+
+    ix = _INDEX.get(cid)
+    if _fresh(ix):
+        _metrics.cache_lookup("search_index", "mem")
+        return ix
+    with _INDEX_LOCK:
+        lk = _BUILD_LOCKS.setdefault(cid, threading.Lock())
+    with lk:
+        ix = _INDEX.get(cid)
+        if _fresh(ix):
+            _metrics.cache_lookup("search_index", "mem")
+            return ix
+        _metrics.cache_lookup("search_index", "rebuild")
+        versions = version_snapshot()      # 先取版本再读行
+        ix = ConditionIndex(cid, load_rows(), stamp, versions=versions)
+        _INDEX[cid] = ix
+        return ix
+
+def invalidate_condition_index(condition_id: Optional[int] = None):
+    """丢弃指定工况（或全部）的索引。"""
+    with _INDEX_LOCK:
+        if condition_id is None:
+            _INDEX.clear()
+        else:
+            _INDEX.pop(int(condition_id), None)
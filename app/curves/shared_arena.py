@@ -0,0 +1,313 @@
+"""
+跨进程共享的只追加内存映射缓存区（arena）：同机多个 gunicorn worker 共用一份已构建的条目。
+
+- 数据文件 {name}.{gen}.bin：条目字节依次追加（8 字节对齐），写入后不再修改
+- 索引文件 {name}.{gen}.idx：定长开放寻址槽表（键散列 → 偏移/长度），各进程只读映射
+- 键内含数据版本，条目不可变：写者先写偏移/长度、最后写键散列；读者见到散列即可安全读取，无需加锁
+- 写者以 flock 串行，持锁后总是重读指针文件；槽位装载率或数据文件超限时以 O_EXCL 新建下一代文件
+  （代号递增、从不截断已有文件；旧代标记退役后删除，已映射的读者在下一次查询时改读新代；
+  仍被引用的旧映射由内核保留至释放）
+- 仅 POSIX（依赖 fcntl）；不可用时 enabled() 为 False，调用方跳过这一层
+"""
+import os
+import mmap
+import time
+import struct
+import hashlib
+import threading
+from typing import Callable, Dict, Optional
+
+import numpy as np
+
+try:
+    import fcntl  # type: ignore
+except ImportError:  # Windows
+    fcntl = None  # type: ignore
+
+_IDX_MAGIC = b"ARNI"
+_IDX_VERSION = 1
+_IDX_HEAD = 64                       # magic, u32 版本, u32 槽数, u64 代号, u32 退役标记, 其余保留
+_SLOT = np.dtype([("h", "<u8"), ("off", "<u8"), ("len", "<u8"), ("rsv", "<u8")])
+_MAX_LOAD = 0.7
+
+def key_hash(key: str) -> int:
+    h = int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "little")
+    return h or 1                    # 0 表示空槽
+
+class _Gen:
+    """某一代索引 + 数据文件的只读映射。"""
+    __slots__ = ("gen", "idx_mm", "slots", "nslots", "bin_fd", "bin_mm", "bin_size")
+
+    def __init__(self, gen: int, idx_path: str, bin_path: str):
+        self.gen = gen
+        with open(idx_path, "rb") as f:
+            self.idx_mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        nslots = struct.unpack_from("<I", self.idx_mm, 8)[0]
+        self.nslots = int(nslots)
+        self.slots = np.frombuffer(self.idx_mm, dtype=_SLOT, count=self.nslots, offset=_IDX_HEAD)
+        self.bin_fd = os.open(bin_path, os.O_RDONLY)
+        self.bin_mm = None
+        self.bin_size = 0
+
+    @property
+    def retired(self) -> bool:
+        return struct.unpack_from("<I", self.idx_mm, 24)[0] != 0
+
+    def probe(self, h: int) -> int:
+        """返回散列所在槽号；未命中返回 -1。"""
+        n = self.nslots
+        i = h % n
+        slots = self.slots
+        for _ in range(n):
+            sh = int(slots["h"][i])
+            if sh == 0:
+                return -1
+            if sh == h:
+                return i
+            i = (i + 1) % n
+        return -1
+
+    def view(self, off: int, length: int) -> Optional[memoryview]:
+        end = off + length
+        if self.bin_mm is None or end > self.bin_size:
+            size = os.fstat(self.bin_fd).st_size
+            if end > size:
+                return None
+            # 数据文件只增不改：重映射到当前长度；旧映射由仍在使用的视图持有，不主动 close
+            self.bin_mm = mmap.mmap(self.bin_fd, size, access=mmap.ACCESS_READ)
+            self.bin_size = size
+        return memoryview(self.bin_mm)[off:end]
+
+    def close(self):
+        try:
+            os.close(self.bin_fd)
+        except Exception:
+            pass
+
+class SharedArena:
+    """
+    base_dir：返回目录的可调用对象（按调用时的环境变量取值）。
+    get(key) 返回条目字节的只读 memoryview（零拷贝，指向共享映射）；put(key, data) 发布条目。
+    """
+    def __init__(self, base_dir: Callable[[], str], name: str, *, max_bytes: int, nslots: int):
+        self._base_dir = base_dir
+        self.name = name
+        self.max_bytes = int(max_bytes)
+        self.nslots = max(1024, int(nslots))
+        self._lock = threading.Lock()
+        self._pid = 0
+        self._cur: Optional[_Gen] = None
+        self._absent_until = 0.0         # 尚无任何一代时，限制读指针文件的频率
+        self.stats: Dict[str, int] = {"hit": 0, "miss": 0, "publish": 0, "rotate": 0, "error": 0}
+
+    @staticmethod
+    def enabled() -> bool:
+        return fcntl is not None
+
+    # ---------- 路径 ----------
+    def _dir(self) -> str:
+        d = os.path.abspath(self._base_dir())
+        os.makedirs(d, exist_ok=True)
+        return d
+
+    def _paths(self, gen: int):
+        d = self._dir()
+        return (os.path.join(d, f"{self.name}.{gen}.idx"), os.path.join(d, f"{self.name}.{gen}.bin"))
+
+    def _cur_path(self) -> str:
+        return os.path.join(self._dir(), f"{self.name}.cur")
+
+    def _lock_path(self) -> str:
+        return os.path.join(self._dir(), f"{self.name}.lock")
+
+    def _read_cur_gen(self) -> int:
+        try:
+            with open(self._cur_path(), "r", encoding="ascii") as f:
+                return int(f.read().strip() or 0)
+        except Exception:
+            return 0
+
+    # ---------- 打开/切换 ----------
+    def _open_current(self, fresh: bool = False) -> Optional[_Gen]:
+        """
+        当前代映射；fork 后或旧代退役时重新打开。调用方持有 self._lock。
+        fresh=True（写者持 flock 时）：总是重读指针文件，不受“尚无一代”的限频影响。
+        """
+        pid = os.getpid()
+        cur = self._cur
+        gen = self._read_cur_gen() if fresh else None
+        if cur is not None and self._pid == pid and not cur.retired and (gen is None or gen == cur.gen):
+            return cur
+        if not fresh and cur is None and self._pid == pid and time.monotonic() < self._absent_until:
+            return None
+        if cur is not None:
+            cur.close()
+        self._cur = None
+        self._pid = pid
+        if gen is None:
+            gen = self._read_cur_gen()
+        if gen <= 0:
+            self._absent_until = time.monotonic() + 1.0
+            return None
+        idx_p, bin_p = self._paths(gen)
+        try:
+            self._cur = _Gen(gen, idx_p, bin_p)
+        except Exception:
+            self._cur = None
+        return self._cur
+
+    def _max_gen_on_disk(self) -> int:
+        prefix = self.name + "."
+        top = 0
+        for fn in os.listdir(self._dir()):
+            if not fn.startswith(prefix) or not fn.endswith((".idx", ".bin")):
+                continue
+            try:
+                top = max(top, int(fn[len(prefix):-4]))
+            except ValueError:
+                pass
+        return top
+
+    def _create_gen(self):
+        """
+        写者持 flock 调用：以 O_EXCL 新建下一代空文件（代号大于指针与目录中已有的任何一代，
+        从不截断可能已被其它进程映射的文件），切换指针，旧代标记退役后删除。
+        """
+        old = self._read_cur_gen()
+        gen = max(old, self._max_gen_on_disk()) + 1
+        flags = os.O_WRONLY | os.O_CREAT | os.O_EXCL
+        while True:
+            idx_p, bin_p = self._paths(gen)
+            try:
+                fd = os.open(idx_p, flags, 0o644)
+            except FileExistsError:
+                gen += 1
+                continue
+            try:
+                bfd = os.open(bin_p, flags, 0o644)
+            except FileExistsError:
+                os.close(fd)
+                os.remove(idx_p)
+                gen += 1
+                continue
+            os.close(bfd)
+            break
+        head = bytearray(_IDX_HEAD)
+        struct.pack_into("<4sIIQI", head, 0, _IDX_MAGIC, _IDX_VERSION, self.nslots, gen, 0)
+        with os.fdopen(fd, "wb") as f:
+            f.write(head)
+            f.truncate(_IDX_HEAD + self.nslots * _SLOT.itemsize)
+        tmp = self._cur_path() + f".tmp{os.getpid()}"
+        with open(tmp, "w", encoding="ascii") as f:
+            f.write(str(gen))
+        os.replace(tmp, self._cur_path())
+        if old > 0:
+            old_idx, old_bin = self._paths(old)
+            try:
+                with open(old_idx, "r+b") as f:
+                    f.seek(24)
+                    f.write(struct.pack("<I", 1))
+            except Exception:
+                pass
+            for p in (old_idx, old_bin):
+                try:
+                    os.remove(p)
+                except Exception:
+                    pass
+        self._absent_until = 0.0
+        self.stats["rotate"] += 1
+
+    # ---------- 读 ----------
+    def get(self, key: str) -> Optional[memoryview]:
+        if fcntl is None:
+            return None
+        h = key_hash(key)
+        with self._lock:
+            try:
+                g = self._open_current()
+                if g is None:
+                    self.stats["miss"] += 1
+                    return None
+                i = g.probe(h)
+                if i < 0:
+                    self.stats["miss"] += 1
+                    return None
+                s = g.slots[i]
+                mv = g.view(int(s["off"]), int(s["len"]))
+            except Exception:
+                self.stats["error"] += 1
+                return None
+            self.stats["hit" if mv is not None else "miss"] += 1
+            return mv
+
+    # ---------- 写 ----------
+    def put(self, key: str, data: bytes) -> bool:
+        """发布条目（键已存在时不覆盖）；单条超过上限或出错时返回 False。"""
+        if fcntl is None or not data:
+            return False
+        n = len(data)
+        if self.max_bytes > 0 and n > self.max_bytes:
+            return False
+        h = key_hash(key)
+        with self._lock:
+            try:
+                with open(self._lock_path(), "a+b") as lk:
+                    fcntl.flock(lk.fileno(), fcntl.LOCK_EX)
+                    try:
+                        return self._put_locked(h, data)
+                    finally:
+                        fcntl.flock(lk.fileno(), fcntl.LOCK_UN)
+            except Exception:
+                self.stats["error"] += 1
+                return False
+
+    def _put_locked(self, h: int, data: bytes) -> bool:
+        g = self._open_current(fresh=True)
+        if g is None:
+            self._create_gen()
+            g = self._open_current(fresh=True)
+        if g is None:
+            return False
+        if g.probe(h) >= 0:
+            return True
+        used = int(np.count_nonzero(g.slots["h"]))
+        size = os.fstat(g.bin_fd).st_size
+        if used + 1 > g.nslots * _MAX_LOAD or (self.max_bytes > 0 and size + len(data) > self.max_bytes):
+            self._create_gen()
+            g = self._open_current(fresh=True)
+            if g is None:
+                return False
+            size = 0
+        idx_p, bin_p = self._paths(g.gen)
+        off = size + ((-size) % 8)
+        pad = off - size
+        with open(bin_p, "ab") as f:
+            f.write(b"\0" * pad + bytes(data))
+        # 先写偏移/长度，最后写散列：读者见到散列即条目完整
+        n = g.nslots
+        i = h % n
+        with open(idx_p, "r+b") as f:
+            mm = mmap.mmap(f.fileno(), 0)
+            try:
+                slots = np.frombuffer(mm, dtype=_SLOT, count=n, offset=_IDX_HEAD)
+                while int(slots["h"][i]) != 0:
+                    i = (i + 1) % n
+                slots["off"][i] = off
+                slots["len"][i] = len(data)
+                slots["h"][i] = h
+                del slots
+                mm.flush()
+            finally:
+                mm.close()
+        self.stats["publish"] += 1
+        return True
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            out = dict(self.stats)
+            g = self._cur
+            if g is not None and not g.retired:
+                out["gen"] = g.gen
+                out["entries"] = int(np.count_nonzero(g.slots["h"]))
+                out["bytes"] = int(os.fstat(g.bin_fd).st_size)
+            return out
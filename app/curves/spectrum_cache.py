@@ -1,42 +1,101 @@
 # -*- coding: utf-8 -*-
 """
-spectrum_cache: 频谱模型缓存的统一管理（仅一份按 ID 命名的文件）
-文件命名：{model_id}_{condition_id}_spectrum.json
+spectrum_cache: 频谱模型缓存的统一管理（每个 (型号, 工况) 仅一份）
+存放：合并存储 <CURVE_CACHE_DIR>/pack 中的键 spectrum/{model_id}_{condition_id}（见 pack_store）；
+CURVE_PACK_ENABLE=0 时沿用逐文件布局 {model_id}_{condition_id}_spectrum.json。
+旧文件在首次读取时自动迁入合并存储，亦可用 python -m app.curves.precompute --pack-migrate 一次性迁移。
 可供前端对外服务与后台管理端复用。
+
+load_slim：对外接口用的瘦身模型（已按当前编码选项序列化）常驻进程内存，按条目内容标识
+（合并存储的 长度/crc，或文件 mtime/大小）校验；save/delete 时主动失效。
+环境变量：SPECTRUM_SLIM_CACHE_MAX（条数上限，默认 512；0 关闭）
 """
 from __future__ import annotations
 import os
+import re
 import json
+import threading
+from collections import OrderedDict
 from datetime import datetime
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Tuple
 
 try:
-    from .pchip_cache import curve_cache_dir
+    from .pchip_cache import curve_cache_dir, cache_pack
+    from . import metrics as _metrics
+    from . import fastjson
 except Exception:
     import sys
     CURVES_DIR = os.path.abspath(os.path.dirname(__file__))
     if CURVES_DIR not in sys.path:
         sys.path.append(CURVES_DIR)
-    from pchip_cache import curve_cache_dir  # type: ignore
+    from pchip_cache import curve_cache_dir, cache_pack  # type: ignore
+    import metrics as _metrics  # type: ignore
+    import fastjson  # type: ignore
 
 def path(model_id: int, condition_id: int) -> str:
+    """逐文件布局下的路径（启用合并存储时仅作迁移来源）。"""
     base = os.path.abspath(curve_cache_dir())
     os.makedirs(base, exist_ok=True)
     return os.path.join(base, f"{int(model_id)}_{int(condition_id)}_spectrum.json")
 
+def _key(model_id: int, condition_id: int) -> str:
+    return f"spectrum/{int(model_id)}_{int(condition_id)}"
+
+def locator(model_id: int, condition_id: int) -> str:
+    """缓存位置描述（供日志/接口回显）：合并存储为 <pack 目录>#<键>，否则为文件路径。"""
+    store = cache_pack()
+    if store is None:
+        return path(model_id, condition_id)
+    return f"{store.root}#{_key(model_id, condition_id)}"
+
 def exists(model_id: int, condition_id: int) -> bool:
+    store = cache_pack()
+    if store is not None and _key(model_id, condition_id) in store:
+        return True
     return os.path.isfile(path(model_id, condition_id))
 
-def load(model_id: int, condition_id: int) -> Optional[Dict[str, Any]]:
-    p = path(model_id, condition_id)
-    if not os.path.isfile(p):
-        return None
+def _read_file(p: str) -> Optional[bytes]:
     try:
-        with open(p, "r", encoding="utf-8") as f:
-            return json.load(f)
+        with open(p, "rb") as f:
+            return f.read()
     except Exception:
         return None
 
+def _load_bytes(model_id: int, condition_id: int) -> Optional[bytes]:
+    """取原始 JSON 字节：合并存储优先，未命中回退旧文件并迁入。"""
+    store = cache_pack()
+    if store is not None:
+        raw = store.get(_key(model_id, condition_id))
+        if raw is not None:
+            return raw
+    p = path(model_id, condition_id)
+    if not os.path.isfile(p):
+        return None
+    raw = _read_file(p)
+    if raw is not None and store is not None:
+        # 仅在键仍不存在时迁入：与 save() 并发时不以旧文件覆盖刚写入的新模型
+        if not store.put_if_absent(_key(model_id, condition_id), raw):
+            raw = store.get(_key(model_id, condition_id)) or raw
+        try:
+            os.remove(p)
+        except Exception:
+            pass
+    return raw
+
+def load(model_id: int, condition_id: int) -> Optional[Dict[str, Any]]:
+    with _metrics.CACHE_LOAD_SECONDS.time(cache="spectrum"):
+        raw = _load_bytes(model_id, condition_id)
+        if raw is None:
+            _metrics.cache_lookup("spectrum", "miss")
+            return None
+        try:
+            out = json.loads(raw)
+        except Exception:
+            _metrics.cache_lookup("spectrum", "corrupt")
+            return None
+    _metrics.cache_lookup("spectrum", "disk")
+    return out
+
 def save(model_json: Dict[str, Any], *, model_id: int, condition_id: int,
          extra_meta: Optional[Dict[str, Any]] = None) -> Dict[str, str]:
     """
@@ -55,6 +114,17 @@ def save(model_json: Dict[str, Any], *, model_id: int, condition_id: int,
         out["meta"].update(extra_meta)
 
     p = path(model_id, condition_id)
+    store = cache_pack()
+    if store is not None:
+        # 合并存储的批量写本身是原子的（提交记录之后才可见）
+        store.put(_key(model_id, condition_id), json.dumps(out, ensure_ascii=False).encode("utf-8"))
+        try:
+            os.remove(p)
+        except Exception:
+            pass
+        invalidate_slim(model_id, condition_id)
+        return {"path": locator(model_id, condition_id)}
+
     # 原子覆盖写入（避免并发读到半成品）
     import tempfile
     d = os.path.dirname(p)
@@ -70,29 +140,155 @@ def save(model_json: Dict[str, Any], *, model_id: int, condition_id: int,
         except Exception:
             # Ignore errors during temp file cleanup; leftover temp files are not critical.
             pass
+    invalidate_slim(model_id, condition_id)
     return {"path": p}
 
 def delete(model_id: int, condition_id: int) -> bool:
+    removed = False
+    store = cache_pack()
+    if store is not None:
+        removed = store.delete(_key(model_id, condition_id))
     p = path(model_id, condition_id)
     try:
         if os.path.isfile(p):
             os.remove(p)
-            return True
-        return False
+            removed = True
     except Exception:
-        return False
+        pass
+    invalidate_slim(model_id, condition_id)
+    return removed
 
 def validate(model_id: int, condition_id: int) -> Dict[str, Any]:
-    p = path(model_id, condition_id)
-    if not os.path.isfile(p):
-        return {"exists": False, "valid": False, "reason": "not-found", "path": p, "meta": {}}
+    loc = locator(model_id, condition_id)
+    raw = _load_bytes(model_id, condition_id)
+    if raw is None:
+        return {"exists": False, "valid": False, "reason": "not-found", "path": loc, "meta": {}}
     try:
-        with open(p, "r", encoding="utf-8") as f:
-            j = json.load(f)
+        j = json.loads(raw)
         t = (j.get("type") if isinstance(j, dict) else None) or ""
         ok_type = t in ("spectrum_v1", "spectrum_v2")
         ok = isinstance(j, dict) and ok_type and isinstance(j.get("model"), dict)
         meta = (j.get("meta") or {}) if isinstance(j, dict) else {}
-        return {"exists": True, "valid": bool(ok), "reason": None if ok else "bad-structure", "path": p, "meta": meta}
+        return {"exists": True, "valid": bool(ok), "reason": None if ok else "bad-structure", "path": loc, "meta": meta}
+    except Exception:
+        return {"exists": True, "valid": False, "reason": "read-error", "path": loc, "meta": {}}
+
+# =========================
+# 瘦身模型内存缓存
+# =========================
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, str(default)))
     except Exception:
-        return {"exists": True, "valid": False, "reason": "read-error", "path": p, "meta": {}}
\ No newline at end of file
+        return default
+
+_SLIM_MAX = max(0, _env_int("SPECTRUM_SLIM_CACHE_MAX", 512))
+_slim_lock = threading.Lock()
+_slim: "OrderedDict[Tuple[int, int], Dict[str, Any]]" = OrderedDict()
+
+def slim_model(m: Dict[str, Any]) -> Dict[str, Any]:
+    """对外接口返回的瘦身模型（去掉标定细节、谐波与诊断字段）。"""
+    m = m or {}
+    calib = m.get("calibration") or {}
+    calib_model = calib.get("calib_model") or {}
+    return {
+        "version": m.get("version"),
+        "centers_hz": m.get("centers_hz") or m.get("freq_hz") or m.get("freq") or [],
+        "band_models_pchip": m.get("band_models_pchip") or [],
+        "rpm_min": m.get("rpm_min") or calib_model.get("x0"),
+        "rpm_max": m.get("rpm_max") or calib_model.get("x1"),
+        "calibration": {
+            "rpm_peak": calib.get("rpm_peak"),
+            "rpm_peak_tol": calib.get("rpm_peak_tol"),
+            "session_delta_db": calib.get("session_delta_db"),
+        },
+        "anchor_presence": m.get("anchor_presence") or {},
+    }
+
+def _stamp(model_id: int, condition_id: int) -> Optional[tuple]:
+    """缓存条目内容标识；不存在返回 None。"""
+    store = cache_pack()
+    if store is not None:
+        st = store.entry_stamp(_key(model_id, condition_id))
+        if st is not None:
+            return ("pack",) + st
+    try:
+        s = os.stat(path(model_id, condition_id))
+        return ("file", s.st_mtime_ns, s.st_size)
+    except OSError:
+        return None
+
+def invalidate_slim(model_id: int, condition_id: int):
+    with _slim_lock:
+        _slim.pop((int(model_id), int(condition_id)), None)
+
+def load_slim(model_id: int, condition_id: int, digits: int = 0) -> Optional[Dict[str, Any]]:
+    """
+    返回 {type, meta, has_model, model, stamp} 或 None（无缓存/损坏）；stamp 为条目内容标识。
+    model 为瘦身模型：fastjson 启用时是已编码的 fastjson.Fragment（按 digits 舍入），否则为 dict。
+    """
+    k = (int(model_id), int(condition_id))
+    stamp = _stamp(*k)
+    if stamp is None:
+        invalidate_slim(*k)
+        _metrics.cache_lookup("spectrum_slim", "miss")
+        return None
+    fast = fastjson.enabled()
+    with _slim_lock:
+        ent = _slim.get(k)
+        if ent is not None and ent["stamp"] == stamp and ent["fast"] == fast and ent["digits"] == digits:
+            _slim.move_to_end(k)
+            _metrics.cache_lookup("spectrum_slim", "mem")
+            return ent["out"]
+    j = load(*k)
+    if not isinstance(j, dict):
+        _metrics.cache_lookup("spectrum_slim", "miss")
+        return None
+    raw = j.get("model") or {}
+    slim = slim_model(raw)
+    out = {
+        "type": j.get("type") or "spectrum_v2",
+        "meta": j.get("meta") or {},
+        "has_model": bool(raw),
+        "model": fastjson.Fragment(fastjson.encode(slim, digits)) if fast else slim,
+        "stamp": stamp,
+    }
+    _metrics.cache_lookup("spectrum_slim", "rebuild")
+    if _SLIM_MAX > 0:
+        with _slim_lock:
+            _slim[k] = {"stamp": stamp, "fast": fast, "digits": digits, "out": out}
+            _slim.move_to_end(k)
+            while len(_slim) > _SLIM_MAX:
+                _slim.popitem(last=False)
+    return out
+
+def slim_stats() -> Dict[str, int]:
+    with _slim_lock:
+        return {"entries": len(_slim), "max": _SLIM_MAX}
+
+_metrics.gauge_func("spectrum_slim", "Slim spectrum in-memory cache occupancy",
+                    lambda: {(k,): v for k, v in slim_stats().items()}, ("stat",))
+
+def migrate_files_to_pack(batch_size: int = 256) -> int:
+    """把 {mid}_{cid}_spectrum.json 批量并入合并存储并删除原文件；返回迁移条数。"""
+    store = cache_pack()
+    if store is None:
+        return 0
+    base = os.path.abspath(curve_cache_dir())
+    pat = re.compile(r"^(\d+)_(\d+)_spectrum\.json$")
+    names = sorted(fn for fn in os.listdir(base) if pat.match(fn))
+    n = 0
+    for i in range(0, len(names), max(1, int(batch_size))):
+        batch: Dict[str, Optional[bytes]] = {}
+        for fn in names[i:i + batch_size]:
+            m = pat.match(fn)
+            raw = _read_file(os.path.join(base, fn))
+            if raw is not None:
+                batch[_key(int(m.group(1)), int(m.group(2)))] = raw
+        n += store.put_many(batch, if_absent=True)
+        for fn in names[i:i + batch_size]:
+            try:
+                os.remove(os.path.join(base, fn))
+            except Exception:
+                pass
+    return n
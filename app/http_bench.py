@@ -0,0 +1,534 @@
+# -*- coding: utf-8 -*-
+"""
+http_bench: 前台接口 HTTP 级压测（本地 SQLite 替身库，不依赖生产 MySQL）
+
+- seed：建 SQLite 替身库，表/视图形态对齐 general_view / meta_view / user_likes_view /
+  like(query)_rank_d30_view 等；按 N 品牌 × M 型号 × K 工况生成合成目录，
+  并为部分 (型号, 工况) 写入与当前 param_hash 一致的频谱缓存与音频绑定
+- run：在本进程以 FANDB_DSN=sqlite 启动 fancoolserver.app（werkzeug 多线程），驱动器按
+  真实比例回放请求（热门 pair 按 Zipf 分布），输出各接口 p50/p95/p99
+- --url：只做驱动，打到外部已启动的服务（如 gunicorn 指向同一份替身库，用于评估 worker 数）
+
+用法（仓库根目录）：
+  python -m app.http_bench --db /tmp/fc_bench.sqlite --seed-only
+  python -m app.http_bench --db /tmp/fc_bench.sqlite --requests 5000 --concurrency 8 --out bench_http.json
+  python -m app.http_bench --url http://127.0.0.1:5001 --db /tmp/fc_bench.sqlite --requests 5000 --concurrency 16
+
+说明：
+  - 替身库为 SQLite，MySQL 专有函数（NOW/CONCAT/DATE_FORMAT/GET_LOCK 等）在连接建立时注册同名函数
+  - 缓存缺失的频谱对应的绑定不带 base_path，接口返回 missing 而不会触发后台重建
+"""
+from __future__ import annotations
+import os
+import sys
+import json
+import math
+import time
+import hmac
+import random
+import sqlite3
+import hashlib
+import argparse
+import tempfile
+import threading
+import http.client
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+SCHEMA_SQL = """
+CREATE TABLE fan_brand (
+  brand_id INTEGER PRIMARY KEY, brand_name_zh TEXT, is_valid INTEGER DEFAULT 1);
+CREATE TABLE fan_model (
+  model_id INTEGER PRIMARY KEY, brand_id INTEGER, model_name TEXT, size INTEGER, thickness INTEGER,
+  reference_price INTEGER, fan_blades INTEGER, is_valid INTEGER DEFAULT 1);
+CREATE TABLE working_condition (
+  condition_id INTEGER PRIMARY KEY, condition_name_zh TEXT, resistance_type_zh TEXT,
+  resistance_location_zh TEXT, is_valid INTEGER DEFAULT 1);
+CREATE TABLE fan_performance_data (
+  data_id INTEGER PRIMARY KEY, model_id INTEGER, condition_id INTEGER, batch_id TEXT,
+  rpm INTEGER, airflow_cfm REAL, noise_db REAL, is_valid INTEGER DEFAULT 1, update_date TEXT);
+CREATE INDEX ix_fpd_mc ON fan_performance_data (model_id, condition_id, rpm);
+CREATE INDEX ix_fpd_c ON fan_performance_data (condition_id);
+CREATE TABLE rate_logs (
+  user_identifier TEXT, model_id INTEGER, condition_id INTEGER, rate_id INTEGER, is_valid INTEGER,
+  create_date TEXT, update_date TEXT, PRIMARY KEY (user_identifier, model_id, condition_id, rate_id));
+CREATE TABLE query_logs (
+  id INTEGER PRIMARY KEY, user_identifier TEXT, model_id INTEGER, condition_id INTEGER,
+  batch_id TEXT, source TEXT, create_date TEXT DEFAULT CURRENT_TIMESTAMP);
+CREATE TABLE visit_logs (id INTEGER PRIMARY KEY, user_identifier TEXT, create_date TEXT);
+CREATE TABLE event_logs (id INTEGER PRIMARY KEY, user_identifier TEXT, create_date TEXT);
+CREATE TABLE announcements (
+  id INTEGER PRIMARY KEY, content_text TEXT, is_valid INTEGER, starts_at TEXT, ends_at TEXT,
+  priority INTEGER, created_at TEXT);
+CREATE TABLE calibration_params (params_json TEXT, is_default INTEGER, updated_at TEXT);
+CREATE TABLE audio_batch (batch_id TEXT PRIMARY KEY, base_path TEXT, data_hash TEXT);
+CREATE TABLE perf_audio_binding (
+  model_id INTEGER, condition_id INTEGER, audio_batch_id TEXT, audio_data_hash TEXT,
+  perf_batch_id TEXT, created_at TEXT);
+CREATE INDEX ix_pab_mc ON perf_audio_binding (model_id, condition_id, created_at);
+
+CREATE VIEW general_view AS
+  SELECT d.model_id, d.condition_id, b.brand_name_zh, m.model_name, c.condition_name_zh,
+         c.resistance_type_zh, c.resistance_location_zh, m.size, m.thickness,
+         d.rpm, d.noise_db, d.airflow_cfm, lc.like_count, m.reference_price, d.is_valid, d.update_date
+  FROM fan_performance_data d
+  JOIN fan_model m ON m.model_id = d.model_id AND m.is_valid = 1
+  JOIN fan_brand b ON b.brand_id = m.brand_id AND b.is_valid = 1
+  JOIN working_condition c ON c.condition_id = d.condition_id AND c.is_valid = 1
+  LEFT JOIN (SELECT model_id, condition_id, COUNT(*) AS like_count FROM rate_logs
+             WHERE rate_id = 1 AND is_valid = 1 GROUP BY model_id, condition_id) lc
+         ON lc.model_id = d.model_id AND lc.condition_id = d.condition_id
+  WHERE d.is_valid = 1;
+
+CREATE VIEW meta_view AS
+  SELECT model_id, condition_id, brand_name_zh, model_name, condition_name_zh,
+         resistance_type_zh, resistance_location_zh, size, thickness, MAX(rpm) AS max_speed
+  FROM general_view
+  GROUP BY model_id, condition_id;
+
+CREATE VIEW user_likes_view AS
+  SELECT r.user_identifier, mv.model_id, mv.condition_id, mv.brand_name_zh, mv.model_name,
+         mv.condition_name_zh, mv.resistance_type_zh, mv.resistance_location_zh,
+         mv.max_speed, mv.size, mv.thickness
+  FROM rate_logs r
+  JOIN meta_view mv ON mv.model_id = r.model_id AND mv.condition_id = r.condition_id
+  WHERE r.rate_id = 1 AND r.is_valid = 1;
+"""
+
+# like/query 两个榜单视图结构相同，仅来源表与列前缀不同
+RANK_VIEW_SQL = """
+CREATE VIEW {pref}_rank_d30_view AS
+  WITH mc AS (SELECT model_id, condition_id, COUNT(*) AS n FROM {src} GROUP BY model_id, condition_id),
+       mm AS (SELECT model_id, SUM(n) AS tot FROM mc GROUP BY model_id),
+       mr AS (SELECT model_id, tot, DENSE_RANK() OVER (ORDER BY tot DESC) AS rk FROM mm)
+  SELECT mv.model_id, mv.condition_id, mv.brand_name_zh, mv.model_name, mv.condition_name_zh,
+         mv.resistance_type_zh, mv.resistance_location_zh, mv.size, mv.thickness, mv.max_speed,
+         fm.reference_price,
+         mr.tot AS {pref}_by_model_d30, mr.rk AS {pref}_rank_by_m_d30,
+         mc.n AS {pref}_by_model_condition_d30,
+         RANK() OVER (PARTITION BY mc.model_id ORDER BY mc.n DESC) AS {pref}_rank_by_m_c_d30
+  FROM mc
+  JOIN mr ON mr.model_id = mc.model_id
+  JOIN meta_view mv ON mv.model_id = mc.model_id AND mv.condition_id = mc.condition_id
+  JOIN fan_model fm ON fm.model_id = mc.model_id;
+"""
+RANK_SOURCES = {
+    'like': "(SELECT model_id, condition_id FROM rate_logs WHERE rate_id = 1 AND is_valid = 1)",
+    'query': "query_logs",
+}
+
+CONDITIONS = [
+    ("开放空间", "无风阻", "无"), ("散热器 120", "散热器", "前置"), ("散热器 240", "散热器", "后置"),
+    ("防尘网", "滤网", "前置"), ("机箱前板", "面板", "前置"), ("冷排双面", "散热器", "前后"),
+]
+SPECTRUM_BANDS = 120    # 对齐 1/12 倍频程 20 Hz–20 kHz 的量级
+SPECTRUM_NODES = 24
+
+# =========================
+# MySQL 函数替身（仅 SQLite 连接）
+# =========================
+_SHIMS_INSTALLED = False
+
+def _date_format(v, fmt):
+    if v is None:
+        return None
+    try:
+        dt = datetime.fromisoformat(str(v).replace('Z', ''))
+    except Exception:
+        return str(v)
+    return dt.strftime(str(fmt).replace('%i', '%M'))
+
+def _sqlite_shims(dbapi_conn, _record):
+    if not isinstance(dbapi_conn, sqlite3.Connection):
+        return
+    dbapi_conn.create_function("NOW", 0, lambda: datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+    dbapi_conn.create_function("CONCAT", -1, lambda *a: None if any(x is None for x in a) else ''.join(str(x) for x in a))
+    dbapi_conn.create_function("DATE_FORMAT", 2, _date_format)
+    dbapi_conn.create_function("GET_LOCK", 2, lambda _k, _t: 1)
+    dbapi_conn.create_function("RELEASE_LOCK", 1, lambda _k: 1)
+
+def install_sqlite_shims():
+    """对之后新建的全部 SQLite 连接注册 MySQL 同名函数（幂等）。"""
+    global _SHIMS_INSTALLED
+    if _SHIMS_INSTALLED:
+        return
+    from sqlalchemy import event
+    from sqlalchemy.engine import Engine
+    event.listen(Engine, 'connect', _sqlite_shims)
+    _SHIMS_INSTALLED = True
+
+# =========================
+# 合成目录
+# =========================
+def _bench_params() -> Dict[str, Any]:
+    return {"n_per_oct": 12, "frame_sec": 1.0, "hop_sec": 0.5, "bench": True}
+
+def _fake_spectrum_model(rng: random.Random, rpm_max: int) -> Dict[str, Any]:
+    centers = [20.0 * (2.0 ** (i / 12.0)) for i in range(SPECTRUM_BANDS)]
+    xs = [600.0 + (rpm_max - 600.0) * i / (SPECTRUM_NODES - 1) for i in range(SPECTRUM_NODES)]
+    bands = []
+    for fc in centers:
+        off = rng.uniform(-6.0, 6.0) - 3.0 * abs(math.log2(fc / 1000.0))
+        ys = [off + 50.0 * math.log10(x / 1000.0) for x in xs]
+        ms = [50.0 / (x * math.log(10.0)) for x in xs]
+        bands.append({"x": xs, "y": ys, "m": ms, "x0": xs[0], "x1": xs[-1]})
+    return {
+        "version": 2,
+        "centers_hz": centers,
+        "band_models_pchip": bands,
+        "rpm_min": xs[0],
+        "rpm_max": xs[-1],
+        "calibration": {"rpm_peak": None, "rpm_peak_tol": None, "session_delta_db": 0.0,
+                        "calib_model": {"x0": xs[0], "x1": xs[-1]}},
+        "anchor_presence": {},
+    }
+
+def seed_catalog(db_path: str, cache_dir: str, *, brands: int = 40, models_per_brand: int = 12,
+                 conditions: int = 6, points: int = 8, users: int = 2000, likes: int = 20000,
+                 queries: int = 50000, spectrum_ratio: float = 0.5, seed: int = 0) -> Dict[str, Any]:
+    """重建替身库与频谱缓存目录；返回目录摘要（pairs / condition_ids / users / secret 无关）。"""
+    rng = random.Random(seed)
+    if os.path.exists(db_path):
+        os.remove(db_path)
+    os.makedirs(cache_dir, exist_ok=True)
+    conn = sqlite3.connect(db_path)
+    conn.executescript(SCHEMA_SQL)
+    for pref, src in RANK_SOURCES.items():
+        conn.executescript(RANK_VIEW_SQL.format(pref=pref, src=src))
+
+    now = datetime.now()
+    n_cond = max(1, min(int(conditions), 64))
+    cond_rows = []
+    for cid in range(1, n_cond + 1):
+        name, rtype, rloc = CONDITIONS[(cid - 1) % len(CONDITIONS)]
+        suffix = f" #{(cid - 1) // len(CONDITIONS) + 1}" if cid > len(CONDITIONS) else ""
+        cond_rows.append((cid, name + suffix, rtype, rloc, 1))
+    conn.executemany("INSERT INTO working_condition VALUES (?,?,?,?,?)", cond_rows)
+
+    conn.executemany("INSERT INTO fan_brand VALUES (?,?,1)",
+                     [(b, f"品牌{b:03d}") for b in range(1, brands + 1)])
+    models, perf, pairs = [], [], []
+    mid = 0
+    data_id = 0
+    for b in range(1, brands + 1):
+        for j in range(models_per_brand):
+            mid += 1
+            size = rng.choice([120, 120, 120, 140])
+            thick = rng.choice([15, 25, 25, 25, 30, 38])
+            rpm_max = rng.choice([1500, 1800, 2000, 2200, 2500, 3000])
+            models.append((mid, b, f"FAN-{b:03d}-{j:02d}", size, thick, rng.randint(19, 399), rng.choice([7, 9, 11]), 1))
+            for cid in rng.sample(range(1, n_cond + 1), k=max(1, rng.randint(n_cond // 2, n_cond))):
+                pairs.append((mid, cid, rpm_max))
+                k_air = rng.uniform(0.03, 0.05) * (1.0 - 0.06 * ((cid - 1) % 6))
+                upd = (now - timedelta(days=rng.randint(0, 60))).strftime('%Y-%m-%d %H:%M:%S')
+                for p in range(points):
+                    rpm = int(600 + (rpm_max - 600) * p / max(1, points - 1))
+                    data_id += 1
+                    noise = None if rng.random() < 0.05 else round(18.0 + 50.0 * math.log10(rpm / 1000.0) + rng.uniform(-1, 1), 1)
+                    perf.append((data_id, mid, cid, f"pb{mid}_{cid}", rpm,
+                                 round(k_air * rpm + rng.uniform(-1, 1), 2), noise, 1, upd))
+    conn.executemany("INSERT INTO fan_model VALUES (?,?,?,?,?,?,?,?)", models)
+    conn.executemany("INSERT INTO fan_performance_data VALUES (?,?,?,?,?,?,?,?,?)", perf)
+
+    # 点赞 / 查询日志：热门 pair 集中（Zipf）
+    weights = [1.0 / (i + 1) ** 1.1 for i in range(len(pairs))]
+    uids = [f"bench-user-{i:05d}" for i in range(users)]
+    likes_set = set()
+    for (m, c, _), u in zip(rng.choices(pairs, weights=weights, k=likes), rng.choices(uids, k=likes)):
+        likes_set.add((u, m, c))
+    ts = now.strftime('%Y-%m-%d %H:%M:%S')
+    conn.executemany("INSERT INTO rate_logs VALUES (?,?,?,1,1,?,?)", [(u, m, c, ts, ts) for u, m, c in likes_set])
+    conn.executemany("INSERT INTO query_logs (user_identifier, model_id, condition_id, batch_id, source) VALUES (?,?,?,?,?)",
+                     [(rng.choice(uids), m, c, f"q{i // 3}", "bench")
+                      for i, (m, c, _) in enumerate(rng.choices(pairs, weights=weights, k=queries))])
+    conn.execute("INSERT INTO announcements VALUES (1,'压测公告',1,'2000-01-01 00:00:00',NULL,1,?)", (ts,))
+
+    # 频谱：spectrum_ratio 的 pair 有最新缓存 + 绑定；其余一半有绑定但无音频目录（→ missing），其余无绑定
+    params = _bench_params()
+    conn.execute("INSERT INTO calibration_params VALUES (?,1,?)", (json.dumps(params), ts))
+    conn.commit()
+    conn.close()
+
+    from .curves import spectrum_cache
+    from .curves.spectrum_builder import compute_param_hash
+    param_hash = compute_param_hash(params)
+    code_ver = os.getenv('CODE_VERSION', '')
+    conn = sqlite3.connect(db_path)
+    n_spec = 0
+    for m, c, rpm_max in pairs:
+        r = rng.random()
+        if r >= spectrum_ratio + (1.0 - spectrum_ratio) / 2:
+            continue
+        bid = f"ab_{m}_{c}"
+        dh = hashlib.sha1(bid.encode()).hexdigest()
+        has_audio = r < spectrum_ratio
+        conn.execute("INSERT INTO audio_batch VALUES (?,?,?)", (bid, None, dh))
+        conn.execute("INSERT INTO perf_audio_binding VALUES (?,?,?,?,?,?)", (m, c, bid, dh, f"pb{m}_{c}", ts))
+        if has_audio:
+            spectrum_cache.save(_fake_spectrum_model(rng, rpm_max), model_id=m, condition_id=c, extra_meta={
+                'perf_batch_id': f"pb{m}_{c}", 'audio_batch_id': bid, 'audio_data_hash': dh,
+                'param_hash': param_hash, 'code_version': code_ver,
+            })
+            n_spec += 1
+    conn.commit()
+    conn.close()
+    return {'pairs': len(pairs), 'models': len(models), 'conditions': n_cond, 'perf_rows': len(perf),
+            'likes': len(likes_set), 'queries': int(queries), 'spectra': n_spec}
+
+def load_catalog(db_path: str) -> Dict[str, Any]:
+    conn = sqlite3.connect(db_path)
+    try:
+        pairs = [(int(m), int(c)) for m, c in conn.execute(
+            "SELECT DISTINCT model_id, condition_id FROM fan_performance_data ORDER BY model_id, condition_id")]
+        cids = [int(r[0]) for r in conn.execute("SELECT condition_id FROM working_condition WHERE is_valid=1")]
+        uids = [r[0] for r in conn.execute("SELECT DISTINCT user_identifier FROM rate_logs LIMIT 5000")]
+    finally:
+        conn.close()
+    return {'pairs': pairs, 'condition_ids': cids, 'users': uids}
+
+# =========================
+# 请求构造
+# =========================
+DEFAULT_MIX = {'curves': 35, 'search': 30, 'spectrum': 15, 'meta': 10, 'index': 5, 'like_keys': 5}
+
+class RequestMix:
+    """按权重抽取接口；pair 按 Zipf 选择（头部热门，模拟缓存命中分布）。"""
+    def __init__(self, catalog: Dict[str, Any], mix: Dict[str, float], seed: int = 0, zipf_s: float = 1.1):
+        self.rng = random.Random(seed)
+        self.pairs = list(catalog['pairs'])
+        random.Random(seed + 1).shuffle(self.pairs)
+        self.pair_w = [1.0 / (i + 1) ** zipf_s for i in range(len(self.pairs))]
+        self.cids = list(catalog['condition_ids']) or [1]
+        self.users = list(catalog['users']) or ['bench-user-00000']
+        self.names = [k for k, v in mix.items() if v > 0]
+        self.weights = [float(mix[k]) for k in self.names]
+
+    def _pairs(self, lo: int, hi: int) -> List[Dict[str, int]]:
+        k = self.rng.randint(lo, hi)
+        picked = {p for p in self.rng.choices(self.pairs, weights=self.pair_w, k=k)}
+        return [{'model_id': m, 'condition_id': c} for m, c in picked]
+
+    def next(self) -> Tuple[str, str, str, Optional[dict], Optional[str]]:
+        """返回 (接口名, 方法, 路径, JSON 体, 用户 uid)。"""
+        name = self.rng.choices(self.names, weights=self.weights, k=1)[0]
+        if name == 'curves':
+            return name, 'POST', '/api/curves', {'pairs': self._pairs(1, 6)}, None
+        if name == 'spectrum':
+            return name, 'POST', '/api/spectrum-models', {'pairs': self._pairs(1, 4)}, None
+        if name == 'meta':
+            return name, 'POST', '/api/meta_by_ids', {'pairs': self._pairs(1, 10)}, None
+        if name == 'search':
+            sort_by = self.rng.choice(['none', 'rpm', 'noise'])
+            body = {'condition_id': self.rng.choice(self.cids), 'size_filter': '不限',
+                    'thickness_min': '1', 'thickness_max': '99', 'sort_by': sort_by,
+                    'sort_value': {'none': '', 'rpm': str(self.rng.choice([1000, 1200, 1500])),
+                                   'noise': str(self.rng.choice([25, 30, 35]))}[sort_by]}
+            return name, 'POST', '/api/search_fans', body, None
+        if name == 'like_keys':
+            return name, 'GET', '/api/like_keys', None, self.rng.choice(self.users)
+        return 'index', 'GET', '/', None, None
+
+def _sign_uid(uid: str, secret: str) -> str:
+    # 与 fancoolserver._sign_uid 一致
+    sig = hmac.new(secret.encode(), uid.encode('utf-8'), hashlib.sha256).hexdigest()[:16]
+    return f"{uid}.{sig}"
+
+# =========================
+# 驱动
+# =========================
+def _percentile(sorted_vals: List[float], q: float) -> float:
+    if not sorted_vals:
+        return float('nan')
+    k = max(0, min(len(sorted_vals) - 1, int(math.ceil(q / 100.0 * len(sorted_vals))) - 1))
+    return sorted_vals[k]
+
+def summarize(samples: Dict[str, List[float]], errors: Dict[str, int], wall: float) -> Dict[str, Any]:
+    out: Dict[str, Any] = {}
+    total = 0
+    for name in sorted(set(samples) | set(errors)):
+        v = sorted(samples.get(name) or [])
+        total += len(v)
+        out[name] = {
+            'count': len(v), 'errors': int(errors.get(name, 0)),
+            'p50_ms': _percentile(v, 50), 'p95_ms': _percentile(v, 95), 'p99_ms': _percentile(v, 99),
+            'mean_ms': (sum(v) / len(v)) if v else float('nan'), 'max_ms': v[-1] if v else float('nan'),
+        }
+    return {'endpoints': out, 'total_requests': total, 'wall_sec': wall,
+            'throughput_rps': (total / wall) if wall > 0 else 0.0}
+
+def drive(base_url: str, mix: RequestMix, *, requests: int = 2000, concurrency: int = 8,
+          warmup: int = 100, duration: float = 0.0, secret: str = 'replace-me-in-prod',
+          timeout: float = 60.0) -> Dict[str, Any]:
+    """闭环压测：concurrency 个线程各持一条 keep-alive 连接，顺序发请求直至总数/时长耗尽。"""
+    u = urlsplit(base_url)
+    host, port = u.hostname or '127.0.0.1', u.port or 80
+    lock = threading.Lock()
+    samples: Dict[str, List[float]] = {}
+    errors: Dict[str, int] = {}
+    state = {'issued': 0}
+    total = int(warmup) + int(requests)
+    deadline: List[Optional[float]] = [None]
+
+    def _take() -> Optional[Tuple[int, tuple]]:
+        with lock:
+            if deadline[0] is not None and time.perf_counter() >= deadline[0]:
+                return None
+            if not duration and state['issued'] >= total:
+                return None
+            state['issued'] += 1
+            return state['issued'], mix.next()
+
+    def _worker():
+        conn = http.client.HTTPConnection(host, port, timeout=timeout)
+        while True:
+            item = _take()
+            if item is None:
+                break
+            seq, (name, method, path, body, uid) = item
+            headers = {'Accept': 'application/json'}
+            payload = None
+            if body is not None:
+                payload = json.dumps(body).encode('utf-8')
+                headers['Content-Type'] = 'application/json'
+            if uid:
+                headers['Cookie'] = f"fc_uid={_sign_uid(uid, secret)}"
+            t0 = time.perf_counter()
+            ok = False
+            try:
+                conn.request(method, path, body=payload, headers=headers)
+                resp = conn.getresponse()
+                resp.read()
+                ok = 200 <= resp.status < 300
+                if resp.getheader('Connection', '').lower() == 'close':
+                    conn.close()
+            except Exception:
+                conn.close()
+                conn = http.client.HTTPConnection(host, port, timeout=timeout)
+            dt = (time.perf_counter() - t0) * 1000.0
+            if seq <= warmup:
+                continue
+            with lock:
+                if ok:
+                    samples.setdefault(name, []).append(dt)
+                else:
+                    errors[name] = errors.get(name, 0) + 1
+        conn.close()
+
+    threads = [threading.Thread(target=_worker, name=f'bench-{i}', daemon=True) for i in range(max(1, concurrency))]
+    t_start = time.perf_counter()
+    if duration:
+        deadline[0] = t_start + float(duration)
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return summarize(samples, errors, time.perf_counter() - t_start)
+
+APP_LOGGERS = ('fancoolserver.spectrum', 'fancoolserver.curves', 'curves.spectrum_builder', 'curves.pchip_cache')
+
+def boot_inprocess(db_path: str, cache_dir: str, port: int = 0, log_level: str = ''):
+    """以替身库启动 fancoolserver.app；返回 (server, base_url)。需在导入 fancoolserver 之前调用。"""
+    os.environ['FANDB_DSN'] = f"sqlite:///{os.path.abspath(db_path)}"
+    os.environ['CURVE_CACHE_DIR'] = os.path.abspath(cache_dir)
+    install_sqlite_shims()
+    from werkzeug.serving import make_server
+    from . import fancoolserver
+    from .curves import spectrum_builder
+    # 导入时后台线程可能已建连：丢弃旧连接，保证之后的连接都带函数替身
+    fancoolserver.engine.dispose()
+    spectrum_builder._engine.dispose()
+    if log_level:
+        import logging
+        for name in APP_LOGGERS:
+            logging.getLogger(name).setLevel(log_level.upper())
+    srv = make_server('127.0.0.1', int(port), fancoolserver.app, threaded=True)
+    threading.Thread(target=srv.serve_forever, name='bench-http', daemon=True).start()
+    return srv, f"http://127.0.0.1:{srv.server_port}"
+
+def _parse_mix(s: str) -> Dict[str, float]:
+    mix = dict(DEFAULT_MIX)
+    for part in (s or '').split(','):
+        if '=' in part:
+            k, v = part.split('=', 1)
+            k = k.strip()
+            if k not in DEFAULT_MIX:
+                raise SystemExit(f"未知接口：{k}（可选 {','.join(DEFAULT_MIX)}）")
+            mix[k] = float(v)
+    return mix
+
+def _print_table(res: Dict[str, Any], out=None):
+    out = out or sys.stdout
+    print(f"{'endpoint':<12}{'count':>8}{'err':>6}{'p50':>10}{'p95':>10}{'p99':>10}{'max':>10}  (ms)", file=out)
+    for name, r in res['endpoints'].items():
+        print(f"{name:<12}{r['count']:>8}{r['errors']:>6}{r['p50_ms']:>10.1f}{r['p95_ms']:>10.1f}"
+              f"{r['p99_ms']:>10.1f}{r['max_ms']:>10.1f}", file=out)
+    print(f"total={res['total_requests']} wall={res['wall_sec']:.1f}s rps={res['throughput_rps']:.1f}", file=out)
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="前台接口 HTTP 压测（SQLite 替身库 + 合成目录）")
+    ap.add_argument("--db", type=str, default=os.path.join(tempfile.gettempdir(), "fancool_http_bench.sqlite"),
+                    help="替身库路径")
+    ap.add_argument("--cache-dir", type=str, default="", help="频谱/曲线缓存目录（默认 <db>.cache）")
+    ap.add_argument("--seed-only", action="store_true", help="只建库与缓存后退出")
+    ap.add_argument("--reseed", action="store_true", help="替身库已存在时也重建")
+    ap.add_argument("--url", type=str, default="", help="外部服务地址；给定时不在本进程启动应用")
+    ap.add_argument("--secret", type=str, default=os.getenv('APP_SECRET', 'replace-me-in-prod'),
+                    help="外部服务的 APP_SECRET（签 uid cookie）")
+    # 目录规模
+    ap.add_argument("--brands", type=int, default=40)
+    ap.add_argument("--models-per-brand", type=int, default=12)
+    ap.add_argument("--conditions", type=int, default=6)
+    ap.add_argument("--points", type=int, default=8, help="每条曲线的数据点数")
+    ap.add_argument("--spectrum-ratio", type=float, default=0.5, help="有最新频谱缓存的 pair 比例")
+    ap.add_argument("--seed", type=int, default=0)
+    # 压测
+    ap.add_argument("--requests", type=int, default=2000)
+    ap.add_argument("--duration", type=float, default=0.0, help="按时长压测（秒）；>0 时忽略 --requests")
+    ap.add_argument("--warmup", type=int, default=100, help="预热请求数（不计入统计）")
+    ap.add_argument("--concurrency", type=int, default=8)
+    ap.add_argument("--mix", type=str, default="", help="接口权重，如 curves=50,search=30,index=0")
+    ap.add_argument("--app-log-level", type=str, default="ERROR",
+                    help="本进程应用日志级别（逐请求 INFO 日志会计入延迟；留空保持应用默认）")
+    ap.add_argument("--out", type=str, default="", help="结果 JSON 路径")
+    args = ap.parse_args(argv)
+
+    cache_dir = args.cache_dir or (os.path.abspath(args.db) + ".cache")
+    if args.reseed or args.seed_only or not os.path.isfile(args.db):
+        t0 = time.perf_counter()
+        os.environ['CURVE_CACHE_DIR'] = os.path.abspath(cache_dir)
+        os.environ.setdefault('FANDB_DSN', f"sqlite:///{os.path.abspath(args.db)}")
+        info = seed_catalog(args.db, cache_dir, brands=args.brands, models_per_brand=args.models_per_brand,
+                            conditions=args.conditions, points=args.points,
+                            spectrum_ratio=args.spectrum_ratio, seed=args.seed)
+        print(f"[http_bench] seeded {args.db} in {time.perf_counter() - t0:.1f}s: {json.dumps(info)}", flush=True)
+        print(f"[http_bench] FANDB_DSN=sqlite:///{os.path.abspath(args.db)} CURVE_CACHE_DIR={cache_dir}", flush=True)
+    if args.seed_only:
+        return 0
+
+    catalog = load_catalog(args.db)
+    srv = None
+    base_url = args.url
+    if not base_url:
+        srv, base_url = boot_inprocess(args.db, cache_dir, log_level=args.app_log_level)
+    mix = RequestMix(catalog, _parse_mix(args.mix), seed=args.seed)
+    try:
+        res = drive(base_url, mix, requests=args.requests, concurrency=args.concurrency,
+                    warmup=args.warmup, duration=args.duration, secret=args.secret)
+    finally:
+        if srv is not None:
+            srv.shutdown()
+    res['config'] = {
+        'target': args.url or 'inprocess', 'concurrency': args.concurrency, 'warmup': args.warmup,
+        'mix': _parse_mix(args.mix), 'pairs': len(catalog['pairs']), 'db': os.path.abspath(args.db),
+        'created_at': datetime.utcnow().isoformat(timespec='seconds') + 'Z',
+    }
+    _print_table(res)
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            json.dump(res, f, ensure_ascii=False, indent=2)
+        print(f"[http_bench] wrote {args.out}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2290,16 +2290,40 @@ async function requestAndRenderSpectrum(forceFull = false) {
   }
 }
 
+// POST 接口的 ETag 复用：浏览器不缓存 POST，这里按“URL+请求体”记住上次的 ETag 与响应，
+// 带 If-None-Match 请求，服务端返回 304 时直接复用上次解析好的 JSON
+const __etagResponseCache = new Map();
+const ETAG_CACHE_MAX = 32;
+
+async function postJsonWithEtag(url, payload) {
+  const body = JSON.stringify(payload);
+  const cacheKey = url + '\n' + body;
+  const hit = __etagResponseCache.get(cacheKey);
+  const headers = { 'Content-Type': 'application/json' };
+  if (hit && hit.etag) headers['If-None-Match'] = hit.etag;
+  const resp = await fetch(url, { method: 'POST', headers, body });
+  if (resp.status === 304 && hit) {
+    __etagResponseCache.delete(cacheKey);
+    __etagResponseCache.set(cacheKey, hit);
+    return hit.json;
+  }
+  const j = await resp.json();
+  const etag = resp.headers.get('ETag');
+  __etagResponseCache.delete(cacheKey);
+  if (resp.ok && etag) {
+    __etagResponseCache.set(cacheKey, { etag, json: j });
+    while (__etagResponseCache.size > ETAG_CACHE_MAX) {
+      __etagResponseCache.delete(__etagResponseCache.keys().next().value);
+    }
+  }
+  return j;
+}
+
 async function fetchSpectrumModelsForPairs(pairs) {
   if (!Array.isArray(pairs) || !pairs.length) {
     return { modelsLoaded: 0, missingKeys: new Set(), rebuildingKeys: new Set() };
   }
-  const resp = await fetch('/api/spectrum-models', {
-    method: 'POST',
-    headers: { 'Content-Type': 'application/json' },
-    body: JSON.stringify({ pairs })
-  });
-  const j = await resp.json();
+  const j = await postJsonWithEtag('/api/spectrum-models', { pairs });
   const ok = !!(j && typeof j === 'object' && j.success === true);
   if (!ok) throw new Error((j && j.error_message) || '频谱模型接口失败');
 
@@ -3674,6 +3698,7 @@ function renderFitPanel({ mode, rows, xValue, unit, onToggleSeries }) {
 
 // 可选：暴露到全局，便于调试或其他模块监听
 try { window.SpectrumController = SpectrumController; } catch (_) {}
+try { window.postJsonWithEtag = postJsonWithEtag; } catch (_) {}
 
 
   // 挂到全局
@@ -2274,12 +2274,18 @@ async function refreshChartFromLocal(showToast=false){
     return;
   }
   try {
-    const resp = await fetch('/api/curves', {
-      method:'POST',
-      headers:{'Content-Type':'application/json'},
-      body: JSON.stringify({ pairs })
-    });
-    const j = await resp.json();
+    // 带 ETag 请求：曲线未变化时服务端返回 304，复用上次结果
+    let j;
+    if (typeof window.postJsonWithEtag === 'function') {
+      j = await window.postJsonWithEtag('/api/curves', { pairs });
+    } else {
+      const resp = await fetch('/api/curves', {
+        method:'POST',
+        headers:{'Content-Type':'application/json'},
+        body: JSON.stringify({ pairs })
+      });
+      j = await resp.json();
+    }
     const n = normalizeApiResponse(j);
     if (!n.ok){ showError(n.error_message || '获取曲线失败'); return; }
     const data = n.data || {};